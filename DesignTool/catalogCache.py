@@ -0,0 +1,190 @@
+"""
+Cache of parsed target lists
+
+The targets data frame read from a target list file is saved as one .npy file per column,
+in a directory named after the file path, size, modification time and content hash.
+Loading from the cache memory-maps the columns, so the text file is not parsed again.
+
+The total size of the cache is bounded, least recently used entries are removed first.
+
+Example:
+
+cache = CatalogCache (cacheDir, maxBytes)
+df, info = cache.load (fileName)
+if df is None:
+    df = parse (fileName)
+    cache.save (fileName, df, info)
+
+Configuration (smdt.cfg), the cache is disabled by default:
+    catalogCacheEnabled = True
+    catalogCacheDir = '~/.cache/smdt'
+    catalogCacheSizeMB = 200
+
+Date: 2026-10-18
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from smdtLogger import SMDTLogger
+
+"""
+Increment when the layout of the data frame or of the cache entries changes,
+so that old entries are not used.
+"""
+CacheVersion = 2
+
+
+class CatalogCache:
+    MetaFile = "meta.json"
+
+    def __init__(self, cacheDir, maxBytes):
+        """
+        cacheDir: directory of the cache, created if needed
+        maxBytes: maximum total size of the cache
+        """
+        self.cacheDir = os.path.expanduser(cacheDir)
+        self.maxBytes = maxBytes
+        os.makedirs(self.cacheDir, exist_ok=True)
+
+    @classmethod
+    def fromConfig(cls, config):
+        """
+        Returns a cache as defined in the configuration,
+        or None if the cache is disabled.
+        """
+        if config is None or not config.getValue("catalogCacheEnabled", False):
+            return None
+        sizeMB = config.getValue("catalogCacheSizeMB", 200)
+        if sizeMB <= 0:
+            return None
+        try:
+            return cls(config.getValue("catalogCacheDir", "~/.cache/smdt"), sizeMB * 1024 * 1024)
+        except OSError as e:
+            SMDTLogger.info(f"Catalog cache disabled, {e}")
+            return None
+
+    def _key(self, fileName):
+        """
+        Returns the key of the file, a hash of path, size, modification time and content.
+        """
+        path = os.path.abspath(fileName)
+        st = os.stat(path)
+        content = hashlib.sha1()
+        with open(path, "rb") as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b""):
+                content.update(chunk)
+        key = f"{CacheVersion}|{path}|{st.st_size}|{st.st_mtime_ns}|{content.hexdigest()}"
+        return hashlib.sha1(key.encode("UTF-8")).hexdigest()
+
+    def load(self, fileName):
+        """
+        Returns the data frame and the info saved with it,
+        or (None, None) if the file is not in the cache.
+        """
+        try:
+            entryDir = os.path.join(self.cacheDir, self._key(fileName))
+            metaFile = os.path.join(entryDir, self.MetaFile)
+            if not os.path.isfile(metaFile):
+                return None, None
+            with open(metaFile, "r") as fh:
+                meta = json.load(fh)
+
+            data = {}
+            for i, col in enumerate(meta["columns"]):
+                values = np.load(os.path.join(entryDir, f"{i}.npy"), mmap_mode="r")
+                if col["kind"] == "category":
+                    values = pd.Categorical.from_codes(values, categories=col["categories"])
+                elif col["kind"] == "str":
+                    values = pd.Series(values.tolist(), dtype=col["dtype"])
+                data[col["name"]] = values
+
+            """ Entries are evicted by the time they were last used """
+            os.utime(metaFile)
+            return pd.DataFrame(data, columns=[c["name"] for c in meta["columns"]]), meta["info"]
+        except Exception as e:
+            SMDTLogger.info(f"Failed to load {fileName} from catalog cache, {e}")
+            return None, None
+
+    def save(self, fileName, df, info=None):
+        """
+        Saves the data frame read from fileName.
+        info: additional values to save with the data frame, must be JSON serializable.
+        """
+        tmpDir = None
+        try:
+            entryDir = os.path.join(self.cacheDir, self._key(fileName))
+            if os.path.isdir(entryDir):
+                return
+            tmpDir = tempfile.mkdtemp(prefix=".tmp", dir=self.cacheDir)
+
+            columns = []
+            for i, name in enumerate(df.columns):
+                col = df[name]
+                colMeta = {"name": name, "dtype": str(col.dtype)}
+                if isinstance(col.dtype, pd.CategoricalDtype):
+                    colMeta["kind"] = "category"
+                    colMeta["categories"] = col.cat.categories.tolist()
+                    values = col.cat.codes.to_numpy()
+                elif col.dtype.kind in "biuf":
+                    colMeta["kind"] = "numeric"
+                    values = col.to_numpy()
+                else:
+                    colMeta["kind"] = "str"
+                    values = col.to_numpy(dtype=str)
+                np.save(os.path.join(tmpDir, f"{i}.npy"), values)
+                columns.append(colMeta)
+
+            with open(os.path.join(tmpDir, self.MetaFile), "w") as fh:
+                json.dump({"fileName": os.path.abspath(fileName), "info": info, "columns": columns}, fh)
+
+            """ Another thread may have saved the same entry in the mean time """
+            try:
+                os.rename(tmpDir, entryDir)
+                tmpDir = None
+            except OSError:
+                pass
+            self.evict()
+        except Exception as e:
+            SMDTLogger.info(f"Failed to save {fileName} in catalog cache, {e}")
+        finally:
+            if tmpDir is not None:
+                shutil.rmtree(tmpDir, ignore_errors=True)
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits in maxBytes.
+        """
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cacheDir):
+            if not entry.is_dir() or entry.name.startswith("."):
+                continue
+            try:
+                size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                lastUsed = os.stat(os.path.join(entry.path, self.MetaFile)).st_mtime
+            except OSError:
+                continue
+            entries.append((lastUsed, size, entry.path))
+            total += size
+
+        entries.sort()
+        for lastUsed, size, path in entries:
+            if total <= self.maxBytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        """
+        Removes all entries.
+        """
+        for entry in os.scandir(self.cacheDir):
+            if entry.is_dir():
+                shutil.rmtree(entry.path, ignore_errors=True)
@@ -267,6 +267,7 @@ function SlitmaskDesignTool() {
 		var minSepAs = E('minslitseparationfd').value;
 		var minSlitLengthAs = E('minalitlengthfd').value;
 		var boxSizeAs = E('alignboxsizefd').value;
+		var selectionMode = E('selectionmodefd') ? E('selectionmodefd').value.trim().toLowerCase() : 'greedy';
 
 		E('showSlitPos').checked = true;
 		var params = {
@@ -275,9 +276,18 @@ function SlitmaskDesignTool() {
 			'currAngleDeg': cs.currPosAngleDeg,
 			'minSepAs': minSepAs,
 			'minSlitLengthAs': minSlitLengthAs,
-			'boxSize': boxSizeAs
+			'boxSize': boxSizeAs,
+			'selectionMode': selectionMode,
+			'incremental': true
 		};
-		ajaxPost('recalculateMask', params, callback);
+		function showSelection(data) {
+			var info = data.selectionInfo;
+			if (info) {
+				self.setStatus('Selected ' + info.nSelected + ' targets, total priority ' + info.objective);
+			}
+			callback(data.targets);
+		}
+		ajaxPost('recalculateMask', params, showSelection);
 	};
 
 	self.recalculateMask = function (evt) {
@@ -21,10 +21,11 @@ import warnings
 
 from smdtLibs.inOutChecker import InOutChecker
 from smdtLibs.configFile import ConfigFile
-from smdtLibs.utils import sexg2Float, toSexagecimal
+from smdtLibs.utils import sexg2Float, toSexagecimal, toSexagecimals
 
 from targets import TargetList
 from maskLayouts import MaskLayouts
+from smdtLogger import SMDTLogger
 
 SMDT_Name = "SMDT Version 0.9"
 
@@ -113,7 +114,7 @@ SlitObjMap,C,BotDist,SlitObjMap,BotDist
 
 
 class MaskDesignOutputFitsFile:
-    def __init__(self, targetList):
+    def __init__(self, targetList, strict=False):
         """
         This class represents the Mask Design Fits File.
         It is used to save the FITS file as output of the design process
@@ -131,8 +132,10 @@ class MaskDesignOutputFitsFile:
         - Table bluslits: slist coordiantes, 4 corners
         - Table rdbmap: field name mapping to database
 
+        strict: True to refuse to write overlapping slits, see checkSlits.
         """
         self.targetList = targetList
+        self.strict = strict
 
     def genObjCatTable(self):
         """
@@ -298,37 +301,14 @@ class MaskDesignOutputFitsFile:
         Generates the list of slits coordinates
         """
         targets = self.targetList.targets
-        params = self.targetList.config.params
 
         cols = []
         objInMask = targets[targets.inMask > 0]
         nSlits = objInMask.shape[0]
         if nSlits > 0:
-            slitWidths = objInMask.slitWidth
-            half = slitWidths
-
-            relAngles = np.radians(float(params.MaskPA[0]) - objInMask.slitLPA)
-            sines = np.sin(relAngles)
-            cosines = np.cos(relAngles)
-
-            slitX = objInMask.xarcs
-            slitY = objInMask.yarcs
-            l1 = objInMask.length1
-            l2 = objInMask.length2
-
-            slitX10 = slitX + cosines * l1
-            slitY10 = slitY + sines * l1
-            slitX1 = slitX10
-            slitY1 = slitY10 - half
-            slitX2 = slitX10
-            slitY2 = slitY10 + half
-
-            slitX30 = slitX - cosines * l2
-            slitY30 = slitY - sines * l2
-            slitX3 = slitX30
-            slitY3 = slitY30 - half
-            slitX4 = slitX30
-            slitY4 = slitY30 + half
+            xs, ys = self.slitCorners(objInMask)
+            slitX1, slitX2, slitX3, slitX4 = xs.T
+            slitY1, slitY2, slitY3, slitY4 = ys.T
             cols.append(pf.Column(name="bSlitId", format="I11", null="-9999", unit="None", array=range(nSlits),))
             cols.append(pf.Column(name="BluId", format="I11", null="-9999", unit="None", array=[1] * nSlits,))
             cols.append(pf.Column(name="dSlitId", format="I11", null="-9999", unit="None", array=range(nSlits),))
@@ -343,6 +323,20 @@ class MaskDesignOutputFitsFile:
 
         return pf.TableHDU.from_columns(cols, name="BluSlits")
 
+    def slitCorners(self, objInMask):
+        """
+        Returns the corners of the slits, relative to the mask PA, see TargetList.slitCorners
+        """
+        return self.targetList.slitCorners(objInMask, float(self.targetList.config.params.MaskPA[0]))
+
+    def checkSlits(self, minSep=0):
+        """
+        Returns the pairs of objectIds of the slits that overlap or are closer than minSep.
+        """
+        objectIds = self.targetList.targets.objectId
+        pairs = self.targetList.checkSlits(float(self.targetList.config.params.MaskPA[0]), minSep)
+        return [(objectIds[a], objectIds[b]) for a, b in pairs]
+
     def genRDBmap(self):
         """
         Generates the database field mapping
@@ -362,8 +356,16 @@ class MaskDesignOutputFitsFile:
 
     def _getHDUList(self):
         """
-        Assembles all the HDUs
+        Assembles all the HDUs.
+        Overlapping slits are reported, or raise a ValueError if strict is True.
         """
+        conflicts = self.checkSlits()
+        if conflicts:
+            msg = f"{len(conflicts)} overlapping slits: " + ", ".join(f"{a}/{b}" for a, b in conflicts[:10])
+            if self.strict:
+                raise ValueError(msg)
+            SMDTLogger.warning(msg)
+
         hdus = []
         hdus.append(pf.PrimaryHDU())
         hdus.append(self.genObjCatTable())
@@ -398,39 +400,54 @@ def outputAsList(fileName, targets):
     """
     Outputs target list in list form, as as the input list form
     """
+    raStrs = toSexagecimals(targets.raHour)
+    decStrs = toSexagecimals(targets.decDeg)
+    colNames = "eqx", "mag", "pBand", "pcode", "sampleNr", "selected"
+    cols = [targets[c].tolist() for c in colNames]
+    """ slitLPA is float32, see TargetSchema, written with the shortest float32 repr, ie. 0.7 """
+    cols.append([float(str(v)) for v in targets.slitLPA.to_numpy(dtype=np.float32)])
     with open(fileName, "w") as fh:
-        for i, row in targets.iterrows():
-            print(
-                "{:18s}{} {} {:.0f}{:>6.2f} {} {:5d} {} {} {}".format(
-                    row.objectId,
-                    toSexagecimal(row.raHour),
-                    toSexagecimal(row.decDeg),
-                    row.eqx,
-                    row.mag,
-                    row.pBand,
-                    row.pcode,
-                    row.sampleNr,
-                    row.selected,
-                    row.slitLPA,
-                ),
-                file=fh,
-            )
+        for values in zip(targets.objectId.tolist(), raStrs.tolist(), decStrs.tolist(), *cols):
+            print("{:18s}{} {} {:.0f}{:>6.2f} {} {:5d} {} {} {}".format(*values), file=fh)
 
 
 class MaskDesignInputFitsFile:
     """
     This class handles the Fits File generated by MaskDesignOutputFitsFile
+
+    The FITS file is memory-mapped and the tables are loaded lazily.
+    A table is converted to a pandas data frame on first access, ie. self.desislits,
+    and allSlits is merged only when requested.
     """
 
     def __init__(self, fileName):
+        self.fileName = fileName
         with warnings.catch_warnings():
             warnings.simplefilter("ignore", AstropyWarning)
-            self.tables = []
-            ff = pf.open(fileName)
-            for hdr in ff:
-                self.tables.append(hdr.name)
-                self.__dict__[hdr.name.lower()] = pd.DataFrame(hdr.data)
-            self.allSlits = self.mergeSlitTables()
+            self.hdus = pf.open(fileName, memmap=True)
+            self.tables = [hdu.name for hdu in self.hdus]
+
+    def __getattr__(self, name):
+        """
+        Loads the table or allSlits on first access.
+        The result is kept as attribute, so this is called only once per table.
+        """
+        if name == "allSlits":
+            value = self.mergeSlitTables()
+        elif name in [t.lower() for t in self.__dict__.get("tables", ())]:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", AstropyWarning)
+                value = pd.DataFrame(self.hdus[name].data)
+        else:
+            raise AttributeError(f"{type(self).__name__} has no attribute {name}")
+        self.__dict__[name] = value
+        return value
+
+    def close(self):
+        """
+        Closes the FITS file. Tables already loaded remain available.
+        """
+        self.hdus.close()
 
     def mergeSlitTables(self):
         """
@@ -480,11 +497,15 @@ class MaskDesignInputFitsFile:
     def getCenter(self):
         """
         Returns the pointing RA/DEC as (ra, dec)
+        Reads the MaskDesign table directly, without loading the slit tables.
         """
-        return self.maskdesign.RA_PNT[0], self.maskdesign.DEC_PNT[0]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", AstropyWarning)
+            data = self.hdus["MaskDesign"].data
+            return data["RA_PNT"][0], data["DEC_PNT"][0]
 
     def getAlignBoxes(self, slits=None):
-        slits = self.allSlists if slits == None else slits
+        slits = self.allSlits if slits is None else slits
         return slits[["A" == s for s in slits.slitTyp]]
 
     def getAsTargets(self, cenRADeg, cenDecDeg, config):
@@ -496,26 +517,34 @@ class MaskDesignInputFitsFile:
 
         def genPcode():
             table = {"A": -2, "G": -1, "I": 0, "P": 1}
-            return [table[t] for t in self.allSlits.slitTyp]
+            pcodes = self.allSlits.slitTyp.map(table)
+            if pcodes.isna().any():
+                raise KeyError(f"Unknown slit types {set(self.allSlits.slitTyp[pcodes.isna()])}")
+            return pcodes.to_numpy(dtype=np.int64)
 
         objects = self.objectcat
-        objIndices = dict ([ (i1,i0) for i0, i1 in enumerate (objects.ObjectId) ])
+        """ Position of each ObjectId in objectcat, the last one if an ObjectId is repeated """
+        objIndices = pd.Series(np.arange(len(objects)), index=objects.ObjectId.to_numpy())
+        objIndices = objIndices[~objIndices.index.duplicated(keep="last")]
+        orgIndices = objIndices.reindex(self.slitobjmap.ObjectId.to_numpy())
+        if orgIndices.isna().any():
+            raise KeyError(f"ObjectIds not in objectcat {list(orgIndices.index[orgIndices.isna()])}")
+        orgIndices = orgIndices.to_numpy(dtype=np.int64)
 
-        orgIndices = [objIndices[d] for d in self.slitobjmap.ObjectId]
         nSlits = len(self.allSlits)
-        self.allSlits["raHour"] = [objects.RA_OBJ.iloc[d] / 15.0 for d in orgIndices]
-        self.allSlits["decDeg"] = [objects.DEC_OBJ.iloc[d] for d in orgIndices]
+        self.allSlits["raHour"] = objects.RA_OBJ.to_numpy()[orgIndices] / 15.0
+        self.allSlits["decDeg"] = objects.DEC_OBJ.to_numpy()[orgIndices]
 
-        self.allSlits["objectId"] = [objects.OBJECT.iloc[d].strip() for d in orgIndices]
-        self.allSlits["eqx"] = [objects.EQUINOX.iloc[d] for d in orgIndices]
-        self.allSlits["mag"] = [objects.mag.iloc[d] for d in orgIndices]
-        self.allSlits["pBand"] = [objects.pBand.loc[d].strip() for d in orgIndices]
+        self.allSlits["objectId"] = objects.OBJECT.str.strip().to_numpy()[orgIndices]
+        self.allSlits["eqx"] = objects.EQUINOX.to_numpy()[orgIndices]
+        self.allSlits["mag"] = objects.mag.to_numpy()[orgIndices]
+        self.allSlits["pBand"] = objects.pBand.str.strip().to_numpy()[orgIndices]
 
-        self.allSlits["orgIndex"] = range(nSlits)
-        self.allSlits["inMask"] = [0] * nSlits
-        self.allSlits["selected"] = [1] * nSlits
+        self.allSlits["orgIndex"] = np.arange(nSlits)
+        self.allSlits["inMask"] = np.zeros(nSlits, dtype=np.int64)
+        self.allSlits["selected"] = np.ones(nSlits, dtype=np.int64)
         self.allSlits["pcode"] = genPcode()
-        self.allSlits["sampleNr"] = [1] * nSlits
+        self.allSlits["sampleNr"] = np.ones(nSlits, dtype=np.int64)
 
         # raDeg, decDeg = self.getCenter()
         paDeg = self.maskdesign.PA_PNT[0]
@@ -0,0 +1,107 @@
+"""
+Geometry of the instrument layouts, built once per instrument and margin
+
+The mask layout, shrunk by the margin, its bounding box,
+and the JSON payload of getMaskLayout are computed on first use and shared,
+the server handles requests in threads, so the cache is protected by a lock.
+
+The containment tests use the rasters of the layers, see maskRaster.py.
+Targets are classified by status: outside the mask, inside, in the guider FOV,
+or closer than badColumnDist to a bad column, see classify.
+Only targets with StatusInside can get slits.
+
+Example:
+
+geometry = getMaskGeometry ("deimos", margin=0.5)
+inside = geometry.raster ().checkPoints (xarcs, yarcs)
+minX, maxX = geometry.minX, geometry.maxX
+status = geometry.classify (xarcs, yarcs, badColumnDist=1)
+
+Date: 2026-10-18
+"""
+
+import json
+import threading
+import numpy as np
+
+from maskLayouts import MaskLayouts, GuiderFOVs, BadColumns, shrinkMask
+from maskRaster import getMaskRaster, DefaultResolution
+
+"""
+Status of a target, see MaskGeometry.classify
+"""
+StatusOutside, StatusInside, StatusGuiderFOV, StatusBadColumn = 0, 1, 2, 3
+
+"""
+Default distance to the bad columns, in arcsec
+"""
+DefaultBadColumnDist = 1.0
+
+
+class MaskGeometry:
+    def __init__(self, instrument, margin=0):
+        """
+        instrument: key of MaskLayouts, lower case
+        margin: in arcsec, the mask is shrunk by margin, see shrinkMask
+        """
+        self.instrument = instrument
+        self.margin = margin
+        self.layout = MaskLayouts[instrument]
+        self.mask = tuple(shrinkMask(self.layout, margin)) if margin != 0 else self.layout
+        self.guiderFOV = GuiderFOVs.get(instrument, ())
+        self.badColumns = BadColumns.get(instrument, ())
+
+        xs = [x for x, y, flag in self.mask]
+        ys = [y for x, y, flag in self.mask]
+        self.minX, self.maxX = np.min(xs), np.max(xs)
+        self.minY, self.maxY = np.min(ys), np.max(ys)
+
+        self.layoutInfo = {"mask": self.layout, "guiderFOV": self.guiderFOV, "badColumns": self.badColumns}
+        if margin != 0:
+            self.layoutInfo["reducedMask"] = self.mask
+        self.layoutJson = json.dumps(self.layoutInfo)
+
+    def raster(self, layer="mask", resolution=DefaultResolution):
+        """
+        Returns the raster of the layer with the same margin, see maskRaster.getMaskRaster
+        """
+        return getMaskRaster(self.instrument, layer, self.margin, resolution)
+
+    def classify(self, xs, ys, badColumnDist=DefaultBadColumnDist):
+        """
+        Returns the status of the points (xs, ys), array of int8:
+        StatusOutside, StatusInside the mask, StatusGuiderFOV if inside the mask and the guider FOV,
+        StatusBadColumn if inside the mask and closer than badColumnDist to a bad column.
+        Points with NaN coordinates are outside.
+        """
+        xs, ys = np.broadcast_arrays(np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64))
+        inside = self.raster().checkPoints(xs, ys)
+        status = np.where(inside, StatusInside, StatusOutside).astype(np.int8)
+
+        """ Only the points inside the mask are checked against the other layers """
+        idx = np.flatnonzero(inside)
+        px, py = xs.ravel()[idx], ys.ravel()[idx]
+        inGuider = getMaskRaster(self.instrument, "guiderFOV").checkPoints(px, py)
+        status.ravel()[idx[inGuider]] = StatusGuiderFOV
+        if badColumnDist > 0:
+            idx, px, py = idx[~inGuider], px[~inGuider], py[~inGuider]
+            onBadColumn = getMaskRaster(self.instrument, "badColumns", -badColumnDist).checkPoints(px, py)
+            status.ravel()[idx[onBadColumn]] = StatusBadColumn
+        return status
+
+
+_geometryCache = {}
+_geometryLock = threading.Lock()
+
+
+def getMaskGeometry(instrument, margin=0):
+    """
+    Returns the geometry of the instrument, built once per instrument and margin.
+    """
+    key = (instrument.lower(), margin)
+    with _geometryLock:
+        geometry = _geometryCache.get(key)
+        if geometry is None:
+            geometry = MaskGeometry(*key)
+            _geometryCache[key] = geometry
+        return geometry
@@ -0,0 +1,283 @@
+"""
+Search of the best position angle and field center
+
+Evaluates a grid of position angles and center offsets.
+For each configuration, the targets are projected, the targets inside the mask are marked,
+the slits are selected, overlapping slits are removed, and the slits crossing the mask edges
+are trimmed or removed, as in SlitmaskDesignTool.recalculateMask.
+The configurations are ranked by the number of selected targets or by the total priority.
+
+The grid is evaluated in a process pool, one TargetList per worker process.
+Workers are spawned and not forked, since the server calls from one of its threads.
+After the coarse grid, the grid is refined around the best configurations,
+with half the steps at each level.
+
+Example:
+
+optimizer = MaskOptimizer (targetList, config)
+best = optimizer.optimize (raDeg, decDeg, paDeg, nBest=5)
+
+Command line:
+
+python maskOptimizer.py -c smdt.cfg -n 5 targets.lst
+
+Date: 2026-10-18
+"""
+
+import os
+import math
+import argparse
+import multiprocessing
+import concurrent.futures
+
+import numpy as np
+
+from smdtLibs import utils
+from smdtLibs.configFile import ConfigFile
+from targets import TargetList
+from maskGeometry import getMaskGeometry, StatusInside, DefaultBadColumnDist
+
+"""
+Ranking keys, see MaskOptimizer.optimize
+"""
+RankKeys = {
+    "count": lambda r: (r["nSelected"], r["objective"]),
+    "priority": lambda r: (r["objective"], r["nSelected"]),
+}
+
+
+class PointingEvaluator:
+    """
+    Evaluates one configuration (center and position angle) of a target list
+    """
+
+    def __init__(self, targetList, instrument, minSlitLength, minSep, boxSize, mode="greedy", badColumnDist=DefaultBadColumnDist, margin=0):
+        """
+        Candidates are the targets inside the mask, not in the guider FOV nor on a bad column, see MaskGeometry.classify
+        margin: mask margin for the slits crossing the mask edges, see TargetList.fitSlits
+        """
+        self.targetList = targetList
+        self.instrument = instrument
+        self.margin = margin
+        self.geometry = geometry = getMaskGeometry(instrument)
+        self.mask = geometry.mask
+        self.minX, self.maxX = geometry.minX, geometry.maxX
+        self.badColumnDist = badColumnDist
+        self.minSlitLength = minSlitLength
+        self.minSep = minSep
+        self.boxSize = boxSize
+        self.mode = mode
+
+    def evaluate(self, raDeg, decDeg, paDeg):
+        """
+        Returns the number of selected targets and the total priority, alignment boxes not included.
+        The target list itself is not changed, the candidates are copied into a new TargetList,
+        and selected and fitted to the mask edges by TargetList.select and TargetList.fitSlits.
+        """
+        tlist = self.targetList
+        telRaRad, telDecRad = tlist._fld2telax(raDeg, decDeg, paDeg)
+        engine = tlist.getProjectionEngine()
+        cullRadius = tlist.getCullRadius()
+        if cullRadius > 0:
+            xarcs, yarcs = engine.projectNear(telRaRad, telDecRad, paDeg, raDeg, decDeg, cullRadius)
+        else:
+            xarcs, yarcs = engine.project(telRaRad, telDecRad, paDeg)
+
+        inside = np.flatnonzero(self.geometry.classify(xarcs, yarcs, self.badColumnDist) == StatusInside)
+        if len(inside) == 0:
+            return 0, 0
+
+        """ As maskPlanner._selectMask """
+        tgs = tlist.targets.iloc[inside].reset_index(drop=True)
+        candidates = TargetList(tgs.assign(orgIndex=np.arange(len(tgs), dtype=np.int32)), raDeg, decDeg, paDeg, tlist.config)
+        candidates.select(np.arange(len(tgs)), self.minX, self.maxX, self.minSlitLength, self.minSep, self.boxSize, self.mode)
+        candidates.fitSlits(self.minSlitLength, self.instrument, self.margin)
+
+        pcodes = candidates.targets.pcode.to_numpy()[candidates.targets.inMask.to_numpy() == 1]
+        pcodes = pcodes[pcodes > 0]
+        return len(pcodes), int(pcodes.sum())
+
+
+"""
+Evaluator of the worker process, see _initWorker
+"""
+_evaluator = None
+
+
+def _initWorker(targets, config, evalArgs):
+    global _evaluator
+    tlist = TargetList(targets, config=config)
+    _evaluator = PointingEvaluator(tlist, *evalArgs)
+
+
+def _evaluateChunk(pointings):
+    return [_evaluator.evaluate(*p) for p in pointings]
+
+
+class MaskOptimizer:
+    def __init__(self, targetList, config, minSlitLength=8, minSep=0.5, boxSize=4, mode="greedy", nProcs=None):
+        """
+        targetList: TargetList
+        config: configuration, used for the instrument and by the target lists of the workers
+        nProcs: number of worker processes, None for all cores, 1 to evaluate in this process
+        """
+        self.targetList = targetList
+        self.config = config
+        instrument = config.getValue("Instrument", "deimos") if config is not None else "deimos"
+        badColumnDist = config.getValue("badColumnDist", DefaultBadColumnDist) if config is not None else DefaultBadColumnDist
+        margin = config.getValue("maskMargin", 0) if config is not None else 0
+        self.evalArgs = (instrument, minSlitLength, minSep, boxSize, mode, badColumnDist, margin)
+        self.nProcs = nProcs or os.cpu_count() or 1
+
+    def _grid(self, pa0, dx0, dy0, paSteps, paStep, offSteps, offStep):
+        """
+        Returns a list of configurations (paDeg, dxArcsec, dyArcsec) around (pa0, dx0, dy0),
+        paSteps and offSteps steps on each side. Position angles are normalized to [-180, 180).
+        """
+        pas = (pa0 + paStep * np.arange(-paSteps, paSteps + 1) + 180) % 360 - 180
+        dxs = dx0 + offStep * np.arange(-offSteps, offSteps + 1)
+        dys = dy0 + offStep * np.arange(-offSteps, offSteps + 1)
+        return [(float(p), float(dx), float(dy)) for p in pas for dx in dxs for dy in dys]
+
+    @staticmethod
+    def _key(config):
+        return tuple(round(v, 6) for v in config)
+
+    def _unique(self, configs, done):
+        """
+        Returns the configurations that are not in done, and adds them to done.
+        """
+        out = []
+        for c in configs:
+            key = self._key(c)
+            if key not in done:
+                done.add(key)
+                out.append(c)
+        return out
+
+    def _evaluate(self, raDeg, decDeg, configs, pool):
+        """
+        Returns a list of results, one dict per configuration.
+        Offsets are east and north on the sky, in arcsec.
+        """
+        cosDec = max(math.cos(math.radians(decDeg)), 1e-6)
+        pointings = [(raDeg + dx / 3600 / cosDec, decDeg + dy / 3600, pa) for pa, dx, dy in configs]
+        if pool is None:
+            evaluator = PointingEvaluator(self.targetList, *self.evalArgs)
+            scores = [evaluator.evaluate(*p) for p in pointings]
+        else:
+            chunkSize = max(1, len(pointings) // (4 * self.nProcs))
+            chunks = [pointings[i : i + chunkSize] for i in range(0, len(pointings), chunkSize)]
+            scores = [s for chunk in pool.map(_evaluateChunk, chunks) for s in chunk]
+
+        out = []
+        for (pa, dx, dy), (ra, dec, _), (nSelected, objective) in zip(configs, pointings, scores):
+            out.append(
+                {
+                    "raDeg": ra,
+                    "decDeg": dec,
+                    "paDeg": pa,
+                    "dxArcsec": dx,
+                    "dyArcsec": dy,
+                    "nSelected": nSelected,
+                    "objective": objective,
+                }
+            )
+        return out
+
+    def optimize(self, raDeg, decDeg, paDeg, paSpan=90, paStep=10, offsetMax=20, offsetStep=10, levels=2, nBest=5, rankBy="priority"):
+        """
+        Searches the best configurations around raDeg, decDeg and paDeg.
+
+        paSpan, paStep: position angles from paDeg - paSpan to paDeg + paSpan, in steps of paStep, in degrees
+        offsetMax, offsetStep: center offsets in arcsec, in steps of offsetStep, on both axes
+        levels: number of refinements, the steps are halved at each level,
+            the grid is refined around the nBest best configurations.
+        rankBy: "count" for the number of selected targets or "priority" for the total priority
+
+        Returns the nBest best configurations, best first.
+        """
+        if rankBy not in RankKeys:
+            raise ValueError(f"Unknown ranking {rankBy}, expected one of {tuple(RankKeys)}")
+        rankKey = RankKeys[rankBy]
+
+        paSteps = int(paSpan // paStep) if paStep > 0 else 0
+        offSteps = int(offsetMax // offsetStep) if offsetStep > 0 else 0
+        done = set()
+        configs = self._unique(self._grid(paDeg, 0, 0, paSteps, paStep, offSteps, offsetStep), done)
+
+        pool = None
+        if self.nProcs > 1:
+            initArgs = (self.targetList.targets, self.config, self.evalArgs)
+            context = multiprocessing.get_context("spawn")
+            pool = concurrent.futures.ProcessPoolExecutor(self.nProcs, mp_context=context, initializer=_initWorker, initargs=initArgs)
+        try:
+            results = self._evaluate(raDeg, decDeg, configs, pool)
+            for level in range(levels):
+                paStep, offsetStep = paStep / 2, offsetStep / 2
+                configs = []
+                for r in sorted(results, key=rankKey, reverse=True)[:nBest]:
+                    grid = self._grid(r["paDeg"], r["dxArcsec"], r["dyArcsec"], 1, paStep, 1 if offSteps > 0 else 0, offsetStep)
+                    configs += self._unique(grid, done)
+                results += self._evaluate(raDeg, decDeg, configs, pool)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return sorted(results, key=rankKey, reverse=True)[:nBest]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Searches the best position angle and center of a slitmask")
+    parser.add_argument("targetList", help="Target list file")
+    parser.add_argument("-c", "--config", dest="config_file", help="Configuration file", default="smdt.cfg", required=False)
+    parser.add_argument("-n", "--nbest", dest="nBest", type=int, default=5, help="Number of configurations to report")
+    parser.add_argument("--pa", dest="pa", type=float, default=None, help="Position angle, default from target list")
+    parser.add_argument("--paSpan", type=float, default=90, help="Position angles +/- paSpan around pa, in deg")
+    parser.add_argument("--paStep", type=float, default=10, help="Step of position angles, in deg")
+    parser.add_argument("--offsetMax", type=float, default=20, help="Maximum center offset, in arcsec")
+    parser.add_argument("--offsetStep", type=float, default=10, help="Step of center offsets, in arcsec")
+    parser.add_argument("--levels", type=int, default=2, help="Number of refinements")
+    parser.add_argument("--rankBy", choices=tuple(RankKeys), default="priority", help="Ranking of the configurations")
+    parser.add_argument("--mode", choices=("greedy", "optimal"), default="greedy", help="Selection mode")
+    parser.add_argument("--minSlitLength", type=float, default=8, help="Minimum slit length, in arcsec")
+    parser.add_argument("--minSep", type=float, default=0.5, help="Minimum separation of slits, in arcsec")
+    parser.add_argument("--boxSize", type=float, default=4, help="Size of alignment boxes, in arcsec")
+    parser.add_argument("-p", "--procs", dest="nProcs", type=int, default=None, help="Number of processes, default all cores")
+
+    args = parser.parse_args()
+
+    config = ConfigFile(args.config_file)
+    tlist = TargetList(args.targetList, config=config)
+    paDeg = tlist.positionAngle if args.pa is None else args.pa
+
+    optimizer = MaskOptimizer(tlist, config, args.minSlitLength, args.minSep, args.boxSize, args.mode, args.nProcs)
+    best = optimizer.optimize(
+        tlist.centerRADeg,
+        tlist.centerDEC,
+        paDeg,
+        paSpan=args.paSpan,
+        paStep=args.paStep,
+        offsetMax=args.offsetMax,
+        offsetStep=args.offsetStep,
+        levels=args.levels,
+        nBest=args.nBest,
+        rankBy=args.rankBy,
+    )
+    print("%12s %12s %8s %8s %8s %9s %10s" % ("RA", "DEC", "PA", "dX", "dY", "Selected", "Priority"))
+    for r in best:
+        print(
+            "%12s %12s %8.2f %8.2f %8.2f %9d %10d"
+            % (
+                utils.toSexagecimal(r["raDeg"] / 15),
+                utils.toSexagecimal(r["decDeg"], "+"),
+                r["paDeg"],
+                r["dxArcsec"],
+                r["dyArcsec"],
+                r["nSelected"],
+                r["objective"],
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Design of several masks from one target list
+
+Given K pointings (center RA/DEC and position angle), the targets are assigned to the masks,
+so that a target is on at most one mask. The slits of the masks are selected in a process pool,
+one mask per task, and the masks are saved as mask design files (MDF).
+
+Assignment:
+Each target (pcode > 0) inside several masks is assigned to one of them,
+either to the first mask in the order of the pointings,
+or, with rerank=True, in order of priority to the mask with the lowest total priority so far.
+Alignment and guide stars are candidates of every mask they are in.
+
+After the selection, targets that were not selected are assigned to another mask they are in,
+and the masks that got new candidates are selected again, keeping the slits of the previous pass
+as preselected (selected=1), together with the preselected targets of the catalog.
+This is repeated until no target is left or for at most K passes.
+
+Example:
+
+planner = MaskPlanner (targetList, config)
+masks = planner.plan ([(raDeg1, decDeg1, paDeg1), (raDeg2, decDeg2, paDeg2)])
+planner.writeMasks (masks, "field")
+
+Command line:
+
+python maskPlanner.py -c smdt.cfg -o field -p 10.1,41.5,30 -p 10.2,41.5,30 targets.lst
+
+Date: 2026-10-18
+"""
+
+import os
+import argparse
+import multiprocessing
+import concurrent.futures
+
+import numpy as np
+
+from smdtLibs.configFile import ConfigFile
+from smdtLogger import SMDTLogger
+from targets import TargetList
+from maskGeometry import getMaskGeometry, StatusInside, DefaultBadColumnDist
+from maskDesignFile import MaskDesignOutputFitsFile
+
+
+def _selectMask(targets, config, raDeg, decDeg, paDeg, selectArgs):
+    """
+    Selects the slits of one mask, runs in a worker process.
+    targets: candidates of the mask, all inside the mask
+    Returns the arrays inMask, length1 and length2 of the candidates.
+    """
+    minX, maxX, minSlitLength, minSep, boxSize, mode = selectArgs
+    tlist = TargetList(targets.reset_index(drop=True).assign(orgIndex=np.arange(len(targets), dtype=np.int32)), raDeg, decDeg, paDeg, config)
+    tlist.reCalcCoordinates(raDeg, decDeg, paDeg)
+    tlist.select(np.arange(len(targets)), minX, maxX, minSlitLength, minSep, boxSize, mode)
+    tlist.fitSlits(minSlitLength)
+    tgs = tlist.targets
+    return tgs.inMask.to_numpy(), tgs.length1.to_numpy(), tgs.length2.to_numpy()
+
+
+class MaskPlanner:
+    def __init__(self, targetList, config, minSlitLength=8, minSep=0.5, boxSize=4, mode="greedy", nProcs=None):
+        """
+        targetList: TargetList with all targets
+        config: configuration, with params for the mask design files
+        nProcs: number of worker processes, None for all cores, 1 to select in this process
+        """
+        self.targetList = targetList
+        self.config = config
+        instrument = config.getValue("Instrument", "deimos") if config is not None else "deimos"
+        self.geometry = getMaskGeometry(instrument)
+        self.badColumnDist = config.getValue("badColumnDist", DefaultBadColumnDist) if config is not None else DefaultBadColumnDist
+        minX, maxX = self.geometry.minX, self.geometry.maxX
+        self.selectArgs = (minX, maxX, minSlitLength, minSep, boxSize, mode)
+        self.nProcs = nProcs or os.cpu_count() or 1
+
+    def insideMasks(self, pointings):
+        """
+        Returns a boolean array (K, N), True if target n is inside mask k,
+        not in the guider FOV nor on a bad column, see MaskGeometry.classify.
+        pointings: list of K (raDeg, decDeg, paDeg)
+        """
+        raDegs, decDegs, paDegs = np.array(pointings, dtype=np.float64).reshape(-1, 3).T
+        xarcs, yarcs = self.targetList.projectPointings(raDegs, decDegs, paDegs)
+        return self.geometry.classify(xarcs, yarcs, self.badColumnDist) == StatusInside
+
+    def assign(self, allowed, pcodes, rerank=False):
+        """
+        Returns the index of the mask of each target, -1 if none.
+        allowed: boolean array (K, N), True if target n can be assigned to mask k
+        rerank: False for the first allowed mask,
+            True to assign the targets in order of priority, each to the allowed mask with the lowest total priority.
+        """
+        nMasks, nTargets = allowed.shape
+        assignment = np.full(nTargets, -1)
+        anyMask = allowed.any(axis=0)
+        if not rerank:
+            assignment[anyMask] = np.argmax(allowed[:, anyMask], axis=0)
+            return assignment
+
+        loads = np.zeros(nMasks)
+        candidates = np.flatnonzero(anyMask)
+        for n in candidates[np.argsort(-pcodes[candidates], kind="stable")].tolist():
+            masks = np.flatnonzero(allowed[:, n])
+            k = masks[np.argmin(loads[masks])]
+            assignment[n] = k
+            loads[k] += pcodes[n]
+        return assignment
+
+    def plan(self, pointings, rerank=False, passes=None):
+        """
+        Assigns the targets and selects the slits of each mask.
+        pointings: list of K (raDeg, decDeg, paDeg)
+        rerank: see assign
+        passes: maximum number of passes, default K
+
+        Returns a list of K TargetList, one per mask, with all targets,
+        inMask=1 for the targets on the mask, see MaskDesignOutputFitsFile.
+        """
+        targets = self.targetList.targets
+        nMasks = len(pointings)
+        pcodes = targets.pcode.to_numpy()
+        science = pcodes > 0
+        others = pcodes < 0
+
+        inside = self.insideMasks(pointings)
+        tried = np.zeros(inside.shape, dtype=bool)
+        assignment = self.assign(inside & science, pcodes, rerank)
+        selectedIn = np.full(len(targets), -1)
+        inMasks = [np.zeros(len(targets), dtype=np.int8) for k in range(nMasks)]
+        lengths = [(targets.length1.to_numpy(copy=True), targets.length2.to_numpy(copy=True)) for k in range(nMasks)]
+
+        pool = None
+        if self.nProcs > 1 and nMasks > 1:
+            """ Spawned and not forked, as in MaskOptimizer """
+            pool = concurrent.futures.ProcessPoolExecutor(min(self.nProcs, nMasks), mp_context=multiprocessing.get_context("spawn"))
+        try:
+            changed = list(range(nMasks))
+            for p in range(passes or nMasks):
+                jobs = []
+                for k in changed:
+                    ids = np.flatnonzero((assignment == k) | (inside[k] & others))
+                    tried[k, ids] = True
+                    tgs = targets.iloc[ids].copy()
+                    if p > 0:
+                        """ Slits of the previous pass are placed first, with the preselected targets of the catalog """
+                        tgs["selected"] = (tgs.selected | (selectedIn[ids] == k)).astype(tgs.selected.dtype)
+                    args = (tgs, self.config, *pointings[k], self.selectArgs)
+                    jobs.append((k, ids, pool.submit(_selectMask, *args) if pool else _selectMask(*args)))
+
+                for k, ids, result in jobs:
+                    inMask, length1, length2 = result.result() if pool else result
+                    selectedIn[selectedIn == k] = -1
+                    selectedIn[ids[(inMask == 1) & science[ids]]] = k
+                    inMasks[k][:] = 0
+                    inMasks[k][ids] = inMask
+                    lengths[k][0][ids], lengths[k][1][ids] = length1, length2
+
+                """ Targets not selected go to the masks they were not tried in """
+                left = science & (selectedIn < 0)
+                assignment = np.where(left, -1, assignment)
+                newAssignment = self.assign(inside & ~tried & left, pcodes, rerank)
+                assignment = np.where(newAssignment >= 0, newAssignment, assignment)
+                changed = sorted(set(newAssignment[newAssignment >= 0].tolist()))
+                SMDTLogger.info(f"Pass {p}, {(selectedIn >= 0).sum()} targets selected, {len(changed)} masks to update")
+                if not changed:
+                    break
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        masks = []
+        for k, (raDeg, decDeg, paDeg) in enumerate(pointings):
+            tlist = TargetList(targets.copy(), raDeg, decDeg, paDeg, self._maskConfig(k, paDeg))
+            tlist.reCalcCoordinates(raDeg, decDeg, paDeg)
+            tlist.targets["inMask"] = inMasks[k]
+            tlist.targets["length1"], tlist.targets["length2"] = lengths[k]
+            masks.append(tlist)
+        return masks
+
+    def _maskConfig(self, k, paDeg):
+        """
+        Returns a copy of the configuration with the mask name and PA of mask k in the params,
+        MaskName_1, MaskName_2, ...
+        """
+        config = self.config
+        if config is None or config.params is None:
+            return config
+        params = ConfigFile(None)
+        params.properties = dict(config.params.properties)
+        params.properties["maskname"] = (f"{params.MaskName[0]}_{k + 1}",) + tuple(params.MaskName[1:])
+        params.properties["maskpa"] = (paDeg,) + tuple(params.MaskPA[1:])
+        maskConfig = ConfigFile(None)
+        maskConfig.properties = dict(config.properties, params=params)
+        return maskConfig
+
+    def writeMasks(self, masks, prefix):
+        """
+        Writes the mask design files prefix_1.fits, prefix_2.fits, ...
+        Returns the list of file names.
+        """
+        fileNames = []
+        for k, tlist in enumerate(masks):
+            fileName = f"{prefix}_{k + 1}.fits"
+            MaskDesignOutputFitsFile(tlist).writeTo(fileName)
+            fileNames.append(fileName)
+        return fileNames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Designs several slitmasks from one target list")
+    parser.add_argument("targetList", help="Target list file")
+    parser.add_argument("-c", "--config", dest="config_file", help="Configuration file", default="smdt.cfg", required=False)
+    parser.add_argument("-o", "--output", dest="prefix", default="mask", help="Prefix of the mask design files")
+    parser.add_argument("-p", "--pointing", dest="pointings", action="append", required=True, help="raDeg,decDeg,paDeg of a mask, once per mask")
+    parser.add_argument("--rerank", action="store_true", help="Distribute the targets over the masks by priority")
+    parser.add_argument("--mode", choices=("greedy", "optimal"), default="greedy", help="Selection mode")
+    parser.add_argument("--minSlitLength", type=float, default=8, help="Minimum slit length, in arcsec")
+    parser.add_argument("--minSep", type=float, default=0.5, help="Minimum separation of slits, in arcsec")
+    parser.add_argument("--boxSize", type=float, default=4, help="Size of alignment boxes, in arcsec")
+    parser.add_argument("-n", "--procs", dest="nProcs", type=int, default=None, help="Number of processes, default all cores")
+
+    args = parser.parse_args()
+
+    config = ConfigFile(args.config_file)
+    """ The parameter file is relative to the configuration file """
+    config.properties["params"] = ConfigFile(os.path.join(os.path.dirname(args.config_file), config.paramFile), split=True)
+    tlist = TargetList(args.targetList, config=config)
+    pointings = [tuple(float(v) for v in p.split(",")) for p in args.pointings]
+
+    planner = MaskPlanner(tlist, config, args.minSlitLength, args.minSep, args.boxSize, args.mode, args.nProcs)
+    masks = planner.plan(pointings, rerank=args.rerank)
+    for fileName, tlist in zip(planner.writeMasks(masks, args.prefix), masks):
+        tgs = tlist.targets
+        print(f"{fileName}: {((tgs.inMask == 1) & (tgs.pcode > 0)).sum()} targets")
+
+
+if __name__ == "__main__":
+    main()
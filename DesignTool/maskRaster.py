@@ -0,0 +1,198 @@
+"""
+Rasterized mask layouts for fast containment tests
+
+A layout of maskLayouts.py, a list of polygons (x, y, flag), is sampled once on a grid
+of square cells of size resolution, in arcsec. Each cell is outside, inside, or on the boundary.
+Most points are classified by a single lookup of their cell,
+only the points in boundary cells are checked exactly against the polygons.
+
+margin > 0 shrinks the polygons: points closer than margin to an edge are outside.
+margin < 0 grows them: points within -margin of an edge are inside,
+so that the bad columns, polygons without area, get a width.
+
+A cell is on the boundary if its center is closer than half the cell diagonal to an edge,
+or to the line at distance |margin| from the edges. Everywhere else the classification
+of the cell center holds for the whole cell.
+
+Example:
+
+raster = getMaskRaster ("deimos", "mask", margin=0.5)
+inside = raster.checkPoints (xarcs, yarcs)
+
+Date: 2026-10-18
+"""
+
+import math
+import threading
+import numpy as np
+
+from maskLayouts import MaskLayouts, GuiderFOVs, BadColumns
+
+"""
+Layouts by name, see getMaskRaster
+"""
+Layers = {"mask": MaskLayouts, "guiderFOV": GuiderFOVs, "badColumns": BadColumns}
+
+"""
+Default size of the cells, in arcsec
+"""
+DefaultResolution = 0.5
+
+Outside, Inside, Boundary = 0, 1, 2
+
+
+def layoutEdges(layout):
+    """
+    Returns the edges of the polygons of the layout, as arrays x1, y1, x2, y2.
+    Flag 2 closes the polygon, back to the point with flag 0.
+    """
+    if len(layout) and not isinstance(layout[0], (tuple, list)):
+        """ A single point """
+        layout = (layout,)
+    edges = []
+    x0 = y0 = xp = yp = 0
+    for x, y, flag in layout:
+        if flag == 0:
+            x0, y0 = x, y
+        elif flag == 1:
+            edges.append((xp, yp, x, y))
+        elif flag == 2:
+            """ Back to the first point, as in InOutChecker """
+            x, y = x0, y0
+            edges.append((xp, yp, x, y))
+        xp, yp = x, y
+    edges = np.array(edges, dtype=np.float64).reshape(-1, 4)
+    return edges[:, 0], edges[:, 1], edges[:, 2], edges[:, 3]
+
+
+class MaskRaster:
+    def __init__(self, layout, margin=0, resolution=DefaultResolution):
+        """
+        layout: list of polygons (x, y, flag), see maskLayouts.py
+        margin: in arcsec, > 0 to shrink, < 0 to grow the polygons
+        resolution: size of the cells in arcsec
+        """
+        self.margin = margin
+        self.resolution = resolution
+        self.edges = layoutEdges(layout)
+        self.x0, self.y0, self.cells = self._rasterize()
+
+    def _rasterize(self):
+        """
+        Returns the origin of the grid and the cells, array (ny, nx) of Outside, Inside or Boundary.
+        The grid covers the polygons with at least one cell around them.
+        """
+        x1, y1, x2, y2 = self.edges
+        res = self.resolution
+        if len(x1) == 0:
+            return 0.0, 0.0, np.zeros((0, 0), dtype=np.int8)
+
+        grow = max(-self.margin, 0) + res
+        xmin, xmax = min(x1.min(), x2.min()) - grow, max(x1.max(), x2.max()) + grow
+        ymin, ymax = min(y1.min(), y2.min()) - grow, max(y1.max(), y2.max()) + grow
+        nx, ny = int(math.ceil((xmax - xmin) / res)), int(math.ceil((ymax - ymin) / res))
+        xc = xmin + (np.arange(nx) + 0.5) * res
+        yc = ymin + (np.arange(ny) + 0.5) * res
+
+        """
+        Crossings: counts[row, k] is the number of edges that cross the row right of the first k cell centers.
+        Distances: only computed in a window around each edge, beyond cut they do not matter.
+        """
+        counts = np.zeros((ny, nx + 1), dtype=np.int32)
+        dists = np.full((ny, nx), np.inf)
+        cut = abs(self.margin) + res
+        for ax, ay, bx, by in zip(x1.tolist(), y1.tolist(), x2.tolist(), y2.tolist()):
+            if ay != by:
+                rows = np.flatnonzero((ay > yc) != (by > yc))
+                xCross = ax + (yc[rows] - ay) * (bx - ax) / (by - ay)
+                np.add.at(counts, (rows, np.searchsorted(xc, xCross)), 1)
+
+            r0, r1 = np.searchsorted(yc, (min(ay, by) - cut, max(ay, by) + cut))
+            c0, c1 = np.searchsorted(xc, (min(ax, bx) - cut, max(ax, bx) + cut))
+            xs, ys = xc[None, c0:c1], yc[r0:r1, None]
+            ex, ey = bx - ax, by - ay
+            lsq = ex * ex + ey * ey
+            t = np.clip(((xs - ax) * ex + (ys - ay) * ey) / lsq, 0, 1) if lsq > 0 else 0
+            np.minimum(dists[r0:r1, c0:c1], np.hypot(xs - ax - t * ex, ys - ay - t * ey), out=dists[r0:r1, c0:c1])
+
+        """ Cell j is left of the crossings counted at k > j """
+        crossings = (np.cumsum(counts[:, ::-1], axis=1)[:, ::-1][:, 1:] % 2).astype(bool)
+        inside = self._applyMargin(crossings, dists)
+
+        halfDiag = res * math.sqrt(0.5)
+        boundary = dists <= halfDiag
+        if self.margin != 0:
+            boundary |= np.abs(dists - abs(self.margin)) <= halfDiag
+        cells = np.where(boundary, Boundary, np.where(inside, Inside, Outside)).astype(np.int8)
+        return xmin, ymin, cells
+
+    def _classify(self, xs, ys):
+        """
+        Exact test, returns the inside flags and the distances to the edges of the points.
+        Inside a polygon is by the even-odd rule, then the margin is applied.
+        """
+        x1, y1, x2, y2 = self.edges
+        crossings = np.zeros(xs.shape, dtype=bool)
+        dists = np.full(xs.shape, np.inf)
+        for ax, ay, bx, by in zip(x1.tolist(), y1.tolist(), x2.tolist(), y2.tolist()):
+            if ay != by:
+                between = (ay > ys) != (by > ys)
+                xCross = ax + (ys - ay) * (bx - ax) / (by - ay)
+                crossings ^= between & (xs < xCross)
+            ex, ey = bx - ax, by - ay
+            lsq = ex * ex + ey * ey
+            t = np.clip(((xs - ax) * ex + (ys - ay) * ey) / lsq, 0, 1) if lsq > 0 else 0
+            dists = np.minimum(dists, np.hypot(xs - ax - t * ex, ys - ay - t * ey))
+
+        return self._applyMargin(crossings, dists), dists
+
+    def _applyMargin(self, crossings, dists):
+        """
+        Returns the inside flags, given the parity of the crossings and the distances to the edges
+        """
+        if self.margin > 0:
+            return crossings & (dists >= self.margin)
+        if self.margin < 0:
+            return crossings | (dists <= -self.margin)
+        return crossings
+
+    def checkPoints(self, xs, ys):
+        """
+        Returns an array of booleans, True if the point (x, y) is inside.
+        Points with NaN coordinates are outside.
+        """
+        xs, ys = np.broadcast_arrays(np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64))
+        inside = np.zeros(xs.shape, dtype=bool)
+        ny, nx = self.cells.shape
+        with np.errstate(invalid="ignore"):
+            ix = np.floor((xs - self.x0) / self.resolution)
+            iy = np.floor((ys - self.y0) / self.resolution)
+        valid = (0 <= ix) & (ix < nx) & (0 <= iy) & (iy < ny)
+        codes = self.cells[iy[valid].astype(np.intp), ix[valid].astype(np.intp)]
+        inside[valid] = codes == Inside
+
+        """ Points in boundary cells """
+        refine = np.flatnonzero(valid)[codes == Boundary]
+        if len(refine):
+            px, py = xs.ravel()[refine], ys.ravel()[refine]
+            inside.ravel()[refine] = self._classify(px, py)[0]
+        return inside
+
+
+_rasterCache = {}
+_rasterLock = threading.Lock()
+
+
+def getMaskRaster(instrument, layer="mask", margin=0, resolution=DefaultResolution):
+    """
+    Returns the raster of a layout, built once per instrument, layer, margin and resolution.
+    layer: "mask", "guiderFOV" or "badColumns", see Layers
+    Instruments without the layer get an empty raster, all points are outside.
+    """
+    key = (instrument.lower(), layer, margin, resolution)
+    with _rasterLock:
+        raster = _rasterCache.get(key)
+        if raster is None:
+            raster = MaskRaster(Layers[layer].get(key[0], ()), margin, resolution)
+            _rasterCache[key] = raster
+        return raster
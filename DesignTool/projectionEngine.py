@@ -0,0 +1,207 @@
+"""
+Projection of targets to the focal plane
+
+The unit vectors of the targets are calculated once per target list.
+A new pointing (telescope axis RA/DEC and position angle) is then a rotation of the unit vectors,
+plus a few arithmetic operations per target, without trigonometric functions of the targets coordinates.
+
+The projection is the one of dsimulator: the distance r and position angle p of a target from the axis
+give xarcs, yarcs = tan(r) * cos(posAngle - p), tan(r) * sin(posAngle - p), in arcsec.
+
+Many pointings can be projected at once, the result is a (pointings x targets) block.
+The pointings are processed in chunks, so that the temporary arrays stay below maxBytes.
+
+To skip targets far from the field, the unit vectors are binned in a grid of cubic cells.
+Only the targets in the cells around the pointing are checked and projected, see projectNear.
+
+Example:
+
+engine = ProjectionEngine (raHours, decDegs)
+xarcs, yarcs = engine.project (telRaRad, telDecRad, posAngleDeg)
+xarcs, yarcs = engine.projectMany (telRaRads, telDecRads, posAngleDegs)
+xarcs, yarcs = engine.projectNear (telRaRad, telDecRad, posAngleDeg, raDeg, decDeg, radiusDeg)
+
+Date: 2026-10-18
+"""
+
+import math
+import numpy as np
+
+"""
+Default limit of the temporary arrays in projectMany
+"""
+ChunkBytes = 64 * 1024 * 1024
+
+
+class ProjectionEngine:
+    """
+    Estimated number of temporary float64 arrays per pointing in _project
+    """
+    TempsPerPointing = 12
+
+    def __init__(self, raHours, decDegs):
+        """
+        raHours, decDegs: coordinates of the targets
+        """
+        raRad = np.radians(np.asarray(raHours, dtype=np.float64) * 15)
+        self.decRad = np.radians(np.asarray(decDegs, dtype=np.float64))
+        cosDec = np.cos(self.decRad)
+        """ Unit vectors, one row per target """
+        self.vectors = np.column_stack((cosDec * np.cos(raRad), cosDec * np.sin(raRad), np.sin(self.decRad)))
+        self._grid = None
+
+    def __len__(self):
+        return self.decRad.shape[0]
+
+    @staticmethod
+    def rotationMatrix(ra0Rad, dec0Rad):
+        """
+        Returns the matrix that rotates unit vectors to the frame of the pointing.
+        Rows are: east (cosDec * sinDeltaRA), north and pointing direction (cos of distance).
+        If ra0Rad and dec0Rad are arrays of length M, returns M matrices, shape (M, 3, 3).
+        """
+        sinRa0, cosRa0 = np.sin(ra0Rad), np.cos(ra0Rad)
+        sinDec0, cosDec0 = np.sin(dec0Rad), np.cos(dec0Rad)
+        rows = (
+            (-sinRa0, cosRa0, np.zeros_like(sinRa0)),
+            (-sinDec0 * cosRa0, -sinDec0 * sinRa0, cosDec0),
+            (cosDec0 * cosRa0, cosDec0 * sinRa0, sinDec0),
+        )
+        return np.moveaxis(np.array(rows, dtype=np.float64), (0, 1), (-2, -1))
+
+    def project(self, ra0Rad, dec0Rad, posAngle):
+        """
+        Returns xarcs, yarcs in focal plane coordinates in arcsec.
+        ra0Rad and dec0Rad must be calculated via TargetList._fld2telax().
+        """
+        xs, ys = self._project(np.array([ra0Rad]), np.array([dec0Rad]), np.array([posAngle]))
+        return xs[0], ys[0]
+
+    def projectNear(self, ra0Rad, dec0Rad, posAngle, raDeg, decDeg, radiusDeg):
+        """
+        Same as project, but only for the targets within radiusDeg of raDeg/decDeg, see nearby.
+        The other targets are not projected, their xarcs and yarcs are nan.
+        """
+        idx = self.nearby(raDeg, decDeg, radiusDeg)
+        xarcs = np.full(len(self), np.nan)
+        yarcs = np.full(len(self), np.nan)
+        xs, ys = self._project(np.array([ra0Rad]), np.array([dec0Rad]), np.array([posAngle]), idx)
+        xarcs[idx], yarcs[idx] = xs[0], ys[0]
+        return xarcs, yarcs
+
+    def nearby(self, raDeg, decDeg, radiusDeg):
+        """
+        Returns the sorted indices of the targets within radiusDeg of raDeg/decDeg.
+
+        The grid cells have the size of the chord of radiusDeg,
+        so that at most 3x3x3 cells around the center have to be checked.
+        The grid is rebuilt if the radius changes.
+        """
+        if radiusDeg <= 0 or radiusDeg >= 60:
+            return np.arange(len(self))
+
+        chord = 2 * math.sin(math.radians(radiusDeg) / 2)
+        if self._grid is None or self._grid[0] != chord:
+            self._grid = (chord,) + self._buildGrid(chord)
+        cellSize, nCells, cellKeys, starts, ends, order = self._grid
+
+        raRad, decRad = math.radians(raDeg), math.radians(decDeg)
+        center = np.array((math.cos(decRad) * math.cos(raRad), math.cos(decRad) * math.sin(raRad), math.sin(decRad)))
+        lo = np.clip(np.floor((center - chord + 1) / cellSize), 0, nCells - 1).astype(np.int64)
+        hi = np.clip(np.floor((center + chord + 1) / cellSize), 0, nCells - 1).astype(np.int64)
+        i, j, k = np.meshgrid(*[np.arange(a, b + 1) for a, b in zip(lo, hi)], indexing="ij")
+        keys = ((i * nCells + j) * nCells + k).ravel()
+
+        pos = np.searchsorted(cellKeys, keys)
+        valid = pos < len(cellKeys)
+        pos, keys = pos[valid], keys[valid]
+        pos = pos[cellKeys[pos] == keys]
+        if len(pos) == 0:
+            return np.zeros(0, dtype=np.int64)
+        candidates = np.concatenate([order[starts[p] : ends[p]] for p in pos])
+
+        """ Exact check, cos of the distance """
+        inside = self.vectors[candidates] @ center >= math.cos(math.radians(radiusDeg))
+        return np.sort(candidates[inside])
+
+    def _buildGrid(self, cellSize):
+        """
+        Bins the unit vectors in cubic cells of size cellSize.
+        Returns number of cells per axis, sorted keys of the non-empty cells,
+        start and end of each cell in order, and order, the indices of the targets sorted by cell.
+        """
+        nCells = int(math.ceil(2 / cellSize)) + 1
+        ijk = np.floor((self.vectors + 1) / cellSize).astype(np.int64)
+        keys = (ijk[:, 0] * nCells + ijk[:, 1]) * nCells + ijk[:, 2]
+        order = np.argsort(keys, kind="stable")
+        cellKeys, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+        return nCells, cellKeys, starts, starts + counts, order
+
+    def projectMany(self, ra0Rads, dec0Rads, posAngles, maxBytes=ChunkBytes, transform=None):
+        """
+        Projects the targets for M pointings.
+        ra0Rads, dec0Rads: telescope axis as calculated via TargetList._fld2telax(), in radians
+        posAngles: position angles in degrees
+        The inputs are broadcast to the same length M.
+        transform: optional function (xs, ys) -> (xs, ys), applied to each chunk, ie. distortion.
+
+        Returns xarcs, yarcs, arrays of shape (M, N), N being the number of targets.
+        """
+        ra0Rads, dec0Rads, posAngles = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(ra0Rads, dtype=np.float64)),
+            np.atleast_1d(np.asarray(dec0Rads, dtype=np.float64)),
+            np.atleast_1d(np.asarray(posAngles, dtype=np.float64)),
+        )
+        nPointings = ra0Rads.shape[0]
+        xarcs = np.empty((nPointings, len(self)))
+        yarcs = np.empty((nPointings, len(self)))
+        """ The transform is assumed to need as many temporary arrays as the projection """
+        temps = self.TempsPerPointing * (1 if transform is None else 2)
+        for sl in self.chunks(nPointings, maxBytes, temps):
+            xs, ys = self._project(ra0Rads[sl], dec0Rads[sl], posAngles[sl])
+            if transform is not None:
+                xs, ys = transform(xs, ys)
+            xarcs[sl], yarcs[sl] = xs, ys
+        return xarcs, yarcs
+
+    def chunks(self, nPointings, maxBytes=ChunkBytes, temps=TempsPerPointing):
+        """
+        Returns the slices of pointings, so that the temporary arrays of one slice fit in maxBytes.
+        temps: number of temporary float64 arrays per pointing
+        """
+        perPointing = max(1, len(self)) * 8 * temps
+        step = max(1, int(maxBytes // perPointing))
+        return [slice(i, min(i + step, nPointings)) for i in range(0, nPointings, step)]
+
+    def _project(self, ra0Rads, dec0Rads, posAngles, idx=None):
+        """
+        Returns xarcs, yarcs of shape (M, N) for M pointings.
+        idx: indices of the targets to project, None for all.
+        """
+        vectors, decRad = (self.vectors, self.decRad) if idx is None else (self.vectors[idx], self.decRad[idx])
+        rot = self.rotationMatrix(ra0Rads, dec0Rads)
+        east, north, cosr = np.moveaxis(rot @ vectors.T, 1, 0)
+        south = decRad[np.newaxis, :] < dec0Rads[:, np.newaxis]
+        return self._toFocalPlane(east, north, cosr, south, posAngles[:, np.newaxis])
+
+    @staticmethod
+    def _toFocalPlane(east, north, cosr, south, posAngle):
+        """
+        Same as the second half of dsimulator's tel_coords:
+        east, north, cosr: unit vectors in the frame of the pointing,
+        south: True if target is south of the pointing.
+
+        sinr is the length of (east, north), more accurate than sqrt(1 - cosr^2)
+        for targets close to the pointing.
+        """
+        pa0 = np.radians(posAngle)
+        sinr = np.hypot(east, north)
+        isZero = sinr == 0.0
+        sinp = np.where(isZero, 0, east) / np.where(isZero, 1, sinr)
+        cosp = np.sqrt(np.abs(1.0 - sinp * sinp)) * np.where(south, -1, 1)
+
+        """ Same as cos(pa0 - p) and sin(pa0 - p), with p = arctan2(sinp, cosp) """
+        norm = np.hypot(sinp, cosp)
+        cosPA0, sinPA0 = np.cos(pa0), np.sin(pa0)
+        rArcsec = sinr / cosr * math.degrees(1) * 3600 / norm
+        return rArcsec * (cosPA0 * cosp + sinPA0 * sinp), rArcsec * (sinPA0 * cosp - cosPA0 * sinp)
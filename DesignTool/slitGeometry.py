@@ -0,0 +1,208 @@
+"""
+Geometry of the slits on the mask
+
+A slit is a quadrilateral, built from the target position, length1, length2, slitWidth
+and the slit PA relative to the mask PA, the same as the slits written by MaskDesignOutputFitsFile.genBluSlits.
+
+Conflicts, ie. slits that overlap or are closer than minSep, are found with a sweep line over x:
+the slits are sorted by the left end of their bounding box, the active set of a slit
+are the following slits that start before its right end. Only these pairs are checked
+for overlap in y, and then exactly with the separating axis test
+and the distances between corners and edges.
+The cost is O(N log N) plus the number of pairs in the active sets,
+instead of all N^2 pairs.
+
+Example:
+
+xs, ys = slitCorners (xarcs, yarcs, length1, length2, halfWidths, relPAs)
+pairs = findConflicts (xs, ys, minSep)
+drop = resolveConflicts (pairs, priorities)
+
+Date: 2026-10-18
+"""
+
+import numpy as np
+
+
+def slitCorners(xarcs, yarcs, length1, length2, halfWidths, relPAs):
+    """
+    Returns xs, ys, arrays (N, 4) with the corners of the slits, in the order of genBluSlits:
+    corners 1 and 2 at the length1 end, corners 3 and 4 at the length2 end.
+    relPAs: mask PA minus slit PA, in degrees
+    halfWidths: offsets in y of the corners from the slit axis
+    """
+    relAngles = np.radians(np.asarray(relPAs, dtype=np.float64))
+    sines, cosines = np.sin(relAngles), np.cos(relAngles)
+    xarcs, yarcs = np.asarray(xarcs, dtype=np.float64), np.asarray(yarcs, dtype=np.float64)
+    length1, length2 = np.asarray(length1, dtype=np.float64), np.asarray(length2, dtype=np.float64)
+    half = np.asarray(halfWidths, dtype=np.float64)
+
+    x10, y10 = xarcs + cosines * length1, yarcs + sines * length1
+    x30, y30 = xarcs - cosines * length2, yarcs - sines * length2
+    xs = np.stack(np.broadcast_arrays(x10, x10, x30, x30), axis=-1)
+    ys = np.stack(np.broadcast_arrays(y10 - half, y10 + half, y30 - half, y30 + half), axis=-1)
+    return xs, ys
+
+
+"""
+Order of the corners along the outline of the slit, see slitCorners
+"""
+Outline = [0, 1, 3, 2]
+
+
+def _candidatePairs(xs, ys, minSep):
+    """
+    Returns the pairs (i, j) of slits whose bounding boxes, extended by minSep, overlap.
+    Sweep line over x: for slit i, sorted by left end, the active set is the range of slits
+    that start before the right end of i plus minSep, found by bisection.
+    """
+    xmin, xmax = xs.min(axis=1), xs.max(axis=1)
+    ymin, ymax = ys.min(axis=1), ys.max(axis=1)
+    order = np.argsort(xmin, kind="stable")
+    sortedMin = xmin[order]
+    ends = np.searchsorted(sortedMin, xmax[order] + minSep, side="right")
+    starts = np.arange(1, len(order) + 1)
+    counts = np.maximum(ends - starts, 0)
+
+    """ Pairs (i, j), i before j in the sorted order, j in the active set of i """
+    first = np.repeat(np.arange(len(order)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    second = first + 1 + offsets
+    i, j = order[first], order[second]
+
+    overlapY = (ymin[i] < ymax[j] + minSep) & (ymin[j] < ymax[i] + minSep)
+    return i[overlapY], j[overlapY]
+
+
+def _separated(xs, ys, i, j):
+    """
+    Separating axis test for the convex slits i and j,
+    True if the projections on one of the edge normals do not overlap, ie. the slits do not overlap.
+    """
+    px, py = xs[:, Outline], ys[:, Outline]
+    separated = np.zeros(len(i), dtype=bool)
+    for a, b in ((i, j), (j, i)):
+        for k in range(4):
+            k1 = (k + 1) % 4
+            nx, ny = py[a, k1] - py[a, k], px[a, k] - px[a, k1]
+            projA = px[a] * nx[:, None] + py[a] * ny[:, None]
+            projB = px[b] * nx[:, None] + py[b] * ny[:, None]
+            gap = np.maximum(projB.min(axis=1) - projA.max(axis=1), projA.min(axis=1) - projB.max(axis=1))
+            separated |= ((nx != 0) | (ny != 0)) & (gap >= 0)
+    return separated
+
+
+def _distances(xs, ys, i, j):
+    """
+    Distances between the outlines of the slits i and j, the smallest distance of a corner
+    of one slit to an edge of the other.
+    """
+    px, py = xs[:, Outline], ys[:, Outline]
+    dist = np.full(len(i), np.inf)
+    for a, b in ((i, j), (j, i)):
+        for k in range(4):
+            k1 = (k + 1) % 4
+            x0, y0 = px[a, k][:, None], py[a, k][:, None]
+            ex, ey = px[a, k1][:, None] - x0, py[a, k1][:, None] - y0
+            lsq = ex * ex + ey * ey
+            t = np.clip(((px[b] - x0) * ex + (py[b] - y0) * ey) / np.where(lsq > 0, lsq, 1), 0, 1)
+            d = np.hypot(px[b] - x0 - t * ex, py[b] - y0 - t * ey)
+            dist = np.minimum(dist, d.min(axis=1))
+    return dist
+
+
+def findConflicts(xs, ys, minSep=0):
+    """
+    Returns an array (M, 2) of pairs of slits that overlap or are closer than minSep.
+    xs, ys: corners of the slits, see slitCorners
+    """
+    xs, ys = np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64)
+    i, j = _candidatePairs(xs, ys, minSep)
+    conflict = ~_separated(xs, ys, i, j)
+    if minSep > 0:
+        conflict |= _distances(xs, ys, i, j) < minSep
+    pairs = np.column_stack((np.minimum(i, j), np.maximum(i, j)))[conflict]
+    return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))] if len(pairs) else pairs.reshape(0, 2)
+
+
+def resolveConflicts(pairs, priorities):
+    """
+    Returns the sorted indices of the slits to remove, so that no conflict is left.
+    Slits are kept in order of priority, a slit is removed if it conflicts with a slit that is kept.
+    """
+    priorities = np.asarray(priorities)
+    neighbours = {}
+    for a, b in pairs.tolist():
+        neighbours.setdefault(a, []).append(b)
+        neighbours.setdefault(b, []).append(a)
+
+    removed = set()
+    for s in sorted(neighbours, key=lambda s: (-priorities[s], s)):
+        if s in removed:
+            continue
+        """ Neighbours with higher priority were removed, or s would be removed """
+        removed.update(neighbours[s])
+    return np.array(sorted(removed), dtype=np.int64)
+
+
+def slitPriorities(pcodes, selected):
+    """
+    Returns the priorities for resolveConflicts: alignment boxes and guide stars first,
+    then preselected targets, then by pcode.
+    """
+    pcodes = np.asarray(pcodes, dtype=np.float64)
+    return np.where(pcodes < 0, np.inf, pcodes + np.asarray(selected) * (pcodes.max(initial=0) + 1))
+
+
+def fitSlitLengths(xarcs, yarcs, length1, length2, halfWidths, relPAs, pcodes, minSlitLength, raster, step=0.5):
+    """
+    Trims the slits that cross an edge of the mask, see TargetList.fitSlits.
+    The corners of each half of a slit are tested every step arcsec from the target outwards,
+    in one array call, and the half is cut at the first corner outside, refined by bisection.
+    raster: containment test with checkPoints, see MaskRaster
+
+    Returns lengths, trimmed, removed:
+    lengths is an array (N, 2) of the new length1 and length2, rounded down to float32,
+    trimmed and removed are boolean arrays.
+    Slits shorter than minSlitLength after trimming, alignment boxes crossing an edge,
+    and slits with corners outside next to the target are removed.
+    """
+    xarcs, yarcs = np.asarray(xarcs, dtype=np.float64)[:, None], np.asarray(yarcs, dtype=np.float64)[:, None]
+    half = np.asarray(halfWidths, dtype=np.float64)[:, None]
+    relPAs = np.asarray(relPAs, dtype=np.float64)[:, None]
+    lengths = np.column_stack((np.asarray(length1, dtype=np.float64), np.asarray(length2, dtype=np.float64)))
+
+    def cornersInside(dists):
+        """
+        dists: array (N, K, 2) of distances from the target, for the length1 and the length2 half.
+        Returns an array (N, K, 2), True if both corners at the distance are inside.
+        """
+        xs, ys = slitCorners(xarcs, yarcs, dists[..., 0], dists[..., 1], half, relPAs)
+        inside = raster.checkPoints(xs, ys)
+        return np.stack((inside[..., 0] & inside[..., 1], inside[..., 2] & inside[..., 3]), axis=-1)
+
+    nSamples = int(np.ceil(lengths.max(initial=0) / step)) + 1
+    dists = np.minimum(np.arange(nSamples)[None, :, None] * step, lengths[:, None, :])
+    inside = np.logical_and.accumulate(cornersInside(dists), axis=1)
+    nInside = inside.sum(axis=1)
+
+    """ Each half is between the last distance inside and the first outside """
+    crossing = nInside < nSamples
+    rows, ends = np.nonzero(crossing)
+    lo, hi = lengths.copy(), lengths.copy()
+    lo[crossing] = dists[rows, np.maximum(nInside[crossing] - 1, 0), ends]
+    hi[crossing] = dists[rows, np.minimum(nInside[crossing], nSamples - 1), ends]
+    for i in range(10):
+        mid = (lo + hi) / 2
+        good = cornersInside(mid[:, None, :])[:, 0, :]
+        lo, hi = np.where(good, mid, lo), np.where(good, hi, mid)
+
+    trimmed = crossing.any(axis=1)
+    pcodes = np.asarray(pcodes)
+    removed = (nInside == 0).any(axis=1) | (trimmed & ((pcodes <= 0) | (lo.sum(axis=1) < minSlitLength)))
+    trimmed &= ~removed
+
+    """ Rounded down to float32, so that the corners stay inside """
+    newLengths = lo.astype(np.float32)
+    newLengths = np.where(newLengths > lo, np.nextafter(newLengths, np.float32(0)), newLengths)
+    return np.where(trimmed[:, None], newLengths, lengths.astype(np.float32)), trimmed, removed
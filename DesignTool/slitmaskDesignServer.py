@@ -106,7 +106,7 @@ class SMDesignHandler(EasyHTTPHandler):
     def getMaskLayout(self, req, qstr):
         sm = _getData("smdt")
         inst = self.getDefValue(qstr, "instrument", "deimos")
-        return json.dumps(sm.getMaskLayout(inst)), self.PlainTextType
+        return sm.getMaskLayoutJson(inst), self.PlainTextType
 
     @utils.tryEx
     def recalculateMask(self, req, qstr):
@@ -118,12 +118,46 @@ class SMDesignHandler(EasyHTTPHandler):
         minSep = self.floatVal(qstr, "minSepAs", 0.5)
         minSlitLength = self.floatVal(qstr, "minSlitLengthAs", 8)
         boxSize = self.floatVal(qstr, "boxSize", 4)
+        mode = self.getDefValue(qstr, "selectionMode", "greedy")
+        incremental = self.getDefValue(qstr, "incremental", "false").lower() in ("true", "1")
+        extend = self.getDefValue(qstr, "extendSlits", "false").lower() in ("true", "1")
         parts = vals.split(",")
         if len(parts):
             targetIdx = [int(x) for x in vals.split(",")]
-            sm.recalculateMask(targetIdx, currRaDeg, currDecDeg, currAngleDeg, minSlitLength, minSep, boxSize)
-            return sm.targetList.toJson(), self.PlainTextType
-        return sm.targetList.toJson(), self.PlainTextType
+            sm.recalculateMask(targetIdx, currRaDeg, currDecDeg, currAngleDeg, minSlitLength, minSep, boxSize, mode, incremental, extend)
+        return sm.targetList.toJsonWithSelection(), self.PlainTextType
+
+    @utils.tryEx
+    def optimizePointing(self, req, qstr):
+        """
+        Returns the best position angles and center offsets, see MaskOptimizer.optimize
+        """
+        sm = _getData("smdt")
+        currRaDeg = self.floatVal(qstr, "currRaDeg", 0)
+        currDecDeg = self.floatVal(qstr, "currDecDeg", 0)
+        currAngleDeg = self.floatVal(qstr, "currAngleDeg", 0)
+        minSep = self.floatVal(qstr, "minSepAs", 0.5)
+        minSlitLength = self.floatVal(qstr, "minSlitLengthAs", 8)
+        boxSize = self.floatVal(qstr, "boxSize", 4)
+        mode = self.getDefValue(qstr, "selectionMode", "greedy")
+        best = sm.optimizePointing(
+            currRaDeg,
+            currDecDeg,
+            currAngleDeg,
+            minSlitLength,
+            minSep,
+            boxSize,
+            mode,
+            nProcs=sm.config.getValue("serverProcs", 1),
+            paSpan=self.floatVal(qstr, "paSpan", 90),
+            paStep=self.floatVal(qstr, "paStep", 10),
+            offsetMax=self.floatVal(qstr, "offsetMax", 20),
+            offsetStep=self.floatVal(qstr, "offsetStep", 10),
+            levels=self.intVal(qstr, "levels", 2),
+            nBest=self.intVal(qstr, "nBest", 5),
+            rankBy=self.getDefValue(qstr, "rankBy", "priority"),
+        )
+        return json.dumps(best), self.PlainTextType
 
     @utils.tryEx
     def setColumnValue(self, req, qstr):
@@ -131,7 +165,7 @@ class SMDesignHandler(EasyHTTPHandler):
         value = self.getDefValue(qstr, "value", "")
         colName = self.getDefValue(qstr, "colName", "")
         if colName != "":
-            sm.targetList.targets[colName] = value
+            sm.targetList.setColum(colName, value)
         return "[]", self.PlainTextType
 
     @utils.tryEx
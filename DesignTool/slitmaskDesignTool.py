@@ -5,7 +5,6 @@ Created on Mar 23, 2018
 """
 
 import io
-import numpy as np
 
 import matplotlib
 
@@ -13,7 +12,8 @@ import smdtLibs.dss2Client as Dss2Client
 import smdtLibs.dss2Header as DSS2Header
 
 from targets import TargetList
-from maskLayouts import MaskLayouts, GuiderFOVs, BadColumns
+from maskOptimizer import MaskOptimizer
+from maskGeometry import getMaskGeometry
 
 import traceback
 
@@ -52,29 +52,51 @@ class SlitmaskDesignTool:
         Gets the mask layout, which is defined in maskLayout.py as a python data structure for convenience.
         MaskLayoput, GuiderFOV and Badcolumns are defined in maskLayouts.py
         
-        Returns a JSON with mask, guiderFOC and badColumns
+        Returns a dictionary with mask, guiderFOC and badColumns, see MaskGeometry.layoutInfo
         """
         try:
-            mask = MaskLayouts[instrument]  # a list of (x,y,flag), polygon vertices
-            guiderFOV = GuiderFOVs[instrument]  # list of (x, y, w, h, ang), boxes
-            badColumns = BadColumns[instrument]  # list of lines, as polygons
-            return {"mask": mask, "guiderFOV": guiderFOV, "badColumns": badColumns}
+            return getMaskGeometry(instrument).layoutInfo
         except Exception as e:
             traceback.print_exc()
             return ((0, 0, 0),)
 
-    def recalculateMask(self, targetIdx, raDeg, decDeg, paDeg, minSlitLength, minSep, boxSize):
+    def getMaskLayoutJson(self, instrument="deimos"):
+        """
+        Same as getMaskLayout, as JSON, built once per instrument.
+        Errors are raised, the server reports them, see utils.tryEx
+        """
+        return getMaskGeometry(instrument).layoutJson
+
+    def optimizePointing(self, raDeg, decDeg, paDeg, minSlitLength, minSep, boxSize, mode="greedy", nProcs=None, **kwargs):
+        """
+        Searches the best position angles and centers around raDeg, decDeg and paDeg.
+        kwargs: grid and ranking parameters, see MaskOptimizer.optimize
+        Returns a list of the best configurations, best first.
+        The target list is not changed.
+        """
+        optimizer = MaskOptimizer(self.targetList, self.config, minSlitLength, minSep, boxSize, mode, nProcs)
+        return optimizer.optimize(raDeg, decDeg, paDeg, **kwargs)
+
+    def recalculateMask(self, targetIdx, raDeg, decDeg, paDeg, minSlitLength, minSep, boxSize, mode="greedy", incremental=False, extend=False):
         """
         targetIdx: a list of indices of targets that are inside the mask
+        mode: selection mode, "greedy" or "optimal"
+        incremental: True to select again only around the targets changed since the last call, see TargetList.select
+        extend: True to extend the slits into the free space between them
         """
         targets = self.targetList
         targets.centerRADeg = raDeg
         targets.centerDEC = decDeg
         targets.positionAngle = paDeg
-        mask = MaskLayouts[self.config.get("Instrument").lower()]
-        minX, maxX = np.min(mask, axis=0)[0], np.max(mask, axis=0)[0]
+        instrument = self.config.get("Instrument")
+        geometry = getMaskGeometry(instrument)
+        minX, maxX = geometry.minX, geometry.maxX
 
         # Updates targets coordinates for the new center raDeg and decDeg
         targets.reCalcCoordinates(raDeg, decDeg, paDeg)
-        targets.select(targetIdx, minX, maxX, minSlitLength, minSep, boxSize)
+        # Targets in the guider FOV or on bad columns are not selected
+        targets.markInside(instrument)
+        targets.select(targetIdx, minX, maxX, minSlitLength, minSep, boxSize, mode, incremental, extend)
+        # Slits that cross the edges of the mask are trimmed or removed
+        targets.fitSlits(minSlitLength, instrument)
         # Results are stored in targets
@@ -87,6 +87,9 @@ class ConfigFile(ConfigParser):
             self.properties[sec] = digestItems(sec, self.properties)
 
     def __getattr__(self, key):
+        if key.startswith("__") or key == "properties":
+            """ Not a configuration value, ie. while unpickling in a worker process """
+            raise AttributeError(key)
         val = self.properties.get(key.lower())
         if val is not None:
             return val
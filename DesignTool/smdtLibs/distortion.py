@@ -0,0 +1,112 @@
+"""
+Evaluation of the distortion polynomials
+
+The distortion is given in the configuration as the coefficients of two astropy Polynomial2D models,
+one for X and one for Y, see distortionXCoeffs and distortionYCoeffs in smdt.cfg.
+
+DistortionModel evaluates both polynomials on arrays with numpy,
+using Horner's method in x over polynomials in y, see _horner.
+The results are the same as astropy's to numerical precision.
+
+Models are cached by coefficients, see getDistortionModel().
+
+Example:
+
+model = getDistortionModel (config)
+xs, ys = model.evaluate (xarcs, yarcs)
+
+Date: 2026-10-18
+"""
+
+import threading
+import numpy as np
+
+
+def polyPowers(degree):
+    """
+    Returns the list of powers (i, j) of x^i * y^j,
+    in the same order as the parameters of astropy Polynomial2D.
+    """
+    powers = [(i, 0) for i in range(degree + 1)]
+    powers += [(0, j) for j in range(1, degree + 1)]
+    powers += [(i, j) for i in range(1, degree) for j in range(1, degree + 1 - i)]
+    return powers
+
+
+def parseCoeffs(coeffs):
+    """
+    Returns the coefficients as a list of floats.
+    coeffs: comma separated string, as in the configuration file, or a sequence of numbers.
+    """
+    if isinstance(coeffs, str):
+        coeffs = coeffs.split(",")
+    return [float(x) for x in coeffs]
+
+
+class DistortionModel:
+    def __init__(self, xCoeffs, yCoeffs, degree=4):
+        """
+        xCoeffs, yCoeffs: coefficients of the X and Y polynomials, in astropy Polynomial2D order.
+        """
+        powers = polyPowers(degree)
+        self.degree = degree
+        self.xCoeffs = parseCoeffs(xCoeffs)
+        self.yCoeffs = parseCoeffs(yCoeffs)
+        for coeffs in (self.xCoeffs, self.yCoeffs):
+            if len(coeffs) != len(powers):
+                raise ValueError(f"Expected {len(powers)} coefficients for degree {degree}, got {len(coeffs)}")
+
+        """
+        matrix[k, i, j] is the coefficient of x^i * y^j of polynomial k, k=0 for X, k=1 for Y.
+        """
+        self.matrix = np.zeros((2, degree + 1, degree + 1))
+        for (i, j), cx, cy in zip(powers, self.xCoeffs, self.yCoeffs):
+            self.matrix[0, i, j] = cx
+            self.matrix[1, i, j] = cy
+
+    def evaluate(self, xs, ys):
+        """
+        Returns the distorted xs, ys.
+        xs, ys: arrays of the same shape.
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        return self._horner(self.matrix[0], xs, ys), self._horner(self.matrix[1], xs, ys)
+
+    def _horner(self, coeffs, xs, ys):
+        """
+        Evaluates sum coeffs[i, j] * x^i * y^j with Horner's method in x,
+        the coefficient of x^i being a polynomial in y of degree - i, also evaluated with Horner's method.
+        Operations are in place to avoid temporary arrays.
+        """
+        deg = self.degree
+        out = None
+        for i in range(deg, -1, -1):
+            qi = np.full(ys.shape, coeffs[i, deg - i])
+            for j in range(deg - i - 1, -1, -1):
+                qi *= ys
+                qi += coeffs[i, j]
+            if out is None:
+                out = qi
+            else:
+                out *= xs
+                out += qi
+        return out
+
+
+_modelCache = {}
+_modelLock = threading.Lock()
+
+
+def getDistortionModel(config):
+    """
+    Returns the distortion model defined in the configuration.
+    The model is built once per set of coefficients.
+    """
+    key = (config.getValue("distortionXCoeffs"), config.getValue("distortionYCoeffs"))
+    with _modelLock:
+        model = _modelCache.get(key)
+        if model is None:
+            model = DistortionModel(key[0], key[1])
+            _modelCache[key] = model
+        return model
@@ -5,6 +5,8 @@ import math
 import numpy as np
 import astropy.wcs as wcs
 
+from smdtLibs import utils
+
 
 class DssWCSHeader:
     def __init__(self, raDeg, decDeg, width, height):
@@ -115,17 +117,22 @@ class DssHeader:
         """
         width, height = int(self.xSize), int(self.ySize)
 
-        out = []
+        xs, ys = [], []
         for x in range(0, width, width // steps):
-            out.append(self.xy2rd(x, 0))
+            xs.append(x)
+            ys.append(0)
         for y in range(0, height, height // steps):
-            out.append(self.xy2rd(width, y))
+            xs.append(width)
+            ys.append(y)
         for x in range(width, 0, -width // steps):
-            out.append(self.xy2rd(x, height))
+            xs.append(x)
+            ys.append(height)
         for y in range(height, 0, -height // steps):
-            out.append(self.xy2rd(0, y))
+            xs.append(0)
+            ys.append(y)
 
-        return out
+        ras, decs = self._xy2rdArray(xs, ys)
+        return list(zip(ras.tolist(), decs.tolist()))
 
     def _getWCS(self):
         """ Extracts info from headers.
@@ -190,42 +197,8 @@ class DssHeader:
         obx = (self.ppo3 - (self.xpoff + x) * self.xpsize) / 1000.0
         oby = ((self.ypoff + y) * self.ypsize - self.ppo6) / 1000.0
 
-        obx2 = obx * obx
-        obx3 = obx2 * obx
-        oby2 = oby * oby
-        oby3 = oby2 * oby
-
-        xi = (
-            self.amdx[0] * obx
-            + self.amdx[1] * oby
-            + self.amdx[2]
-            + self.amdx[3] * obx2
-            + self.amdx[4] * obx * oby
-            + self.amdx[5] * oby2
-            + self.amdx[6] * (obx2 + oby2)
-            + self.amdx[7] * obx3
-            + self.amdx[8] * obx2 * oby
-            + self.amdx[9] * obx * oby2
-            + self.amdx[10] * oby3
-            + self.amdx[11] * obx * (obx2 + oby2)
-            + self.amdx[12] * obx * (obx2 + oby2) ** 2
-        )
-
-        eta = (
-            self.amdy[0] * oby
-            + self.amdy[1] * obx
-            + self.amdy[2]
-            + self.amdy[3] * oby2
-            + self.amdy[4] * oby * obx
-            + self.amdy[5] * obx2
-            + self.amdy[6] * (obx2 + oby2)
-            + self.amdy[7] * oby3
-            + self.amdy[8] * oby2 * obx
-            + self.amdy[9] * oby * obx2
-            + self.amdy[10] * obx3
-            + self.amdy[11] * oby * (obx2 + oby2)
-            + self.amdy[12] * oby * (obx2 + oby2) ** 2
-        )
+        xi = self._platePoly(self.amdx, obx, oby)
+        eta = self._platePoly(self.amdy, oby, obx)
 
         toRad = math.pi / 180
         raRad = self.raDeg * toRad
@@ -253,6 +226,32 @@ class DssHeader:
         dec = dec / toRad
         return ra, dec
 
+    def _xy2rdArray(self, xs, ys):
+        """
+        Same as _xy2rd for arrays of xs, ys in image pixel coordinates.
+        Returns ras, decs in degree as arrays.
+        """
+        obx = (self.ppo3 - (self.xpoff + np.asarray(xs, dtype=np.float64)) * self.xpsize) / 1000.0
+        oby = ((self.ypoff + np.asarray(ys, dtype=np.float64)) * self.ypsize - self.ppo6) / 1000.0
+
+        toRad = math.pi / 180
+        raRad = self.raDeg * toRad
+        decRad = self.decDeg * toRad
+        tanDec = math.tan(decRad)
+
+        xi = self._platePoly(self.amdx, obx, oby) * toRad / 3600
+        eta = self._platePoly(self.amdy, oby, obx) * toRad / 3600
+
+        ras = np.arctan2(xi / math.cos(decRad), 1.0 - eta * tanDec) + raRad
+
+        twopi = 2.0 * math.pi
+        ras = np.where(ras < 0, ras + twopi, np.where(ras > twopi, ras - twopi, ras))
+
+        numerator = np.cos(ras - raRad)
+        denominator = (1.0 - eta * tanDec) / (eta + tanDec)
+        decs = np.arctan(numerator / denominator)
+        return ras / toRad, decs / toRad
+
     def _rd2xy(self, ra, dec):
         """ given ra/dec in degree
             Returns x/y in image pixel coordinate
@@ -282,89 +281,10 @@ class DssHeader:
         deltx = 10.0
         delty = 10.0
         while min([abs(deltx), abs(delty)]) > tolerance and iters < maxiters:
-            obx2 = obx * obx
-            obx3 = obx2 * obx
-            oby2 = oby * oby
-            oby3 = oby2 * oby
-            f = (
-                self.amdx[0] * obx
-                + self.amdx[1] * oby
-                + self.amdx[2]
-                + self.amdx[3] * obx2
-                + self.amdx[4] * obx * oby
-                + self.amdx[5] * oby2
-                + self.amdx[6] * (obx2 + oby2)
-                + self.amdx[7] * obx3
-                + self.amdx[8] * obx2 * oby
-                + self.amdx[9] * obx * oby2
-                + self.amdx[10] * oby3
-                + self.amdx[11] * obx * (obx2 + oby2)
-                + self.amdx[12] * obx * (obx2 + oby2) ** 2
-            )
-
-            fx = (
-                self.amdx[0]
-                + self.amdx[3] * 2.0 * obx
-                + self.amdx[4] * oby
-                + self.amdx[6] * 2.0 * obx
-                + self.amdx[7] * 3.0 * obx2
-                + self.amdx[8] * 2.0 * obx * oby
-                + self.amdx[9] * oby2
-                + self.amdx[11] * (3.0 * obx2 + oby2)
-                + self.amdx[12] * (5.0 * obx2 * obx2 + 6.0 * obx2 * oby2 + oby2 * oby2)
-            )
-
-            fy = (
-                self.amdx[1]
-                + self.amdx[4] * obx
-                + self.amdx[5] * 2.0 * oby
-                + self.amdx[6] * 2.0 * oby
-                + self.amdx[8] * obx2
-                + self.amdx[9] * obx * 2.0 * oby
-                + self.amdx[10] * 3.0 * oby2
-                + self.amdx[11] * 2.0 * obx * oby
-                + self.amdx[12] * (4.0 * obx3 * oby + 4.0 * obx * oby3)
-            )
-
-            g = (
-                self.amdy[0] * oby
-                + self.amdy[1] * obx
-                + self.amdy[2]
-                + self.amdy[3] * oby2
-                + self.amdy[4] * oby * obx
-                + self.amdy[5] * obx2
-                + self.amdy[6] * (obx2 + oby2)
-                + self.amdy[7] * oby3
-                + self.amdy[8] * oby2 * obx
-                + self.amdy[9] * oby * obx2
-                + self.amdy[10] * obx3
-                + self.amdy[11] * oby * (obx2 + oby2)
-                + self.amdy[12] * oby * (obx2 + oby2) ** 2
-            )
-
-            gx = (
-                self.amdy[1]
-                + self.amdy[4] * oby
-                + self.amdy[5] * 2.0 * obx
-                + self.amdy[6] * 2.0 * obx
-                + self.amdy[8] * oby2
-                + self.amdy[9] * oby * 2.0 * obx
-                + self.amdy[10] * 3.0 * obx2
-                + self.amdy[11] * 2.0 * obx * oby
-                + self.amdy[12] * (4.0 * obx3 * oby + 4.0 * obx * oby3)
-            )
-
-            gy = (
-                self.amdy[0]
-                + self.amdy[3] * 2.0 * oby
-                + self.amdy[4] * obx
-                + self.amdy[6] * 2.0 * oby
-                + self.amdy[7] * 3.0 * oby2
-                + self.amdy[8] * 2.0 * oby * obx
-                + self.amdy[9] * obx2
-                + self.amdy[11] * (3.0 * oby2 + obx2)
-                + self.amdy[12] * (5.0 * oby2 * oby2 + 6.0 * obx2 * oby2 + obx2 * obx2)
-            )
+            f = self._platePoly(self.amdx, obx, oby)
+            fx, fy = self._platePolyDerivs(self.amdx, obx, oby)
+            g = self._platePoly(self.amdy, oby, obx)
+            gy, gx = self._platePolyDerivs(self.amdy, oby, obx)
 
             f = f - xi
             g = g - eta
@@ -379,31 +299,139 @@ class DssHeader:
         y = (self.ppo6 + oby * 1000.0) / self.ypsize - self.ypoff
         return x, y
 
+    def _platePoly(self, amd, obx, oby):
+        """
+        Evaluates the 13-term plate polynomial, amd is amdx or amdy.
+        For amdy, obx and oby are swapped, see _xy2rd.
+        obx, oby: arrays or scalars
+        """
+        obx2 = obx * obx
+        oby2 = oby * oby
+        r2 = obx2 + oby2
+        return (
+            amd[0] * obx
+            + amd[1] * oby
+            + amd[2]
+            + amd[3] * obx2
+            + amd[4] * obx * oby
+            + amd[5] * oby2
+            + amd[6] * r2
+            + amd[7] * obx2 * obx
+            + amd[8] * obx2 * oby
+            + amd[9] * obx * oby2
+            + amd[10] * oby2 * oby
+            + amd[11] * obx * r2
+            + amd[12] * obx * r2 * r2
+        )
+
+    def _platePolyDerivs(self, amd, obx, oby):
+        """
+        Returns the derivatives of _platePoly by obx and by oby.
+        """
+        obx2 = obx * obx
+        oby2 = oby * oby
+        dx = (
+            amd[0]
+            + amd[3] * 2.0 * obx
+            + amd[4] * oby
+            + amd[6] * 2.0 * obx
+            + amd[7] * 3.0 * obx2
+            + amd[8] * 2.0 * obx * oby
+            + amd[9] * oby2
+            + amd[11] * (3.0 * obx2 + oby2)
+            + amd[12] * (5.0 * obx2 * obx2 + 6.0 * obx2 * oby2 + oby2 * oby2)
+        )
+        dy = (
+            amd[1]
+            + amd[4] * obx
+            + amd[5] * 2.0 * oby
+            + amd[6] * 2.0 * oby
+            + amd[8] * obx2
+            + amd[9] * obx * 2.0 * oby
+            + amd[10] * 3.0 * oby2
+            + amd[11] * 2.0 * obx * oby
+            + amd[12] * (4.0 * obx2 * obx * oby + 4.0 * obx * oby2 * oby)
+        )
+        return dx, dy
+
+    def _rd2xyArray(self, ras, decs, maxiters=50, tolerance=0.0000005):
+        """
+        Same as _rd2xy for arrays of ra/dec in degree.
+        The Newton iterations run on all elements at once,
+        elements are removed from the iteration when they converge.
+
+        Returns xs, ys in image pixel coordinates and a mask of the elements that did not converge.
+        """
+        toRad = math.pi / 180
+        arcsecPerRadian = 3600 / toRad
+        ras = np.radians(np.asarray(ras, dtype=np.float64))
+        decs = np.radians(np.asarray(decs, dtype=np.float64))
+        pltra = self.raDeg * toRad
+        pltdec = self.decDeg * toRad
+
+        cosd = np.cos(decs)
+        sind = np.sin(decs)
+        ra_dif = ras - pltra
+        cosDif = np.cos(ra_dif)
+        div = sind * math.sin(pltdec) + cosd * math.cos(pltdec) * cosDif
+        xi = cosd * np.sin(ra_dif) * arcsecPerRadian / div
+        eta = (sind * math.cos(pltdec) - cosd * math.sin(pltdec) * cosDif) * arcsecPerRadian / div
+
+        obx = xi / self.platescl
+        oby = eta / self.platescl
+
+        """ Indices of the elements that have not converged yet """
+        active = np.arange(obx.shape[0])
+        iters = 0
+        while active.shape[0] > 0 and iters < maxiters:
+            ax, ay = obx[active], oby[active]
+            f = self._platePoly(self.amdx, ax, ay) - xi[active]
+            fx, fy = self._platePolyDerivs(self.amdx, ax, ay)
+            g = self._platePoly(self.amdy, ay, ax) - eta[active]
+            gy, gx = self._platePolyDerivs(self.amdy, ay, ax)
+
+            det = fx * gy - fy * gx
+            deltx = (-f * gy + g * fy) / det
+            delty = (-g * fx + f * gx) / det
+            obx[active] = ax + deltx
+            oby[active] = ay + delty
+            iters = iters + 1
+
+            """ Same condition as in _rd2xy, stops when one of the deltas is small enough """
+            active = active[np.minimum(np.abs(deltx), np.abs(delty)) > tolerance]
+
+        notConverged = np.zeros(obx.shape[0], dtype=bool)
+        notConverged[active] = True
+
+        xs = (self.ppo3 - obx * 1000.0) / self.xpsize - self.xpoff
+        ys = (self.ppo6 + oby * 1000.0) / self.ypsize - self.ypoff
+        return xs, ys, notConverged
+
     def xy2rd(self, xs, ys):
         """
         Converts X/Y pixels to RA/DEC
+        See _xy2rdArray for the array version.
+        """
+        raDeg, decDeg = self._xy2rdArray(xs, ys)
+        return raDeg.tolist(), decDeg.tolist()
+
+    def rd2xyArray(self, raHours, decDegs):
         """
-        raDeg, decDeg = [], []
-        fxy2rd = self._xy2rd
-        for x, y in zip(xs, ys):
-            rao, deco = fxy2rd(x, y)
-            raDeg.append(rao)
-            decDeg.append(deco)
-        return raDeg, decDeg
+        Same as rd2xy for arrays, see _rd2xyArray.
+        Returns xs, ys as arrays and the indices of the targets that did not converge.
+        """
+        x0, y0 = self._rd2xy(self.centerRaDeg, self.centerDecDeg)
+        x0, y0 = x0 - 1, y0 - 1
+        xs, ys, notConverged = self._rd2xyArray(np.asarray(raHours, dtype=np.float64) * 15, decDegs)
+        return xs - x0, y0 - ys, np.flatnonzero(notConverged)
 
     def rd2xy(self, raHourList, decDegList):
         """
         Convert RA/DEC to X/Y in pixels relative to reference coordinates
+        See rd2xyArray for the array version.
         """
-        xout, yout = [], []
-        frd2xy = self._rd2xy
-        x0, y0 = frd2xy(self.centerRaDeg, self.centerDecDeg)
-        x0, y0 = x0 - 1, y0 - 1
-        for ra, dec in zip(raHourList, decDegList):
-            x, y = frd2xy(ra * 15, dec)
-            xout.append(x - x0)
-            yout.append(y0 - y)
-        return xout, yout
+        xs, ys, notConverged = self.rd2xyArray(raHourList, decDegList)
+        return xs.tolist(), ys.tolist()
 
     def skyPA(self):
         """
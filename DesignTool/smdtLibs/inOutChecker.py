@@ -8,11 +8,14 @@ pnt = x, y
 if chk.checkPoint (x, y):
     print ("inside")
 
+inside = chk.checkPoints (xs, ys) # array of booleans
+
 Date: 2018-08-03
 Author: Shui Hung Kwok
 
 """
 import math
+import numpy as np
 
 
 class InOutChecker:
@@ -24,6 +27,7 @@ class InOutChecker:
         """
         self.mask = mask
         self.ymin, self.ymax, self.edges = self._buildEdges(mask)
+        self.edgeTable = self._buildEdgeTable()
 
     def _buildEdges(self, mask):
         """
@@ -75,6 +79,33 @@ class InOutChecker:
                 pass
         return ymin, ymax, edges
 
+    def _buildEdgeTable(self):
+        """
+        Returns the edges as an array, one row per y from ymin to ymax, indexed by y - ymin.
+        Rows are padded with NaN to an even length, so that pairs (row[0], row[1]), (row[2], row[3]), ...
+        are the segments as in checkPoint. A NaN never compares as inside.
+        """
+        nCols = max((len(row) for row in self.edges.values()), default=0)
+        nCols += nCols % 2
+        table = np.full((max(self.ymax - self.ymin, 0), nCols), np.nan)
+        for y, row in self.edges.items():
+            table[y - self.ymin, : len(row)] = row
+        return table
+
+    def checkPoints(self, xs, ys):
+        """
+        Checks all points (xs, ys) at once, same as checkPoint.
+        Returns an array of booleans, True if inside. Points with NaN coordinates are outside.
+        """
+        xs, ys = np.broadcast_arrays(np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64))
+        inside = np.zeros(xs.shape, dtype=bool)
+        yis = np.floor(ys)
+        valid = np.isfinite(yis) & (self.ymin < yis) & (yis < self.ymax)
+        rows = self.edgeTable[(yis[valid] - self.ymin).astype(np.intp)]
+        x = xs[valid][:, None]
+        inside[valid] = ((rows[:, 0::2] < x) & (x < rows[:, 1::2])).any(axis=1)
+        return inside
+
     def checkPoint(self, x, y):
         """
         Checks if the given point (x,y) is inside the mask
@@ -62,6 +62,78 @@ def sexg2Float(str0):
     return sign * (hh + mm + ss)
 
 
+def toSexagecimals(degs, plus=" "):
+    """Converts an array of deg to an array of dd:mm:ss strings, same format as toSexagecimal.
+    Values that are not finite are returned as 'nan' or 'inf'.
+    """
+    degs = np.asarray(degs, dtype=np.float64)
+    finite = np.isfinite(degs)
+    t = np.abs(np.where(finite, degs, 0))
+    hh = t.astype(np.int64)
+    t = (t - hh) * 60
+    mm = t.astype(np.int64)
+    ss = (t - mm) * 60
+
+    signs = np.where(degs < 0, "-", plus)
+    out = ["%s%02d:%02d:%05.2f" % v for v in zip(signs.tolist(), hh.tolist(), mm.tolist(), ss.tolist())]
+    out = np.array(out, dtype=str)
+    if not np.all(finite):
+        out = out.astype(object)
+        out[~finite] = degs[~finite].astype(str)
+        out = out.astype(str)
+    return out
+
+
+def sexg2Floats(strs):
+    """Input array of str as dd:mm:ss, hh:mm:ss.s or dd mm ss
+    Output as array of decimals and array of indices of bad rows.
+
+    A leading '-' applies to the whole value, ie. -00:30:00 is -0.5.
+    Bad rows are set to nan.
+
+    For example:
+        values, bad = sexg2Floats(["10:00:00", "-00:30:00", "xx"])
+        values is [10, -0.5, nan], bad is [2]
+    """
+    arr = np.char.strip(np.asarray(strs, dtype=str))
+    nRows = arr.shape[0]
+    values = np.full(nRows, np.nan)
+    if nRows == 0:
+        return values, np.zeros(0, dtype=np.int64)
+
+    negs = np.char.startswith(arr, "-")
+    body = np.char.replace(np.char.lstrip(arr, "+-"), ":", " ")
+    fields = None
+
+    """ Fast path, all rows have three fields separated by single blanks """
+    if np.all(np.char.count(body, " ") == 2):
+        try:
+            fields = np.array(" ".join(body.tolist()).split(" "), dtype=np.float64).reshape(-1, 3)
+            good = np.ones(nRows, dtype=bool)
+        except ValueError:
+            fields = None
+
+    if fields is None:
+        fields = np.zeros((nRows, 3))
+        good = np.zeros(nRows, dtype=bool)
+        for i, parts in enumerate(np.char.split(body).tolist()):
+            if len(parts) != 3:
+                continue
+            try:
+                fields[i] = [float(x) for x in parts]
+                good[i] = True
+            except ValueError:
+                pass
+
+    """ Signs are only allowed in front """
+    good &= np.char.count(body, "-") == 0
+    good &= np.char.count(body, "+") == 0
+
+    decimals = fields[:, 0] + fields[:, 1] / 60.0 + fields[:, 2] / 3600.0
+    values[good] = np.where(negs, -decimals, decimals)[good]
+    return values, np.flatnonzero(~good)
+
+
 def sec2hour(sec):
     isec = int(sec)
     hh = isec / 3600
@@ -17,7 +17,60 @@ After selecting the targets, the flag 'selected' should be set to 1 for those ta
 If slit lengths, or angles or widths are changed, these are also updated in the data structure
 and returned in getSelected.
 
+Gaps and segments are kept in SortedIntervals, sorted lists of starts and ends,
+so that the gap or segments at a given position are found by bisection.
+
+"""
+
+import bisect
+import numpy as np
+
+"""
+Modes of TargetSelector.performSelection
+"""
+SelectionModes = ("greedy", "optimal")
+
 """
+Number of candidate slits of a target chained to the candidates of the previous target, see TargetSelector._candidateSlits
+"""
+MaxChainedSlits = 4
+
+
+class SortedIntervals:
+    """
+    Sorted list of intervals (start, end), stored as two parallel lists, starts and ends.
+    Intervals do not overlap, so that starts and ends are both sorted.
+    """
+
+    def __init__(self, intervals=()):
+        self.starts = [s for s, e in intervals]
+        self.ends = [e for s, e in intervals]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, idx):
+        return self.starts[idx], self.ends[idx]
+
+    def __iter__(self):
+        return zip(self.starts, self.ends)
+
+    def toList(self):
+        return list(self)
+
+    def touching(self, left, right):
+        """
+        Returns the range (lo, hi) of the intervals that intersect or touch [left, right],
+        ie. the intervals with end >= left and start <= right.
+        """
+        return bisect.bisect_left(self.ends, left), bisect.bisect_right(self.starts, right)
+
+    def replace(self, lo, hi, intervals):
+        """
+        Replaces the intervals in the range lo:hi by the given intervals.
+        """
+        self.starts[lo:hi] = [s for s, e in intervals]
+        self.ends[lo:hi] = [e for s, e in intervals]
 
 
 class TargetSelector:
@@ -25,9 +78,30 @@ class TargetSelector:
         """
         targetList is a pandas data frame
         minSep is minimal separation between slits in arcsec.
+        Slit lengths are calculated as float64, see TargetSchema in targets.py.
+        length1 is the part of the slit right of the target (+x), length2 the part left of it,
+        as in slitGeometry.slitCorners.
         """
-        self.targets = targetList.copy()
+        self.targets = targetList.astype({c: np.float64 for c in ("length1", "length2") if c in targetList.columns})
         self._sortTargets()
+
+        """ The selection runs on arrays, slit lengths are written back to targets by _storeLengths """
+        tgs = self.targets
+        self.xarcs = tgs.xarcs.to_numpy(dtype=np.float64)
+        self.pcodes = tgs.pcode.to_numpy(copy=True)
+        self.length1 = tgs.length1.to_numpy(dtype=np.float64, copy=True)
+        self.length2 = tgs.length2.to_numpy(dtype=np.float64, copy=True)
+        self.selectedFlags = tgs.selected.to_numpy(copy=True)
+        self.preselected = self.selectedFlags > 0
+        self.xsort = tgs.xsort.to_numpy(dtype=np.float64, copy=True)
+
+        """ State for updateTarget: input slit lengths, gaps between alignment boxes and selected targets """
+        self.inputLength1 = self.length1.copy()
+        self.inputLength2 = self.length2.copy()
+        self.cells = None
+        self.mode = None
+        self.extend = False
+        self.isSelected = np.zeros(len(tgs), dtype=bool)
         self.minX = minX
         self.maxX = maxX
         self.minSlitLength = minSlitLength
@@ -35,30 +109,36 @@ class TargetSelector:
         self.minSep = minSep
 
     def _sortTargets(self):
-        tgs = self.targets
-        tgs["xsort"] = tgs.xarcs - tgs.length1
+        tgs = self.targets.reset_index(drop=True)
+        tgs["xsort"] = tgs.xarcs - tgs.length2
         tgs.sort_values(by=["selected", "pcode", "xsort"], ascending=(False, False, True), inplace=True)
+        """ Position in the input, to break ties as the sort above, see _sortRows """
+        self.inputPos = tgs.index.to_numpy()
         self.targets = tgs.reset_index(drop=True)
 
+    def _sortRows(self, tIdxs):
+        """
+        Returns the indices tIdxs in the order of _sortTargets, for the current values of the arrays
+        """
+        keys = (self.inputPos[tIdxs], self.xsort[tIdxs], -self.pcodes[tIdxs], -self.selectedFlags[tIdxs])
+        return tIdxs[np.lexsort(keys)]
+
     def _canFit(self, xgaps, xpos, slitLength, minSep, margin):
         """
         Tries to fit the new segment in a gap
+        xgaps: SortedIntervals
+
+        Returns (True, index of the gap) if it fits.
         """
         minMargin = minSep + margin
-        # print ('xgaps', xgaps)
-        for idx, (gapStart, gapEnd) in enumerate(xgaps):
-            # print ("xpos", xpos, "gap", gapStart, gapEnd)
-            if xpos < gapStart:
-                """
-                xpos is left of gap, 
-                It is also left of all remaining gaps, so return false
-                """
-                return False, idx
-            if xpos > gapEnd:
-                """
-                xpos is on the right side, continue
-                """
-                continue
+        """
+        Gaps left of xpos (gapEnd < xpos) are skipped,
+        the first gap right of xpos (xpos < gapStart) ends the search.
+        In between are the gaps that contain xpos, usually only one.
+        """
+        first, stop = xgaps.touching(xpos, xpos)
+        for idx in range(first, stop):
+            gapStart, gapEnd = xgaps[idx]
             """ xpos is in the gap, checks for margin
                 returns True if inside
             """
@@ -66,11 +146,14 @@ class TargetSelector:
                 """
                 If xpos is in this gap, it cannot be in another gap, so OK to return 
                 """
-                gapLength = gapEnd - gapStart - minSep
+                """ The slit keeps minSep from both ends of the gap, see _slitLimits """
+                gapLength = gapEnd - gapStart - 2 * minSep
                 if gapLength < slitLength:
                     """ Gap too short """
                     return False, idx
                 return True, idx
+        if stop < len(xgaps):
+            return False, stop
         return False, -1
 
     def _splitGap(self, xgaps, gIdx, xpos, slitLength, minSep, margin):
@@ -79,8 +162,18 @@ class TargetSelector:
         """
         gapStart, gapEnd = xgaps[gIdx]
         # gap will be split into two gaps
+        left, right = self._slitLimits(gapStart, gapEnd, xpos, slitLength, minSep)
 
-        minMargin = minSep + margin
+        # gap1 = gapStart, left
+        # gap2 = right, gapEnd
+        xgaps.replace(gIdx, gIdx + 1, ((gapStart, left), (right, gapEnd)))
+        return xgaps, left, right
+
+    def _slitLimits(self, gapStart, gapEnd, xpos, slitLength, minSep):
+        """
+        Returns left and right of the slit for the target at xpos in the gap.
+        The slit is centered on xpos, unless it is too close to one side of the gap.
+        """
         halfLength = slitLength / 2.0
 
         if xpos - halfLength < gapStart + minSep:
@@ -100,81 +193,66 @@ class TargetSelector:
             """
             left = xpos - halfLength
             right = xpos + halfLength
-
-        # gap1 = gapStart, left
-        # gap2 = right, gapEnd
-        xgaps[gIdx] = (gapStart, left)
-        xgaps.insert(gIdx + 1, (right, gapEnd))
-        return xgaps, left, right
+        return left, right
 
     def mergeSegments(self, xsegms, left, right):
-        if len(xsegms) == 0:
-            return [(left, right)]
-        else:
-            xsegms.append((left, right))
-        s0 = [(a[0], a) for a in xsegms]
-        s0.sort()
-        xsegms = [t for s, t in s0]
-        left, right = xsegms[0]
-        newSegms = []
-        for start, end in xsegms[1:]:
-            # print ('newseg', newSegms)
-            if right < start or end < left:
-                # disjunct
-                newSegms.append((left, right))
-                left, right = start, end
-                continue
-            # merge
-            x0 = min(start, left)
-            x1 = max(end, right)
-            left, right = x0, x1
-        newSegms.append((left, right))
-        return newSegms
+        """
+        Adds the segment (left, right) to xsegms, a SortedIntervals.
+        Segments that overlap or touch the new segment are merged with it.
+        Returns xsegms.
+        """
+        lo, hi = xsegms.touching(left, right)
+        if lo < hi:
+            left = min(left, xsegms.starts[lo])
+            right = max(right, xsegms.ends[hi - 1])
+        xsegms.replace(lo, hi, ((left, right),))
+        return xsegms
 
     def segments2Gaps(self, xsegms, xgaps, margin):
         """
         Turns segments into gaps.
-        Returns a list of gaps.
+        Returns the gaps as SortedIntervals.
         
         A gap is a pair (left, right) of space that is not occupied.
         
         """
+        if not isinstance(xgaps, SortedIntervals):
+            xgaps = SortedIntervals(xgaps)
         for segmLeft, segmRight in xsegms:
             newGaps = []
             # print ('segm', segmLeft, segmRight, xgaps)
-            """ Checks if a segment is in a gap, if so, split the gap in two. """
-            for gapLeft, gapRight in xgaps:
-                if gapRight < segmLeft or segmRight < gapLeft:
-                    """Segm is not in gap, keep this gap """
+            """ Checks if a segment is in a gap, if so, split the gap in two.
+                Gaps that do not intersect the segment are kept as they are. 
+            """
+            lo, hi = xgaps.touching(segmLeft, segmRight)
+            for gapLeft, gapRight in zip(xgaps.starts[lo:hi], xgaps.ends[lo:hi]):
+                """ Segm and gap intersect, need to merge """
+                if segmLeft < gapLeft:
+                    if segmRight > gapRight:
+                        """ segm is bigger than the gap.
+                            so, don't keep the gap
+                        """
+                        continue
+                    """ segm is on the left side of gap, segmRight must be in the gap
+                        so, gap is shortened on the left side
+                    """
+                    gapLeft = segmRight
                     newGaps.append((gapLeft, gapRight))
                 else:
-                    """ Segm and gap intersect, need to merge """
-                    if segmLeft < gapLeft:
-                        if segmRight > gapRight:
-                            """ segm is bigger than the gap.
-                                so, don't keep the gap
-                            """
-                            continue
-                        """ segm is on the left side of gap, segmRight must be in the gap
-                            so, gap is shortened on the left side
-                        """
-                        gapLeft = segmRight
-                        newGaps.append((gapLeft, gapRight))
-                    else:
-                        if segmRight < gapRight:
-                            """ segm is entirely inside the gap
-                                so, split the gap in two
-                            """
-                            newGaps.append((gapLeft, segmLeft))
-                            newGaps.append((segmRight, gapRight))
-                            continue
-
-                        """ segm is on the right side of the gap, segmLeft is in the gap
-                            so, gap is shortened on the right side 
+                    if segmRight < gapRight:
+                        """ segm is entirely inside the gap
+                            so, split the gap in two
                         """
                         newGaps.append((gapLeft, segmLeft))
+                        newGaps.append((segmRight, gapRight))
+                        continue
 
-            xgaps = newGaps
+                    """ segm is on the right side of the gap, segmLeft is in the gap
+                        so, gap is shortened on the right side 
+                    """
+                    newGaps.append((gapLeft, segmLeft))
+
+            xgaps.replace(lo, hi, newGaps)
         return xgaps
 
     def insertAlignBoxes(self, tgs):
@@ -185,17 +263,23 @@ class TargetSelector:
         tgs: alignment boxes, pcode < -1
         A segment is a pair (left,right), where left and right are the limits of the alignment box.
         """
-        xsegms = []
-        selected = []
+        selected, xsegms = self._insertAlignBoxes(tgs.index.to_numpy())
+        self._storeLengths()
+        return selected, xsegms
+
+    def _insertAlignBoxes(self, tIdxs):
+        """
+        Same as insertAlignBoxes for the indices of the alignment boxes.
+        Slit lengths are updated in self.length1 and self.length2.
+        """
+        xsegms = SortedIntervals()
+        selected = tIdxs.tolist()
         half = (self.boxSize + self.minSep) / 2
         boxHalf = self.boxSize / 2
-        for tIdx, tg in tgs.iterrows():
-            left = tg.xarcs - half
-            right = tg.xarcs + half
-            xsegms = self.mergeSegments(xsegms, left, right)
-            self.targets.at[tIdx, "length1"] = boxHalf
-            self.targets.at[tIdx, "length2"] = boxHalf
-            selected.append(tIdx)
+        for xpos in self.xarcs[tIdxs].tolist():
+            xsegms = self.mergeSegments(xsegms, xpos - half, xpos + half)
+        self.length1[tIdxs] = boxHalf
+        self.length2[tIdxs] = boxHalf
         return selected, xsegms
 
     def _printGaps(self, gaps):
@@ -210,43 +294,281 @@ class TargetSelector:
         
         tgs: list of targets, pcode > 0
         """
-        selIdx = []
+        selIdx = self._selectTargetsIdx(xgaps, tgs.index.to_numpy(), minSlitLength, margin)
+        self._storeLengths()
+        return selIdx
+
+    def _selectTargetsIdx(self, xgaps, tIdxs, minSlitLength, margin):
+        """
+        Same as _selectTargets for the indices of the targets.
+        Slit lengths are updated in self.length1 and self.length2.
+        """
+        selIdx, lefts, rights = [], [], []
 
         # print ("gaps")
         # self.printGaps(xgaps)
-        for tIdx, tg in tgs.iterrows():
-            xpos = tg.xarcs
+        for tIdx, xpos in zip(tIdxs.tolist(), self.xarcs[tIdxs].tolist()):
             fits, gIdx = self._canFit(xgaps, xpos, minSlitLength, self.minSep, margin)
             if fits:
                 xgaps, left, right = self._splitGap(xgaps, gIdx, xpos, minSlitLength, self.minSep, margin)
                 # print ("gaps")
                 # self.printGaps(xgaps)
                 # print (f'tidx={tIdx}, gIdx={gIdx}, left={left:.1f}, right={right:.1f}')
-                self.targets.at[tIdx, "length1"] = xpos - left
-                self.targets.at[tIdx, "length2"] = right - xpos
                 selIdx.append(tIdx)
+                lefts.append(left)
+                rights.append(right)
+
+        xpos = self.xarcs[selIdx]
+        self.length1[selIdx] = np.array(rights) - xpos
+        self.length2[selIdx] = xpos - np.array(lefts)
         return selIdx
 
-    def performSelection(self):
+    def _selectTargetsOptimal(self, xgaps, tIdxs, minSlitLength, margin):
+        """
+        Selects the targets that maximize the total priority, see objective.
+        Returns a list of indices of selected targets, the preselected targets first, then the others sorted by x.
+
+        The preselected targets (selected=1) are placed first, as in the greedy selection, see _selectTargetsIdx.
+        The other targets are placed in the remaining gaps, this is weighted interval scheduling.
+        Each target that can fit in one of the gaps gets candidate slits, see _candidateSlits.
+        Slits must be separated by minSep.
+        All candidate slits of a target contain the target, so that at most one of them is selected.
+        With the candidate slits sorted by their right end,
+            best[k] = max(best[k-1], pcode[k] + best[p(k)])
+        where p(k) is the number of slits that end at least minSep before slit k starts,
+        found by bisection. There are at most MaxChainedSlits + 3 candidates per target, total is O(N log N).
+        The slits of the greedy selection are candidates too, so that the result is never worse than greedy.
+        """
+        minSep = self.minSep
+        tIdxs = np.asarray(tIdxs, dtype=np.int64)
+        presel = self.preselected[tIdxs]
+        preselIdx = self._selectTargetsIdx(xgaps, tIdxs[presel], minSlitLength, margin)
+        others = tIdxs[~presel]
+        slits = self._candidateSlits(xgaps, others, minSlitLength, margin)
+        slits.extend(self._greedySlits(xgaps, others, minSlitLength, margin))
+        if not slits:
+            return preselIdx
+        slits.sort()
+
+        pcodes = self.pcodes.tolist()
+        rights = [r for r, l, t in slits]
+
+        best = [0] * (len(slits) + 1)
+        prev = [0] * len(slits)
+        for k, (right, left, tIdx) in enumerate(slits):
+            """ Tolerance for the rounding of the greedy slits, see _greedySlits """
+            prev[k] = bisect.bisect_right(rights, left - minSep + 1e-9, 0, k)
+            best[k + 1] = max(best[k], pcodes[tIdx] + best[prev[k]])
+
+        """ Backtracks from the last slit """
+        selIdx, lefts, rights = [], [], []
+        k = len(slits)
+        while k > 0:
+            if best[k] == best[k - 1]:
+                k -= 1
+                continue
+            right, left, tIdx = slits[k - 1]
+            selIdx.append(tIdx)
+            lefts.append(left)
+            rights.append(right)
+            k = prev[k - 1]
+
+        selIdx.reverse()
+        lefts.reverse()
+        rights.reverse()
+        xpos = self.xarcs[selIdx]
+        self.length1[selIdx] = np.array(rights) - xpos
+        self.length2[selIdx] = xpos - np.array(lefts)
+        return preselIdx + selIdx
+
+    def _candidateSlits(self, xgaps, tIdxs, slitLength, margin):
+        """
+        Returns a list of candidate slits (right, left, tIdx) for the targets that fit in the gaps.
+
+        The candidates of a target are:
+        the slit that the greedy selection would place in the gap, see _slitLimits,
+        the slits shifted as far left and as far right as possible, keeping the target at least
+        min(minSep, slitLength/2) from the ends of the slit,
+        and the slits that start minSep after the MaxChainedSlits leftmost candidates of the previous target in the gap.
+        """
+        minSep = self.minSep
+        edge = min(minSep, slitLength / 2)
+        order = np.argsort(self.xarcs[tIdxs], kind="stable")
+        slits = []
+        """ Right ends of the candidates of the previous target in the same gap """
+        prevGap, prevRights = -1, []
+        for tIdx, xpos in zip(tIdxs[order].tolist(), self.xarcs[tIdxs[order]].tolist()):
+            fits, gIdx = self._canFit(xgaps, xpos, slitLength, minSep, margin)
+            if not fits:
+                continue
+            if gIdx != prevGap:
+                prevGap, prevRights = gIdx, []
+            gapStart, gapEnd = xgaps[gIdx]
+            left, right = self._slitLimits(gapStart, gapEnd, xpos, slitLength, minSep)
+            lefts = {left}
+
+            """ Range of left, so that the slit is in the gap and contains the target """
+            minLeft = max(xpos - slitLength + edge, gapStart + minSep)
+            maxLeft = min(xpos - edge, gapEnd - minSep - slitLength)
+            if minLeft <= maxLeft:
+                lefts.update((minLeft, maxLeft))
+                lefts.update(r + minSep for r in prevRights[:MaxChainedSlits] if minLeft <= r + minSep <= maxLeft)
+
+            slits.extend((l + slitLength, l, tIdx) for l in lefts)
+            prevRights = sorted(l + slitLength for l in lefts)
+        return slits
+
+    def _greedySlits(self, xgaps, tIdxs, slitLength, margin):
+        """
+        Returns the slits (right, left, tIdx) of the greedy selection of the targets tIdxs, see _selectTargetsIdx.
+        xgaps and the slit lengths are not changed.
+        """
+        length1, length2 = self.length1[tIdxs], self.length2[tIdxs]
+        selIdx = self._selectTargetsIdx(SortedIntervals(xgaps), tIdxs, slitLength, margin)
+        xpos = self.xarcs[selIdx]
+        slits = zip((xpos + self.length1[selIdx]).tolist(), (xpos - self.length2[selIdx]).tolist(), selIdx)
+        self.length1[tIdxs], self.length2[tIdxs] = length1, length2
+        return list(slits)
+
+    def extendSlits(self, selIdx):
+        """
+        Extends the selected slits into the free space around them, alignment boxes are not changed.
+        The free space between two neighbours in the same gap between alignment boxes is split in half,
+        keeping minSep between them. The first and last slits of a gap extend to minSep from its ends.
+        Slits are not shortened. Slit lengths are updated in self.length1 and self.length2.
+        """
+        idx = np.asarray(selIdx, dtype=np.int64)
+        idx = idx[self.pcodes[idx] > -2]
+        if len(idx) == 0:
+            return
+        xpos = self.xarcs[idx]
+        lefts = xpos - self.length2[idx]
+        order = np.argsort(lefts, kind="stable")
+        idx, xpos, lefts = idx[order], xpos[order], lefts[order]
+        rights = xpos + self.length1[idx]
+
+        minSep = self.minSep
+        starts, ends = np.array(self.cells.starts), np.array(self.cells.ends)
+        cells = np.searchsorted(starts, xpos, side="right") - 1
+        newLefts = starts[cells] + minSep
+        newRights = ends[cells] - minSep
+
+        """ Neighbours in the same gap meet in the middle of the free space between them """
+        sameCell = cells[1:] == cells[:-1]
+        mids = (rights[:-1] + lefts[1:]) / 2
+        newRights[:-1] = np.where(sameCell, mids - minSep / 2, newRights[:-1])
+        newLefts[1:] = np.where(sameCell, mids + minSep / 2, newLefts[1:])
+
+        self.length1[idx] = np.maximum(newRights, rights) - xpos
+        self.length2[idx] = xpos - np.minimum(newLefts, lefts)
+
+    def objective(self, selIdx):
+        """
+        Returns the total priority, sum of pcode of the selected targets, alignment boxes not included.
+        """
+        pcodes = self.pcodes[selIdx]
+        return int(pcodes[pcodes > 0].sum())
+
+    def _storeLengths(self):
+        """
+        Writes the slit lengths back into the data frame
+        """
+        self.targets["length1"] = self.length1
+        self.targets["length2"] = self.length2
+
+    def performSelection(self, mode="greedy", extend=False):
         """
         This is the main method.
         
         Performs the selection of the targetS.
+        mode: "greedy", targets are placed in order of selected, pcode and x, see _selectTargets
+              "optimal", maximizes the total priority, see _selectTargetsOptimal
+        extend: True to extend the selected slits into the free space, see extendSlits
         Returns a list of indices of the selected targets.
         """
+        if mode not in SelectionModes:
+            raise ValueError(f"Unknown selection mode {mode}, expected one of {SelectionModes}")
 
-        xgaps = [(self.minX, self.maxX)]  # a sorted list of gaps (xa,xb)
+        xgaps = SortedIntervals([(self.minX, self.maxX)])  # a sorted list of gaps (xa,xb)
 
         """ Inserts the alignment boxes"""
-        selected, xsegms = self.insertAlignBoxes(self.targets[self.targets.pcode < -1])
+        selected, xsegms = self._insertAlignBoxes(np.flatnonzero(self.pcodes < -1))
 
         """ Turns the segments into gaps """
         xgaps = self.segments2Gaps(xsegms, xgaps, self.minSep)
+        self.cells = SortedIntervals(xgaps)
+        self.mode = mode
+        self.extend = extend
 
-        """ Inserts the targets """
-        selTargets = self._selectTargets(xgaps, self.targets[self.targets.pcode > 0], self.minSlitLength, self.minSep)
+        """ Inserts the targets, rows are sorted unless changed by updateTarget """
+        tIdxs = self._sortRows(np.flatnonzero(self.pcodes > 0))
+        if mode == "optimal":
+            selTargets = self._selectTargetsOptimal(xgaps, tIdxs, self.minSlitLength, self.minSep)
+        else:
+            selTargets = self._selectTargetsIdx(xgaps, tIdxs, self.minSlitLength, self.minSep)
 
         """ Merges with selected aligment boxes"""
         selected.extend(selTargets)
+        self.isSelected[:] = False
+        self.isSelected[selected] = True
 
+        if extend:
+            self.extendSlits(selTargets)
+        self._storeLengths()
         return selected
+
+    def updateTarget(self, tIdx, pcode, selected, length1, length2):
+        """
+        Changes the target tIdx after performSelection, and selects again.
+        Returns the sorted list of indices of the selected targets.
+
+        The alignment boxes split the x axis into independent gaps, a target can only be placed
+        in the gap that contains it. So only the targets in the gap of tIdx are selected again,
+        the slits in the other gaps are kept.
+        If an alignment box is added or removed, the gaps change and all targets are selected again.
+        """
+        if self.cells is None:
+            raise ValueError("updateTarget requires performSelection first")
+
+        wasBox = self.pcodes[tIdx] < -1
+        self.pcodes[tIdx] = pcode
+        self.selectedFlags[tIdx] = selected
+        self.preselected[tIdx] = selected > 0
+        self.inputLength1[tIdx], self.inputLength2[tIdx] = length1, length2
+        self.xsort[tIdx] = self.xarcs[tIdx] - length2
+
+        if wasBox or pcode < -1:
+            """ The change spreads to all gaps """
+            self.length1[:], self.length2[:] = self.inputLength1, self.inputLength2
+            self.performSelection(self.mode, self.extend)
+            return np.flatnonzero(self.isSelected).tolist()
+
+        if not self.isSelected[tIdx]:
+            self.length1[tIdx], self.length2[tIdx] = length1, length2
+        xpos = self.xarcs[tIdx]
+        lo, hi = self.cells.touching(xpos, xpos)
+        for gapStart, gapEnd in zip(self.cells.starts[lo:hi], self.cells.ends[lo:hi]):
+            self._reselectGap(gapStart, gapEnd)
+        if self.extend:
+            """ Slits in the other gaps are already extended and stay the same """
+            self.extendSlits(np.flatnonzero(self.isSelected))
+        self._storeLengths()
+        return np.flatnonzero(self.isSelected).tolist()
+
+    def _reselectGap(self, gapStart, gapEnd):
+        """
+        Selects again the targets in the gap between alignment boxes, in the order of _sortTargets.
+        """
+        inGap = (self.xarcs > gapStart) & (self.xarcs < gapEnd)
+        members = np.flatnonzero(inGap & (self.pcodes > -2))
+        self.isSelected[members] = False
+        self.length1[members] = self.inputLength1[members]
+        self.length2[members] = self.inputLength2[members]
+
+        tIdxs = self._sortRows(np.flatnonzero(inGap & (self.pcodes > 0)))
+        xgaps = SortedIntervals([(gapStart, gapEnd)])
+        if self.mode == "optimal":
+            selIdx = self._selectTargetsOptimal(xgaps, tIdxs, self.minSlitLength, self.minSep)
+        else:
+            selIdx = self._selectTargetsIdx(xgaps, tIdxs, self.minSlitLength, self.minSep)
+        self.isSelected[selIdx] = True
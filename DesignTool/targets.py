@@ -6,6 +6,8 @@ Created on Mar 20, 2018
 
 import math
 import os
+import gc
+import itertools
 
 os.environ["NUMEXPR_MAX_THREADS"] = "4"
 os.environ["NUMEXPR_NUM_THREADS"] = "4"
@@ -19,9 +21,14 @@ import datetime
 from astropy.modeling import models
 
 from smdtLibs import utils, dss2Header
-from smdtLibs.inOutChecker import InOutChecker
+from smdtLibs.distortion import getDistortionModel
+from maskRaster import MaskRaster
 from smdtLogger import SMDTLogger
 from targetSelector import TargetSelector
+from slitGeometry import slitCorners, findConflicts, resolveConflicts, slitPriorities, fitSlitLengths
+from catalogCache import CatalogCache
+from projectionEngine import ProjectionEngine, ChunkBytes
+from maskGeometry import getMaskGeometry, StatusInside, DefaultBadColumnDist
 
 if sys.version_info.minor < 7:
 
@@ -43,6 +50,122 @@ else:
     MyJsonEncoder = json.JSONEncoder
 
 
+"""
+Columns of the targets data frame, in the order of the input list.
+"""
+TargetColumns = (
+    "objectId",
+    "raHour",
+    "decDeg",
+    "eqx",
+    "mag",
+    "pBand",
+    "pcode",
+    "sampleNr",
+    "selected",
+    "slitLPA",
+    "length1",
+    "length2",
+    "slitWidth",
+    "orgIndex",
+    "inMask",
+)
+
+"""
+Compact types of the columns of the targets data frame.
+RA/DEC are kept in float64 for astrometric precision.
+Slit geometry, magnitudes and equinox fit in float32, flags and codes in small integers.
+"""
+TargetSchema = {
+    "raHour": np.float64,
+    "decDeg": np.float64,
+    "eqx": np.float32,
+    "mag": np.float32,
+    "pBand": "category",
+    "pcode": np.int32,
+    "sampleNr": np.int16,
+    "selected": np.int8,
+    "slitLPA": np.float32,
+    "length1": np.float32,
+    "length2": np.float32,
+    "slitWidth": np.float32,
+    "orgIndex": np.int32,
+    "inMask": np.int8,
+}
+
+
+def applySchema(df):
+    """
+    Converts the columns of the targets data frame to the types in TargetSchema.
+    Other columns are not changed.
+    Returns the converted data frame.
+    """
+    types = {c: t for c, t in TargetSchema.items() if c in df.columns and df[c].dtype != t}
+    return df.astype(types) if types else df
+
+
+def _jsonValues(col):
+    """
+    Returns the values of the column as a list for JSON.
+    float32 values are converted via their shortest representation, ie. 0.7 and not 0.699999988.
+    """
+    if col.dtype == np.float32:
+        return col.to_numpy().astype(str).astype(np.float64).tolist()
+    return list(col)
+
+
+"""
+Default values of the input columns after the objectId: ra, dec, eqx, mag, pBand, pcode,
+sampleNr, selected, slitLPA, length1, length2, slitWidth
+"""
+RawTemplate = ["", "", "2000", "99", "I", "99", "0", "1", "0", "4.0", "4.0", "1.5"]
+
+
+def _toColumns(rows, nCols, defaults):
+    """
+    Transposes the rows of tokens into nCols columns.
+    Missing tokens at the end of a row are set to the defaults.
+
+    Rows are grouped by their number of tokens. The tokens of a group are flattened into one list,
+    so that a column is a strided slice of that list.
+    """
+    nRows = len(rows)
+    lengths = np.fromiter(map(len, rows), dtype=np.int64, count=nRows)
+    groups = np.unique(lengths)
+    if len(groups) == 1:
+        """ All rows have the same number of tokens """
+        length = groups[0]
+        flat = list(itertools.chain.from_iterable(rows))
+        return [flat[k::length] if k < length else [defaults[k]] * nRows for k in range(nCols)]
+
+    cols = [np.empty(nRows, dtype=object) for _ in range(nCols)]
+    for length in groups:
+        idx = np.flatnonzero(lengths == length)
+        flat = list(itertools.chain.from_iterable(rows[i] for i in idx))
+        for k in range(nCols):
+            cols[k][idx] = flat[k::length] if k < length else defaults[k]
+    return cols
+
+
+def _toFloats(strs):
+    """
+    Converts a column of strings to floats.
+    Values that are not numbers become 0, as in readRaw.
+    """
+    try:
+        return np.array(strs, dtype=np.float64)
+    except ValueError:
+        pass
+
+    def toFloat(x):
+        try:
+            return float(x)
+        except:
+            return 0
+
+    return np.array([toFloat(x) for x in strs])
+
+
 class TargetList:
     """
     This class represents the Slitmask Design Tool target list.
@@ -86,10 +209,17 @@ class TargetList:
         self.centerDEC = decDeg
         self.config = config
         self.fileName = None
+        self.inputCenter = None
+        self._projEngine = None
+        self.selectionInfo = None
+        """ Previous selection and targets changed since, see select """
+        self._selectionState = None
+        self._pendingUpdates = set()
+        self._pointing = None
         if type(input) == type(io.StringIO()):
             self.targets = self.readRaw(input)
         elif type(input) == type(pd.DataFrame()):
-            self.targets = input
+            self.targets = applySchema(input)
         else:
             self.fileName = input
             self.targets = self.readFromFile(input)
@@ -128,21 +258,48 @@ class TargetList:
                 self.centerDEC = utils.sexg2Float(parts[i-2])
                 parts1 = (" ".join (parts[i:])).split ("=")
                 self.positionAngle = float (parts1[1].strip())
+                self.inputCenter = self.centerRADeg, self.centerDEC, self.positionAngle
                 return True
         return False
 
     def readFromFile(self, fname):
         """
         Reads target list from file
+        Uses the catalog cache, if enabled in the configuration
         Returns a Pandas dataframe
         """
+        cache = CatalogCache.fromConfig(self.config)
+        if cache is not None:
+            df, inputCenter = cache.load(fname)
+            if df is not None:
+                if inputCenter is not None:
+                    self.centerRADeg, self.centerDEC, self.positionAngle = inputCenter
+                    self.inputCenter = tuple(inputCenter)
+                return self._checkCenter(df)
+
         with open(fname, "r") as fh:
-            return self.readRaw(fh)
+            df = self.readRaw(fh)
+        if cache is not None:
+            cache.save(fname, df, self.inputCenter)
+        return df
 
-    def readRaw(self, fh):
+    def readRaw(self, fh, columnar=True):
         """
         Reads target list from file handle
         Returns a Pandas dataframe
+
+        columnar=True parses the whole input column by column, see _readRawColumns.
+        columnar=False parses the input line by line, see _readRawRows.
+        Both produce the same data frame.
+        """
+        if columnar:
+            return applySchema(self._readRawColumns(fh))
+        return applySchema(self._readRawRows(fh))
+
+    def _readRawRows(self, fh):
+        """
+        Reads target list from file handle, one line at a time
+        Returns a Pandas dataframe
         """
 
         def toFloat(x):
@@ -152,23 +309,6 @@ class TargetList:
                 return 0
 
         out = []
-        cols = (
-            "objectId",
-            "raHour",
-            "decDeg",
-            "eqx",
-            "mag",
-            "pBand",
-            "pcode",
-            "sampleNr",
-            "selected",
-            "slitLPA",
-            "length1",
-            "length2",
-            "slitWidth",
-            "orgIndex",
-            "inMask",
-        )
         cnt = 0
         for nr, line in enumerate(fh):
             if not line:
@@ -243,9 +383,87 @@ class TargetList:
             )
             out.append(target)
             cnt += 1
-        df = pd.DataFrame(out, columns=cols)
+        df = pd.DataFrame(out, columns=TargetColumns)
         # df["inMask"] = np.zeros_like(df.name)
+        return self._checkCenter(df)
+
+    def _readRawColumns(self, fh):
+        """
+        Reads target list from file handle, all lines at once.
+        The lines are split into tokens in one pass, then each column is converted as a whole.
+        Returns a Pandas dataframe
+
+        Lines with values that cannot be converted in bulk are handled by _readRawRows,
+        so that bad lines are treated exactly as before.
+        """
+        text = fh.read()
+        lines = text.split("\n")
+        """ Creating many small lists triggers the garbage collector repeatedly, pauses it while tokenizing """
+        gcEnabled = gc.isenabled()
+        gc.disable()
+        try:
+            tokens = [line.partition("#")[0].split() for line in lines]
+        finally:
+            if gcEnabled:
+                gc.enable()
+
+        """ Lines with center and PA, see _checkPA """
+        if "PA=" in text.upper():
+            for i, line in enumerate(lines):
+                if len(tokens[i]) >= 4 and self._checkPA(line.partition("#")[0]):
+                    tokens[i] = []
+
+        rows = [t for t in tokens if len(t) >= 4]
+        nRows = len(rows)
+        if nRows == 0:
+            return self._checkCenter(pd.DataFrame([], columns=TargetColumns))
+
+        try:
+            eqx = np.array([r[3] for r in rows], dtype=np.float64)
+            """ Equinox glued to the magnitude, ie. 200019.5 """
+            for i in np.flatnonzero(eqx > 3000):
+                r = rows[i]
+                rows[i] = r[:3] + [r[3][:4], r[3][4:]] + r[4:]
+                eqx[i] = float(r[3][:4])
+
+            cols = _toColumns(rows, len(RawTemplate) + 1, [""] + RawTemplate)
+
+            raHour, bad = utils.sexg2Floats(cols[1])
+            if len(bad) > 0 or np.any((raHour < 0) | (raHour > 24)):
+                raise ValueError("Bad RA value")
+            decDeg, bad = utils.sexg2Floats(cols[2])
+            if len(bad) > 0 or np.any((decDeg < -90) | (decDeg > 90)):
+                raise ValueError("Bad DEC value")
+
+            columns = (
+                list(cols[0]),
+                raHour,
+                decDeg,
+                eqx,
+                _toFloats(cols[4]),
+                np.char.upper(np.array(cols[5], dtype=str)),
+                np.array(cols[6], dtype=np.int64),
+                np.array(cols[7], dtype=np.int64),
+                np.array(cols[8], dtype=np.int64),
+                _toFloats(cols[9]),
+                _toFloats(cols[10]),
+                _toFloats(cols[11]),
+                _toFloats(cols[12]),
+                np.arange(nRows),
+                np.zeros(nRows, dtype=np.int64),
+            )
+        except (ValueError, OverflowError) as e:
+            SMDTLogger.info("Columnar parsing failed ({}), parsing line by line".format(e))
+            return self._readRawRows(io.StringIO(text))
 
+        df = pd.DataFrame(dict(zip(TargetColumns, columns)))
+        return self._checkCenter(df)
+
+    def _checkCenter(self, df):
+        """
+        Uses the median RA/DEC of the targets as center, if no center was given.
+        Returns the data frame.
+        """
         if self.centerRADeg == 0 and self.centerRADeg == 0:
             self.centerRADeg = df.raHour.median() * 15
             self.centerDEC = df.decDeg.median()
@@ -280,19 +498,32 @@ class TargetList:
         Returns the targets in JSON format
         """
         tgs = self.targets
-        data = [list(tgs[i]) for i in tgs]
+        data = [_jsonValues(tgs[i]) for i in tgs]
         data1 = {}
         for i, colName in enumerate(tgs.columns):
             data1[colName] = data[i]
 
         return json.dumps(data1, cls=MyJsonEncoder)
 
+    def toJsonWithSelection(self):
+        """
+        Returns the targets and the selection info in JSON format, see select
+        """
+        tgs = self.targets
+        data = [_jsonValues(tgs[i]) for i in tgs]
+        data1 = {}
+        for i, colName in enumerate(tgs.columns):
+            data1[colName] = data[i]
+
+        data2 = {"selectionInfo": self.selectionInfo, "targets": data1}
+        return json.dumps(data2, cls=MyJsonEncoder)
+
     def toJsonWithInfo(self):
         """
         Returns the targets and ROI info in JSON format
         """
         tgs = self.targets
-        data = [list(tgs[i]) for i in tgs]
+        data = [_jsonValues(tgs[i]) for i in tgs]
         data1 = {}
         for i, colName in enumerate(tgs.columns):
             data1[colName] = data[i]
@@ -305,25 +536,158 @@ class TargetList:
         Updates the dataframe by column name
         """
         self.targets[colName] = value
+        self.invalidateProjection()
+        self._selectionState = None
+
+    def invalidateProjection(self):
+        """
+        Forgets the cached projection engine.
+        Must be called when targets coordinates are changed or targets are added.
+        """
+        self._projEngine = None
+
+    def getProjectionEngine(self):
+        """
+        Returns the projection engine of the targets, see projectionEngine.py.
+        The engine is created when needed and cached until invalidateProjection() is called,
+        or the data frame is replaced.
+        """
+        tgs = self.targets
+        if self._projEngine is not None:
+            source, engine = self._projEngine
+            if source is tgs and len(engine) == len(tgs):
+                return engine
+        engine = ProjectionEngine(tgs.raHour, tgs.decDeg)
+        self._projEngine = tgs, engine
+        return engine
 
-    def select(self, idxList, minX, maxX, minSlitLength, minSep, boxSize):
+    def select(self, idxList, minX, maxX, minSlitLength, minSep, boxSize, mode="greedy", incremental=False, extend=False):
         """
         Selects the targets to put on slits
+        mode: "greedy" or "optimal", see TargetSelector.performSelection
+        extend: True to extend the slits into the free space between them, see TargetSelector.extendSlits
+        incremental: True to keep the previous selection, and select again only around the targets
+            changed by updateTarget since then, see TargetSelector.updateTarget.
+            The selection is done from scratch if the candidates, the parameters or the pointing have changed.
 
+        The total priority of the selection is stored in selectionInfo, see TargetSelector.objective.
+        Targets excluded by markInside, in the guider FOV or on a bad column, are not candidates.
+        Slits that still overlap are removed, see resolveSlitConflicts.
         """
         targets = self.targets
-        #
-        targets["inMask"] = np.zeros(targets.shape[0])
-        mIdx = targets.columns.get_loc("inMask")
+        idxList = np.asarray(idxList, dtype=np.int64)
+        if "status" in targets:
+            idxList = idxList[targets.status.to_numpy()[idxList] == StatusInside]
+        key = (tuple(idxList.tolist()), minX, maxX, minSlitLength, minSep, boxSize, mode, extend, self._pointing)
+        state = self._selectionState
+
+        if incremental and state is not None and state[0] == key and state[1] is targets:
+            selector, rowOf = state[2], state[3]
+            selIdx = np.flatnonzero(selector.isSelected).tolist()
+            for idx in sorted(self._pendingUpdates):
+                row = rowOf.get(idx)
+                if row is None:
+                    """ Not a candidate """
+                    continue
+                tg = targets.loc[idx]
+                selIdx = selector.updateTarget(row, int(tg.pcode), int(tg.selected), float(tg.length1), float(tg.length2))
+            info = {"mode": mode, "incremental": True, "nSelected": len(selIdx), "objective": selector.objective(selIdx)}
+        else:
+            selector = TargetSelector(targets.iloc[idxList], minX, maxX, minSlitLength, minSep, boxSize)
+            selIdx = selector.performSelection(mode, extend)
+            info = {"mode": mode, "nSelected": len(selIdx), "objective": selector.objective(selIdx)}
+
+            """ Rows of the selector by index label of the targets, for updateTarget """
+            labels = targets.index.to_numpy()[idxList[selector.inputPos]]
+            self._selectionState = key, targets, selector, dict(zip(labels.tolist(), range(len(labels))))
 
-        selector = TargetSelector(targets.iloc[idxList], minX, maxX, minSlitLength, minSep, boxSize)
-        selIdx = selector.performSelection()
-        orgIdx = selector.targets.iloc[selIdx].orgIndex
-        targets.iloc[orgIdx, [mIdx]] = 1
+        self._pendingUpdates = set()
 
-        for i, stg in selector.targets.iterrows():
-            targets.at[stg.orgIndex, "length1"] = stg.length1
-            targets.at[stg.orgIndex, "length2"] = stg.length2
+        orgIdx = selector.targets.orgIndex.to_numpy()
+        inMask = np.zeros(targets.shape[0], dtype=np.int8)
+        inMask[orgIdx[selIdx]] = 1
+        targets["inMask"] = inMask
+
+        """ Slit lengths of all candidates are copied back, by orgIndex """
+        rows = targets.index.get_indexer(orgIdx)
+        for colName, values in (("length1", selector.length1), ("length2", selector.length2)):
+            col = targets[colName].to_numpy(copy=True)
+            col[rows] = values
+            targets[colName] = col
+
+        self.selectionInfo = info
+        """ Tilted slits, preselected or edited in the GUI, may still overlap, see checkSlits """
+        info["dropped"] = len(self.resolveSlitConflicts())
+        SMDTLogger.info(f"Selection {info}")
+
+    def slitCorners(self, tgs, maskPA=None):
+        """
+        Returns the corners of the slits of the targets tgs, see slitGeometry.slitCorners
+        maskPA: default positionAngle
+        """
+        maskPA = self.positionAngle if maskPA is None else maskPA
+        return slitCorners(tgs.xarcs, tgs.yarcs, tgs.length1, tgs.length2, tgs.slitWidth / 2, maskPA - tgs.slitLPA)
+
+    def checkSlits(self, maskPA=None, minSep=0):
+        """
+        Returns the pairs of index labels of the targets in the mask, whose slits overlap
+        or are closer than minSep, see slitGeometry.findConflicts
+        """
+        tgs = self.targets[self.targets.inMask > 0]
+        xs, ys = self.slitCorners(tgs, maskPA)
+        labels = tgs.index.to_numpy()
+        return [(labels[a], labels[b]) for a, b in findConflicts(xs, ys, minSep).tolist()]
+
+    def resolveSlitConflicts(self, maskPA=None, minSep=0):
+        """
+        Removes slits from the mask (inMask=0) until no slits overlap.
+        Slits are kept in order of alignment boxes first, preselected, pcode.
+        Returns the index labels of the removed targets.
+        """
+        tgs = self.targets[self.targets.inMask > 0]
+        xs, ys = self.slitCorners(tgs, maskPA)
+        drop = resolveConflicts(findConflicts(xs, ys, minSep), slitPriorities(tgs.pcode, tgs.selected))
+        labels = tgs.index.to_numpy()[drop]
+        self.targets.loc[labels, "inMask"] = 0
+        if len(labels):
+            SMDTLogger.info(f"Removed {len(labels)} overlapping slits")
+        return labels.tolist()
+
+    def fitSlits(self, minSlitLength, instrument=None, margin=None, maskPA=None, step=0.5):
+        """
+        Trims the slits in the mask that cross an edge of the mask, shrunk by margin, see MaskGeometry.raster
+        and slitGeometry.fitSlitLengths.
+        Slits shorter than minSlitLength after trimming, alignment boxes crossing an edge,
+        and slits with corners outside next to the target are removed (inMask=0).
+
+        instrument, margin: default Instrument and maskMargin of the configuration
+        Returns the number of trimmed and of removed slits.
+        """
+        cf = self.config
+        if instrument is None:
+            instrument = cf.getValue("Instrument", "deimos") if cf is not None else "deimos"
+        if margin is None:
+            margin = cf.getValue("maskMargin", 0) if cf is not None else 0
+        maskPA = self.positionAngle if maskPA is None else maskPA
+        raster = getMaskGeometry(instrument, margin).raster()
+
+        tgs = self.targets[self.targets.inMask > 0]
+        if len(tgs) == 0:
+            return 0, 0
+        relPAs = maskPA - tgs.slitLPA.to_numpy(dtype=np.float64)
+        lengths, trimmed, removed = fitSlitLengths(
+            tgs.xarcs, tgs.yarcs, tgs.length1, tgs.length2, tgs.slitWidth / 2, relPAs, tgs.pcode, minSlitLength, raster, step
+        )
+
+        labels = tgs.index.to_numpy()
+        self.targets.loc[labels[trimmed], ["length1", "length2"]] = lengths[trimmed]
+        self.targets.loc[labels[removed], "inMask"] = 0
+
+        nTrimmed, nRemoved = int(trimmed.sum()), int(removed.sum())
+        if self.selectionInfo is not None:
+            self.selectionInfo.update(trimmed=nTrimmed, removed=nRemoved)
+        SMDTLogger.info(f"Slits crossing the mask edges: {nTrimmed} trimmed, {nRemoved} removed")
+        return nTrimmed, nRemoved
 
     def updateTarget(self, jvalues):
         """
@@ -335,51 +699,115 @@ class TargetList:
 
         pcode = int(values["prior"])
         selected = int(values["selected"])
-        slitLPA = float(values["slitLPA"])
+        """ The GUI sends slitPA """
+        slitLPA = float(values.get("slitLPA", values.get("slitPA")))
         slitWidth = float(values["slitWidth"])
         len1 = float(values["len1"])
         len2 = float(values["len2"])
 
         tgs.at[idx, "pcode"] = pcode
         tgs.at[idx, "selected"] = selected
-        tgs.at[idx, "slitLPA"] = slitLPA
-        tgs.at[idx, "slitWidth"] = slitWidth
-        tgs.at[idx, "length1"] = len1
-        tgs.at[idx, "length2"] = len2
+        """ Float columns are float32, see TargetSchema """
+        tgs.at[idx, "slitLPA"] = np.float32(slitLPA)
+        tgs.at[idx, "slitWidth"] = np.float32(slitWidth)
+        tgs.at[idx, "length1"] = np.float32(len1)
+        tgs.at[idx, "length2"] = np.float32(len2)
+        """ Coordinates are not changed, the target is selected again by select(incremental=True) """
+        self._pendingUpdates.add(idx)
         SMDTLogger.info(
             f"Updated target {idx}, pcode={pcode}, selected={selected}, slitLPA={slitLPA:.2f}, slitWidth={slitWidth:.2f}, len1={len1}, len2={len2}"
         )
         return 0
 
-    def markInside(self, layout):
+    def markInside(self, layout, badColumnDist=None):
         """
         Sets the inMask flag to 1 (inside) or 0 (outside)
+        layout: list of polygons, or the name of an instrument.
+            For an instrument, the status column is set too, see MaskGeometry.classify:
+            targets in the guider FOV or closer than badColumnDist to a bad column are not inside,
+            and are not offered to the selection, see select.
+        badColumnDist: in arcsec, default badColumnDist of the configuration
         """
-        inOutChecker = InOutChecker(layout)
         tgs = self.targets
-        inMask = []
-        for i, stg in tgs.iterrows():
-            isIn = 1 if inOutChecker.checkPoint(stg.xarcs, stg.yarcs) else 0
-            inMask.append(isIn)
-        self.targets["inMask"] = inMask
+        """ Targets not projected, see reCalcCoordinates, have NaN coordinates and are outside """
+        xarcs, yarcs = tgs.xarcs.to_numpy(dtype=np.float64), tgs.yarcs.to_numpy(dtype=np.float64)
+        if isinstance(layout, str):
+            if badColumnDist is None:
+                badColumnDist = self.config.getValue("badColumnDist", DefaultBadColumnDist) if self.config is not None else DefaultBadColumnDist
+            status = getMaskGeometry(layout).classify(xarcs, yarcs, badColumnDist)
+            self.targets["status"] = status
+            inside = status == StatusInside
+        else:
+            inside = MaskRaster(layout).checkPoints(xarcs, yarcs)
+        self.targets["inMask"] = inside.astype(np.int8)
+
+    def getCullRadius(self):
+        """
+        Returns the radius in degree around the field center, outside of which targets are not projected.
+        The radius is cullRadiusDeg from the configuration plus the offset of the field center, fldCenX/fldCenY.
+        Returns 0 if culling is disabled.
+        """
+        cf = self.config
+        radius = cf.getValue("cullRadiusDeg", 0)
+        if radius <= 0:
+            return 0
+        return radius + math.hypot(cf.getValue("fldCenX", 0), cf.getValue("fldCenY", 0)) / 3600.0
 
     def reCalcCoordinates(self, raDeg, decDeg, posAngleDeg):
         """
         Recalculates xarcs and yarcs for new center RA/DEC and positionAngle
-        Results saved in xarcs, yarcs
+        Results saved in xarcs, yarcs, the status column of markInside is removed.
+        Targets farther than getCullRadius() from the center are not projected, xarcs and yarcs are nan.
 
         Returns xarcs, yarcs in focal plane coordinates in arcs.
         """
         telRaRad, telDecRad = self._fld2telax(raDeg, decDeg, posAngleDeg)
         self.telRaRad, self.telDecRad = telRaRad, telDecRad
+        self._pointing = raDeg, decDeg, posAngleDeg
 
-        xarcs, yarcs = self._calcTelTargetCoords(telRaRad, telDecRad, self.targets.raHour, self.targets.decDeg, posAngleDeg)
+        cullRadius = self.getCullRadius()
+        if cullRadius > 0:
+            xarcs, yarcs = self.getProjectionEngine().projectNear(telRaRad, telDecRad, posAngleDeg, raDeg, decDeg, cullRadius)
+        else:
+            xarcs, yarcs = self.getProjectionEngine().project(telRaRad, telDecRad, posAngleDeg)
         self.targets["xarcs"] = xarcs
         self.targets["yarcs"] = yarcs
+        if "status" in self.targets:
+            """ The status is for the previous pointing, see markInside """
+            self.targets.drop(columns="status", inplace=True)
 
         self.__updateDate()
         return xarcs, yarcs
 
+    def reCalcDistortedCoordinates(self, raDeg, decDeg, posAngleDeg):
+        """
+        Same as reCalcCoordinates, then applies the distortion model, see getDistortionModel.
+        xarcs and yarcs of the targets are not distorted.
+
+        Returns the distorted xarcs, yarcs.
+        """
+        xarcs, yarcs = self.reCalcCoordinates(raDeg, decDeg, posAngleDeg)
+        return self.getDistortionModel().evaluate(xarcs, yarcs)
+
+    def projectPointings(self, raDegs, decDegs, posAngleDegs, maxBytes=ChunkBytes, distort=False):
+        """
+        Projects the targets for many pointings, without changing xarcs/yarcs of the targets.
+        raDegs, decDegs: field centers, posAngleDegs: position angles,
+        scalars or arrays, broadcast to the same length M.
+        The temporary arrays are limited to about maxBytes, see ProjectionEngine.projectMany.
+        distort=True applies the distortion model to each chunk.
+
+        Returns xarcs, yarcs, arrays of shape (M, N), N being the number of targets.
+        """
+        raDegs, decDegs, posAngleDegs = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(raDegs, dtype=np.float64)),
+            np.atleast_1d(np.asarray(decDegs, dtype=np.float64)),
+            np.atleast_1d(np.asarray(posAngleDegs, dtype=np.float64)),
+        )
+        telRaRads, telDecRads = self._fld2telax(raDegs, decDegs, posAngleDegs)
+        transform = self.getDistortionModel().evaluate if distort else None
+        return self.getProjectionEngine().projectMany(telRaRads, telDecRads, posAngleDegs, maxBytes, transform)
+
     def _project2FocalPlane(self, cenRADeg, cenDecDeg, raHours, decDegs, paDeg):
         """
         Alternative to reCalCoordinates
@@ -406,6 +834,7 @@ class TargetList:
     def _fld2telax(self, raDeg, decDeg, posAngle):
         """
         Returns telRaRad and telDecRad.
+        raDeg, decDeg and posAngle can be scalars or arrays.
         
         This is taken from dsim.x, procedure fld2telax
         FLD2TELAX:  from field center and rotator PA, calc coords of telescope axis   
@@ -420,60 +849,30 @@ class TargetList:
         sinr = math.sin(r)
 
         #
-        decRad = math.radians(decDeg)
-        cosd = math.cos(decRad)  # this is the declination of the center of the field
-        sind = math.sin(decRad)  # same
+        decRad = np.radians(decDeg)
+        cosd = np.cos(decRad)  # this is the declination of the center of the field
+        sind = np.sin(decRad)  # same
         # pa_fld
 
-        pa_diff = math.radians(posAngle) - pa_fld
+        pa_diff = np.radians(posAngle) - pa_fld
 
-        cost = math.cos(pa_diff)  # pa_fld is calculated above as arctan(fldceny/fldcenx)
-        sint = math.sin(pa_diff)
+        cost = np.cos(pa_diff)  # pa_fld is calculated above as arctan(fldceny/fldcenx)
+        sint = np.sin(pa_diff)
 
         sina = sinr * sint / cosd
-        cosa = math.sqrt(1.0 - sina * sina)
+        cosa = np.sqrt(1.0 - sina * sina)
 
         return (
-            math.radians(raDeg) - math.asin(sina),
-            math.asin((sind * cosd * cosa - cosr * sinr * cost) / (cosr * cosd * cosa - sinr * sind * cost)),
+            np.radians(raDeg) - np.arcsin(sina),
+            np.arcsin((sind * cosd * cosa - cosr * sinr * cost) / (cosr * cosd * cosa - sinr * sind * cost)),
         )
 
-    def _calcTelTargetCoords(self, ra0Rad, dec0Rad, raHours, decDegs, posAngle):
+    def getDistortionModel(self):
         """
-        Converts targets coordinates (raHours, decDegs) to xarcs and yarcs
-        Xarcs and Yarcs are in focal plane coordinates in arcsec.
-        
-        Ported from dsimulator
-        ra0Rad and dec0Rad must be calculated via fld2telax().
-        
+        Returns the distortion model of the configuration, see smdtLibs/distortion.py.
+        The model is built once and evaluates the polynomials faster than the astropy models.
         """
-
-        pa0 = math.radians(posAngle)
-
-        decRad = np.radians(decDegs)
-        sinDec = np.sin(decRad)
-        sinDec0 = math.sin(dec0Rad)
-        cosDec = np.cos(decRad)
-        cosDec0 = math.cos(dec0Rad)
-
-        deltaRA = np.radians(raHours * 15) - ra0Rad
-        cosDeltaRA = np.cos(deltaRA)
-        sinDeltaRA = np.sin(deltaRA)
-
-        cosr = sinDec * sinDec0 + cosDec * cosDec0 * cosDeltaRA
-        # cosr = np.clip(cosr, 0, 1.0)
-        sinr = np.sqrt(np.abs(1.0 - cosr * cosr))
-        # r = np.arccos(cosr)
-        t1 = np.where (sinr == 0.0, 0, cosDec * sinDeltaRA)
-        t2 = np.where (sinr == 0.0, 1, sinr)
-        sinp = np.divide (t1, t2)
-        
-        cosp = np.sqrt(np.abs(1.0 - sinp * sinp)) * np.where(decRad < dec0Rad, -1, 1)
-        p = np.arctan2(sinp, cosp)
-
-        rArcsec = sinr / cosr * math.degrees(1) * 3600
-        deltaPA = pa0 - p
-        return rArcsec * np.cos(deltaPA), rArcsec * np.sin(deltaPA)
+        return getDistortionModel(self.config)
 
     def getDistortionFunctions (self):
         """
@@ -5,6 +5,7 @@
 #
 import pytest
 import sys
+import pickle
 
 sys.path.append("../smdtLibs")
 from configFile import ConfigFile
@@ -37,3 +38,12 @@ def test_config3():
 
     assert ccf.dssServerURL == expectedUrl, f"Failed to get attribute dssServerURL"
 
+
+def test_configPickle():
+    """
+    Checks that the configuration can be sent to worker processes
+    """
+    ccf = ConfigFile("../smdt.cfg")
+    ccf.properties["params"] = ConfigFile("../params.cfg")
+    ccf2 = pickle.loads(pickle.dumps(ccf))
+    assert ccf2.dssServerURL == ccf.dssServerURL and ccf2.params.projectname[0] == "New Mask", "Unexpected values"
@@ -0,0 +1,68 @@
+#
+# Test running DssHeader
+#
+# Created: 2026-10-18
+#
+import pytest
+import sys
+import numpy as np
+
+sys.path.extend(("..", "../smdtLibs"))
+from dss2Header import DssHeader
+
+"""
+Header with a plate solution of the same order of magnitude as the DSS plates
+"""
+DssHeaders = {
+    "NAXIS1": 1000, "NAXIS2": 1000, "XPIXELS": 1000, "YPIXELS": 1000,
+    "PLTRAH": 10, "PLTRAM": 0, "PLTRAS": 0.0, "PLTDECSN": "+", "PLTDECD": 11, "PLTDECM": 0, "PLTDECS": 0.0,
+    "CNPIX1": 11000, "CNPIX2": 11500, "XPIXELSZ": 15.0, "YPIXELSZ": 15.0, "PPO3": 177500, "PPO6": 177500, "PLTSCALE": 67.2,
+    "AMDX1": 67.4818, "AMDX2": 0.0312, "AMDX3": -64.79, "AMDX4": -3.1e-5, "AMDX5": 2.8e-5, "AMDX6": 1.2e-5, "AMDX7": 0.0,
+    "AMDX8": 2.4e-6, "AMDX9": -6e-7, "AMDX10": 2.2e-6, "AMDX11": -5e-7, "AMDX12": 1.5e-6, "AMDX13": -1.2e-9,
+    "AMDY1": 67.4827, "AMDY2": -0.0311, "AMDY3": 129.0, "AMDY4": -2.7e-5, "AMDY5": -3.3e-5, "AMDY6": 1.1e-5, "AMDY7": 0.0,
+    "AMDY8": 2.3e-6, "AMDY9": -4e-7, "AMDY10": 2.1e-6, "AMDY11": 3e-7, "AMDY12": 1.4e-6, "AMDY13": -1.1e-9,
+}
+
+
+def _randomSky(header, n):
+    rng = np.random.default_rng(0)
+    xs, ys = rng.uniform(0, 1000, n), rng.uniform(0, 1000, n)
+    rds = np.array([header._xy2rd(x, y) for x, y in zip(xs, ys)])
+    return xs, ys, rds[:, 0], rds[:, 1]
+
+
+def test_rd2xyArray():
+    """
+    Checks the array version of rd2xy against the scalar routine
+    """
+    header = DssHeader(DssHeaders, 150.1, 11.05)
+    xs, ys, ras, decs = _randomSky(header, 500)
+
+    axs, ays, notConverged = header._rd2xyArray(ras, decs)
+    sxys = np.array([header._rd2xy(r, d) for r, d in zip(ras, decs)])
+    assert not np.any(notConverged), "Unexpected not converged"
+    assert np.allclose(axs, sxys[:, 0], rtol=0, atol=1e-9) and np.allclose(ays, sxys[:, 1], rtol=0, atol=1e-9), "Unexpected x/y"
+    assert np.allclose(axs, xs, rtol=0, atol=1e-6) and np.allclose(ays, ys, rtol=0, atol=1e-6), "Round trip failed"
+
+    rxs, rys, badIdx = header.rd2xyArray(ras / 15, decs)
+    assert len(badIdx) == 0 and np.allclose(rxs, header.rd2xy(ras / 15, decs)[0], rtol=0, atol=1e-9), "Unexpected relative x/y"
+
+    """ Not enough iterations """
+    axs, ays, notConverged = header._rd2xyArray(ras, decs, maxiters=1)
+    assert np.all(notConverged), "Expected not converged"
+
+
+def test_xy2rdArray():
+    """
+    Checks the array version of xy2rd against the scalar routine
+    """
+    header = DssHeader(DssHeaders, 150.1, 11.05)
+    xs, ys, ras, decs = _randomSky(header, 500)
+
+    aras, adecs = header._xy2rdArray(xs, ys)
+    assert np.allclose(aras, ras, rtol=0, atol=1e-12) and np.allclose(adecs, decs, rtol=0, atol=1e-12), "Unexpected ra/dec"
+    lras, ldecs = header.xy2rd(xs, ys)
+    assert lras == aras.tolist() and ldecs == adecs.tolist(), "Unexpected list ra/dec"
+
+    footprint = header.getFootprint()
+    assert len(footprint) == 20 and footprint[0] == pytest.approx(header._xy2rd(0, 0), abs=1e-12), "Unexpected footprint"
@@ -5,6 +5,7 @@
 #
 import pytest
 import sys
+import numpy as np
 
 
 sys.path.extend(("..", "../smdtLibs"))
@@ -15,4 +16,23 @@ from maskLayouts import MaskLayouts
 def test_inOutChecker1():
     chk = InOutChecker(MaskLayouts["deimos"])
     pnt = 520, 100
-    assert not chk.checkPoint(*pnt), f"Unexpected result for {pnt}"
+    assert not chk.checkPoint(*pnt) and not chk.checkPoints(*pnt), f"Unexpected result for {pnt}"
+
+
+@pytest.mark.parametrize("instrument", sorted(MaskLayouts))
+def test_checkPoints(instrument, capsys):
+    """
+    Checks the array version against checkPoint, on random points and on the edges
+    """
+    chk = InOutChecker(MaskLayouts[instrument])
+    rng = np.random.default_rng(1)
+    xs = rng.uniform(-600, 600, 20000)
+    ys = rng.uniform(chk.ymin - 20, chk.ymax + 20, 20000)
+    edgeY, edgeX = np.nonzero(np.isfinite(chk.edgeTable))
+    xs = np.concatenate((xs, chk.edgeTable[edgeY, edgeX], [np.nan, 0, np.inf]))
+    ys = np.concatenate((ys, edgeY + chk.ymin + 0.5, [0, np.nan, 0]))
+
+    inside = chk.checkPoints(xs, ys)
+    assert inside.any(), "Expected points inside"
+    assert inside.tolist() == [chk.checkPoint(x, y) for x, y in zip(xs.tolist(), ys.tolist())], "Unexpected result"
+    capsys.readouterr()
@@ -13,7 +13,7 @@ sys.path.extend(("..", "../smdtLibs"))
 from configFile import ConfigFile
 from targets import TargetList
 from inOutChecker import InOutChecker
-from maskDesignFile import MaskDesignOutputFitsFile, MaskLayouts
+from maskDesignFile import MaskDesignOutputFitsFile, MaskDesignInputFitsFile, MaskLayouts, outputAsList
 import utils
 
 logging.disable()
@@ -46,12 +46,22 @@ def test_MaskDesignFile(init_targets):
     assert os.path.exists("testout.fits"), "Failed to create mask design file"
 
 
+def test_outputAsList(init_targets, tmp_path):
+    tlist, config = init_targets
+    tlist.targets["slitLPA"] = np.float32(0.7)
+    tlist.targets.loc[1, "slitLPA"] = np.float32(-12.35)
+    fileName = str(tmp_path / "out.lst")
+    outputAsList(fileName, tlist.targets.iloc[:2])
+    with open(fileName) as fh:
+        lines = fh.readlines()
+    assert [line.split()[-1] for line in lines] == ["0.7", "-12.35"], "Unexpected slitLPA"
+
+
 def test_MaskDesignFile2(init_targets):
     tlist, config = init_targets
     inOutChecker = InOutChecker(MaskLayouts[config.params.Instrument[0].lower()])
-    for i, stg in tlist.targets.iterrows():
-        if inOutChecker.checkPoint(stg.xarcs, stg.yarcs):
-            tlist.targets.at[stg.orgIndex, "inMask"] = 1
+    inside = inOutChecker.checkPoints(tlist.targets.xarcs, tlist.targets.yarcs)
+    tlist.targets.loc[inside, "inMask"] = 1
 
     ft = MaskDesignOutputFitsFile(tlist)
 
@@ -62,3 +72,16 @@ def test_MaskDesignFile2(init_targets):
 
     assert os.path.exists("testout.fits"), "Failed to create mask design file"
 
+
+def test_MaskDesignInputFitsFile():
+    """
+    Checks that tables are loaded only when used
+    """
+    mdf = MaskDesignInputFitsFile("../../DeimosExamples/TravisBerger/M31_Field_2_Obs_1.fits")
+    raDeg, decDeg = mdf.getCenter()
+    assert abs(raDeg - 11.11976792) < 1e-8 and abs(decDeg - 41.54939966) < 1e-8, "Unexpected center"
+    assert "desislits" not in mdf.__dict__ and "allSlits" not in mdf.__dict__, "Slit tables loaded too early"
+
+    assert len(mdf.allSlits) == len(mdf.slitobjmap), "Unexpected number of slits"
+    assert "desislits" in mdf.__dict__, "Slit tables not loaded"
+    mdf.close()
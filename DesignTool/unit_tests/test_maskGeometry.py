@@ -0,0 +1,72 @@
+#
+# Test of the geometry cache
+#
+# Created: 2026-10-18
+#
+import pytest
+import sys
+import json
+import logging
+import concurrent.futures
+import numpy as np
+
+sys.path.extend(("..", "../smdtLibs"))
+from configFile import ConfigFile
+from targets import TargetList
+from maskLayouts import MaskLayouts, shrinkMask
+from maskGeometry import getMaskGeometry, StatusOutside, StatusInside, StatusGuiderFOV, StatusBadColumn
+from maskRaster import getMaskRaster
+
+logging.disable()
+
+
+def test_getMaskGeometry():
+    """
+    Checks that the geometry is built once, also from several threads, and its values
+    """
+    with concurrent.futures.ThreadPoolExecutor(8) as pool:
+        geometries = list(pool.map(lambda k: getMaskGeometry("DEIMOS" if k % 2 else "deimos", 0.5), range(32)))
+    geometry = geometries[0]
+    assert all(g is geometry for g in geometries), "Geometry built more than once"
+    assert getMaskGeometry("deimos") is not geometry, "Unexpected geometry for another margin"
+
+    reduced = shrinkMask(MaskLayouts["deimos"], 0.5)
+    assert geometry.mask == tuple(reduced), "Unexpected reduced mask"
+    assert (geometry.minX, geometry.maxX) == (np.min(reduced, axis=0)[0], np.max(reduced, axis=0)[0]), "Unexpected bounding box"
+    assert (getMaskGeometry("deimos").minX, getMaskGeometry("deimos").maxX) == (-498, 498), "Unexpected bounding box"
+
+    info = json.loads(geometry.layoutJson)
+    assert info["mask"] == json.loads(json.dumps(MaskLayouts["deimos"])) and len(info["reducedMask"]) == len(reduced), "Unexpected layout"
+    assert "reducedMask" not in json.loads(getMaskGeometry("deimos").layoutJson), "Unexpected layout"
+
+
+def test_markInside():
+    """
+    Checks the status of the targets, and that excluded targets are not selected
+    """
+    config = ConfigFile("../smdt.cfg")
+    config.properties["catalogcacheenabled"] = False
+    tlist = TargetList("../../DeimosExamples/EvanKirby/n2419c.list", config=config)
+    tlist.markInside(MaskLayouts["deimos"])
+    inside = tlist.targets.inMask.to_numpy(copy=True) == 1
+    assert "status" not in tlist.targets, "Unexpected status"
+
+    tlist.markInside("deimos", badColumnDist=3)
+    status = tlist.targets.status.to_numpy()
+    assert np.array_equal(inside, status > StatusOutside), "Unexpected status"
+    assert np.array_equal(tlist.targets.inMask == 1, status == StatusInside), "Unexpected inMask"
+    assert (status == StatusGuiderFOV).sum() > 0 and (status == StatusBadColumn).sum() > 0, "Expected excluded targets"
+
+    xs, ys = tlist.targets.xarcs.to_numpy(), tlist.targets.yarcs.to_numpy()
+    assert np.array_equal(inside, getMaskRaster("deimos").checkPoints(xs, ys)), "Unexpected mask"
+    guider = getMaskRaster("deimos", "guiderFOV").checkPoints(xs, ys)
+    badColumns = getMaskRaster("deimos", "badColumns", -3).checkPoints(xs, ys)
+    assert np.array_equal(status == StatusGuiderFOV, inside & guider), "Unexpected guider FOV"
+    assert np.array_equal(status == StatusBadColumn, inside & ~guider & badColumns), "Unexpected bad columns"
+
+    geometry = getMaskGeometry("deimos")
+    tlist.select(np.flatnonzero(inside), geometry.minX, geometry.maxX, 8, 0.5, 4)
+    assert np.all(status[tlist.targets.inMask == 1] == StatusInside), "Excluded target selected"
+
+    tlist.reCalcCoordinates(tlist.centerRADeg, tlist.centerDEC, tlist.positionAngle)
+    assert "status" not in tlist.targets, "Status of the previous pointing"
@@ -0,0 +1,64 @@
+#
+# Test of the position angle and center optimizer
+#
+# Created: 2026-10-18
+#
+import pytest
+import sys
+import logging
+
+sys.path.extend(("..", "../smdtLibs"))
+from configFile import ConfigFile
+from targets import TargetList
+from maskOptimizer import MaskOptimizer, PointingEvaluator
+
+logging.disable()
+
+
+def _targetList():
+    config = ConfigFile("../smdt.cfg")
+    config.properties["catalogcacheenabled"] = False
+    return TargetList("../../DeimosExamples/EvanKirby/n2419c.list", config=config), config
+
+
+@pytest.mark.parametrize("pa, mode, minSlitLength", ((60, "greedy", 8), (60, "optimal", 8), (10, "greedy", 20)))
+def test_pointingEvaluator(pa, mode, minSlitLength):
+    """
+    Checks that the evaluation of a configuration is the same as recalculating the mask,
+    including the slits trimmed or removed at the mask edges
+    """
+    tlist, config = _targetList()
+    raDeg, decDeg = tlist.centerRADeg, tlist.centerDEC
+    evaluator = PointingEvaluator(tlist, "deimos", minSlitLength, 0.5, 4, mode, margin=0.5)
+    nSelected, objective = evaluator.evaluate(raDeg, decDeg, pa)
+
+    """ As SlitmaskDesignTool.recalculateMask """
+    tlist.positionAngle = pa
+    tlist.reCalcCoordinates(raDeg, decDeg, pa)
+    tlist.markInside("deimos")
+    idx = (tlist.targets.inMask == 1).to_numpy().nonzero()[0]
+    tlist.select(idx, evaluator.minX, evaluator.maxX, minSlitLength, 0.5, 4, mode)
+    tlist.fitSlits(minSlitLength, "deimos", 0.5)
+    selected = tlist.targets[tlist.targets.inMask == 1]
+    science = selected.pcode[selected.pcode > 0]
+    assert nSelected == len(science) and objective == science.sum(), "Unexpected evaluation"
+
+
+def test_optimize():
+    """
+    Checks that the process pool gives the same results, and that refinement does not make it worse
+    """
+    tlist, config = _targetList()
+    args = (tlist.centerRADeg, tlist.centerDEC, tlist.positionAngle)
+    kwargs = dict(paSpan=10, paStep=10, offsetMax=10, offsetStep=10, nBest=3)
+
+    best0 = MaskOptimizer(tlist, config, nProcs=1).optimize(*args, levels=0, **kwargs)
+    best1 = MaskOptimizer(tlist, config, nProcs=2).optimize(*args, levels=0, **kwargs)
+    assert best0 == best1, "Process pool gives different results"
+    assert best0[0]["objective"] >= best0[-1]["objective"], "Not sorted"
+
+    best2 = MaskOptimizer(tlist, config, nProcs=1).optimize(*args, levels=1, **kwargs)
+    assert best2[0]["objective"] >= best0[0]["objective"], "Refinement made it worse"
+
+    with pytest.raises(ValueError):
+        MaskOptimizer(tlist, config, nProcs=1).optimize(*args, rankBy="area")
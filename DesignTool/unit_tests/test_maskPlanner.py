@@ -0,0 +1,72 @@
+#
+# Test of the multi-mask planner
+#
+# Created: 2026-10-18
+#
+import pytest
+import sys
+import logging
+import numpy as np
+
+sys.path.extend(("..", "../smdtLibs"))
+from configFile import ConfigFile
+from targets import TargetList
+import maskPlanner
+from maskPlanner import MaskPlanner, _selectMask
+from maskDesignFile import MaskDesignInputFitsFile
+
+logging.disable()
+
+
+@pytest.mark.parametrize("nProcs, rerank", ((1, False), (2, True)))
+def test_plan(tmp_path, nProcs, rerank):
+    """
+    Checks that targets are on at most one mask, and the mask design files
+    """
+    config = ConfigFile("../smdt.cfg")
+    config.properties["params"] = ConfigFile("../params.cfg")
+    config.properties["catalogcacheenabled"] = False
+    tlist = TargetList("../../DeimosExamples/EvanKirby/n2419c.list", config=config)
+    raDeg, decDeg = tlist.centerRADeg, tlist.centerDEC
+    pointings = [(raDeg, decDeg, 50), (raDeg, decDeg, 50), (raDeg, decDeg - 0.01, 140)]
+
+    planner = MaskPlanner(tlist, config, nProcs=nProcs)
+    masks = planner.plan(pointings, rerank=rerank)
+    onMask = np.array([((m.targets.inMask == 1) & (m.targets.pcode > 0)).to_numpy() for m in masks])
+    assert np.all(onMask.sum(axis=0) <= 1), "Target on more than one mask"
+    assert np.all(onMask.sum(axis=1) > 10), "Expected targets on every mask"
+
+    single = MaskPlanner(tlist, config, nProcs=1).plan(pointings[:1])[0].targets
+    assert onMask.sum() > ((single.inMask == 1) & (single.pcode > 0)).sum(), "Expected more targets on several masks"
+
+    fileNames = planner.writeMasks(masks, str(tmp_path / "n2419"))
+    for fileName, (ra, dec, pa), nTargets in zip(fileNames, pointings, onMask.sum(axis=1)):
+        mdf = MaskDesignInputFitsFile(fileName)
+        assert mdf.maskdesign.PA_PNT[0] == pa, "Unexpected PA"
+        assert (mdf.desislits.slitTyp == "P").sum() == nTargets, "Unexpected number of slits"
+        mdf.close()
+
+
+def test_planKeepsPreselected(monkeypatch):
+    """
+    Checks that the preselected targets of the catalog stay preselected in the passes after the first one
+    """
+    config = ConfigFile("../smdt.cfg")
+    config.properties["params"] = ConfigFile("../params.cfg")
+    config.properties["catalogcacheenabled"] = False
+    tlist = TargetList("../../DeimosExamples/EvanKirby/n2419c.list", config=config)
+    raDeg, decDeg = tlist.centerRADeg, tlist.centerDEC
+    pointings = [(raDeg, decDeg, 50), (raDeg, decDeg, 50), (raDeg, decDeg - 0.01, 140)]
+    preselected = tlist.targets.selected.to_numpy() > 0
+
+    calls = []
+
+    def selectMask(targets, *args):
+        calls.append(targets[["selected"]].copy())
+        return _selectMask(targets, *args)
+
+    monkeypatch.setattr(maskPlanner, "_selectMask", selectMask)
+    MaskPlanner(tlist, config, nProcs=1).plan(pointings)
+    assert len(calls) > len(pointings), "Expected more than one pass"
+    for tgs in calls:
+        assert np.all(tgs.selected.to_numpy()[preselected[tgs.index]] > 0), "Preselected target lost"
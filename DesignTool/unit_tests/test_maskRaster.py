@@ -0,0 +1,50 @@
+#
+# Test of the rasterized mask layouts
+#
+# Created: 2026-10-18
+#
+import pytest
+import sys
+import numpy as np
+
+sys.path.extend(("..", "../smdtLibs"))
+from maskRaster import MaskRaster, getMaskRaster, Layers
+from maskLayouts import MaskLayouts
+from inOutChecker import InOutChecker
+
+
+@pytest.mark.parametrize("layer", sorted(Layers))
+@pytest.mark.parametrize("margin", (0, 0.5, -0.5))
+def test_checkPoints(layer, margin):
+    """
+    Checks the raster against the exact test, on random points and close to the vertices
+    """
+    raster = getMaskRaster("deimos", layer, margin)
+    rng = np.random.default_rng(1)
+    vertices = np.array([(x, y) for x, y, flag in Layers[layer]["deimos"]])
+    xs = np.concatenate((rng.uniform(-520, 520, 50000), np.repeat(vertices[:, 0], 100) + rng.normal(0, 1, len(vertices) * 100), [np.nan]))
+    ys = np.concatenate((rng.uniform(80, 500, 50000), np.repeat(vertices[:, 1], 100) + rng.normal(0, 1, len(vertices) * 100), [300]))
+
+    inside = raster.checkPoints(xs, ys)
+    assert inside.any() and not inside[-1], "Unexpected result"
+    assert inside.tolist() == raster._classify(xs, ys)[0].tolist(), "Raster differs from exact test"
+    assert raster is getMaskRaster("DEIMOS", layer, margin), "Raster not cached"
+
+
+def test_margin():
+    """
+    Checks that margins shrink and grow the mask, and the bad columns get a width
+    """
+    xs, ys = np.random.default_rng(2).uniform(-520, 520, 20000), np.random.default_rng(3).uniform(150, 500, 20000)
+    inside = getMaskRaster("deimos").checkPoints(xs, ys)
+    shrunk = getMaskRaster("deimos", margin=2).checkPoints(xs, ys)
+    grown = getMaskRaster("deimos", margin=-2).checkPoints(xs, ys)
+    assert np.all(shrunk <= inside) and np.all(inside <= grown) and shrunk.sum() < inside.sum() < grown.sum(), "Unexpected margin"
+
+    """ Far from the edges, same as InOutChecker """
+    far = getMaskRaster("deimos", margin=2).checkPoints(xs, ys) | ~grown
+    assert np.array_equal(inside[far], InOutChecker(MaskLayouts["deimos"]).checkPoints(xs, ys)[far]), "Unexpected result"
+
+    badColumns = getMaskRaster("deimos", "badColumns", -0.5)
+    assert badColumns.checkPoints([-107.3, -106, 205.5], [300, 300, 187.5]).tolist() == [True, False, True], "Unexpected bad columns"
+    assert not getMaskRaster("lris", "badColumns").checkPoints(0, 0), "Unexpected bad columns"
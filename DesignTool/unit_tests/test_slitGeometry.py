@@ -0,0 +1,99 @@
+#
+# Test of the slit overlap check
+#
+# Created: 2026-10-18
+#
+import pytest
+import sys
+import logging
+import numpy as np
+
+sys.path.extend(("..", "../smdtLibs"))
+from configFile import ConfigFile
+from targets import TargetList
+from slitGeometry import slitCorners, findConflicts, resolveConflicts, _separated, _distances
+from maskDesignFile import MaskDesignOutputFitsFile
+from maskGeometry import getMaskGeometry
+
+logging.disable()
+
+
+def _randomSlits(n, seed):
+    rng = np.random.default_rng(seed)
+    xarcs, yarcs = rng.uniform(-300, 300, n), rng.uniform(-150, 150, n)
+    length1, length2 = rng.uniform(1, 10, n), rng.uniform(1, 10, n)
+    return slitCorners(xarcs, yarcs, length1, length2, rng.uniform(0.5, 1.5, n), rng.uniform(-60, 60, n))
+
+
+@pytest.mark.parametrize("minSep", (0, 0.5, 3))
+def test_findConflicts(minSep):
+    """
+    Checks the sweep line against all pairs
+    """
+    xs, ys = _randomSlits(400, 1)
+    i, j = np.triu_indices(len(xs), 1)
+    brute = np.column_stack((i, j))[~_separated(xs, ys, i, j) | (_distances(xs, ys, i, j) < minSep)]
+    pairs = findConflicts(xs, ys, minSep)
+    assert len(pairs) > 0 and np.array_equal(pairs, brute), "Unexpected conflicts"
+
+    drop = resolveConflicts(pairs, np.arange(len(xs)) % 5)
+    keep = np.setdiff1d(np.arange(len(xs)), drop)
+    assert len(findConflicts(xs[keep], ys[keep], minSep)) == 0, "Conflicts left"
+    assert set(drop.tolist()) <= set(pairs.ravel().tolist()), "Removed a slit without conflict"
+
+
+def test_checkSlits():
+    """
+    Checks the slits of a selection, and that overlapping slits are not written in strict mode
+    """
+    config = ConfigFile("../smdt.cfg")
+    config.properties["params"] = ConfigFile("../params.cfg")
+    tlist = TargetList("../../DeimosExamples/MihoIshigaki/CetusIII.lst", config=config)
+    tlist.targets["slitLPA"] = np.float32(tlist.positionAngle + 30)
+    tlist.select(np.arange(tlist.targets.shape[0]), -400, 400, 8, 0.5, 4)
+    assert tlist.checkSlits() == [] and tlist.selectionInfo["dropped"] == 0, "Selection has overlapping slits"
+
+    """ Slits corners as written by genBluSlits """
+    tgs = tlist.targets[tlist.targets.inMask > 0].copy()
+    tgs["slitWidth"] = np.float32(0.7)
+    rel = np.radians(tlist.positionAngle - tgs.slitLPA.to_numpy())
+    x10 = tgs.xarcs + np.cos(rel) * tgs.length1
+    xs, ys = tlist.slitCorners(tgs)
+    assert np.allclose(xs[:, 0], x10) and np.allclose(ys[:, 1] - ys[:, 0], 0.7), "Unexpected corners"
+    assert np.allclose(ys[:, 0], tgs.yarcs + np.sin(rel) * tgs.length1 - 0.35), "Unexpected corners"
+
+    tlist.targets["inMask"] = 1
+    tlist.targets["length1"], tlist.targets["length2"] = np.float32(20), np.float32(20)
+    assert len(tlist.checkSlits()) > 0, "Expected overlapping slits"
+    with pytest.raises(ValueError):
+        MaskDesignOutputFitsFile(tlist, strict=True)._getHDUList()
+
+    removed = tlist.resolveSlitConflicts()
+    assert len(removed) > 0 and tlist.checkSlits() == [], "Conflicts left"
+    assert (tlist.targets.inMask[tlist.targets.pcode < 0] == 1).all(), "Alignment box removed"
+
+    """ Two alignment boxes on top of each other, the selection keeps one of them """
+    tgs = tlist.targets
+    box, other = np.flatnonzero((tgs.pcode == -2) & (tgs.xarcs.abs() < 300))[0], np.flatnonzero(tgs.pcode > 0)[0]
+    tgs.loc[other, ["pcode", "xarcs", "yarcs"]] = -2, tgs.xarcs[box], tgs.yarcs[box] + 1
+    tlist.select(np.arange(tgs.shape[0]), -400, 400, 8, 0.5, 4)
+    assert tlist.selectionInfo["dropped"] == 1 and tlist.checkSlits() == [], "Overlapping boxes not resolved"
+    assert tgs.inMask[box] + tgs.inMask[other] == 1, "Expected one of the boxes"
+
+
+@pytest.mark.parametrize("fileName", ("EvanKirby/n2419c.list", "MihoIshigaki/CetusIII.lst"))
+@pytest.mark.parametrize("mode", ("greedy", "optimal"))
+def test_extendedSlits(fileName, mode):
+    """
+    Checks that extended slits are on the sides of slitCorners and do not overlap, also when tilted
+    """
+    config = ConfigFile("../smdt.cfg")
+    config.properties["params"] = ConfigFile("../params.cfg")
+    config.properties["catalogcacheenabled"] = False
+    tlist = TargetList("../../DeimosExamples/" + fileName, config=config)
+    tlist.targets["slitLPA"] = np.float32(tlist.positionAngle + 30)
+    tlist.markInside("deimos")
+    geometry = getMaskGeometry("deimos")
+    tlist.select(np.flatnonzero(tlist.targets.inMask == 1), geometry.minX, geometry.maxX, 8, 0.5, 4, mode=mode, extend=True)
+    info = tlist.selectionInfo
+    assert info["dropped"] == 0 and info["nSelected"] == (tlist.targets.inMask == 1).sum(), "Extended slits overlap"
@@ -0,0 +1,181 @@
+#
+# Test running TargetSelector
+#
+# Created: 2026-10-18
+#
+import pytest
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.extend(("..", "../smdtLibs"))
+from targetSelector import TargetSelector, SortedIntervals
+
+
+def _mergeAll(segms):
+    """
+    Reference, merges the segments by sorting all of them
+    """
+    out = []
+    for left, right in sorted(segms):
+        if out and left <= out[-1][1]:
+            out[-1] = (out[-1][0], max(right, out[-1][1]))
+        else:
+            out.append((left, right))
+    return out
+
+
+def _randomTargets(n, minX, maxX, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "xarcs": rng.uniform(minX, maxX, n),
+            "length1": np.full(n, 4, dtype=np.float32),
+            "length2": np.full(n, 4, dtype=np.float32),
+            "pcode": rng.choice([-2, 1, 10, 100], n, p=(0.05, 0.35, 0.3, 0.3)),
+            "selected": np.zeros(n, dtype=np.int8),
+            "orgIndex": np.arange(n, dtype=np.int32),
+        }
+    )
+
+
+def test_mergeSegments():
+    """
+    Checks merging segments one by one against merging all at once
+    """
+    rng = np.random.default_rng(1)
+    selector = TargetSelector(_randomTargets(10, -100, 100, 1), -100, 100, 8, 0.5, 4)
+    segms = []
+    xsegms = SortedIntervals()
+    for left in rng.uniform(-500, 500, 300):
+        right = left + rng.uniform(0, 10)
+        segms.append((left, right))
+        xsegms = selector.mergeSegments(xsegms, left, right)
+        assert xsegms.toList() == _mergeAll(segms), "Unexpected merged segments"
+
+    xgaps = selector.segments2Gaps(xsegms, [(-498, 498)], 0.5)
+    gaps = xgaps.toList()
+    assert all(a[1] <= b[0] for a, b in zip(gaps, gaps[1:])), "Gaps not sorted"
+    for left, right in gaps:
+        assert all(right <= sl or sr <= left for sl, sr in xsegms), "Gap overlaps a segment"
+
+
+@pytest.mark.parametrize("mode", ("greedy", "optimal"))
+@pytest.mark.parametrize("minSep", (0, 0.5))
+def test_performSelection(minSep, mode):
+    """
+    Checks that the selected slits do not overlap and are separated by minSep
+    """
+    minX, maxX, minSlitLength, boxSize = -498, 498, 8, 4
+    selector = TargetSelector(_randomTargets(3000, minX, maxX, 2), minX, maxX, minSlitLength, minSep, boxSize)
+    selIdx = selector.performSelection(mode)
+    sel = selector.targets.iloc[selIdx]
+    assert len(set(selIdx)) == len(selIdx) and len(sel) > 100, "Unexpected selection"
+
+    isBox = (sel.pcode < -1).to_numpy()
+    lefts = (sel.xarcs - sel.length2).to_numpy()
+    rights = (sel.xarcs + sel.length1).to_numpy()
+    slits = sorted(zip(lefts[~isBox], rights[~isBox]))
+    assert all(minX <= l and r <= maxX and r - l >= minSlitLength - 1e-9 for l, r in slits), "Unexpected slit"
+    assert all(a[1] + minSep <= b[0] + 1e-9 for a, b in zip(slits, slits[1:])), "Slits overlap"
+
+
+def test_optimalSelection():
+    """
+    Checks that the optimal selection has a higher total priority than the greedy selection
+    and keeps the preselected targets
+    """
+    minX, maxX = -498, 498
+    df = _randomTargets(500, minX, maxX, 3)
+    df.loc[df.index[:20], "selected"] = 1
+    greedy = TargetSelector(df, minX, maxX, 8, 0.5, 4)
+    optimal = TargetSelector(df, minX, maxX, 8, 0.5, 4)
+    greedyIdx = greedy.performSelection()
+    optimalIdx = optimal.performSelection("optimal")
+    assert optimal.objective(optimalIdx) > greedy.objective(greedyIdx), "Optimal selection not better"
+
+    preselected = set(greedy.targets.orgIndex.iloc[greedyIdx][greedy.targets.selected.iloc[greedyIdx] > 0])
+    assert preselected <= set(optimal.targets.orgIndex.iloc[optimalIdx]), "Preselected target dropped"
+
+    with pytest.raises(ValueError):
+        optimal.performSelection("best")
+
+
+@pytest.mark.parametrize("seed, minSep", ((1, 0.5), (1, 2), (2, 0.5), (10, 2), (31, 0), (31, 0.5)))
+@pytest.mark.parametrize("nPreselected", (0, 20))
+def test_optimalNotWorse(seed, minSep, nPreselected):
+    """
+    Checks that the optimal selection is not worse than the greedy selection, whose slits are candidates,
+    and places the same preselected targets
+    """
+    minX, maxX = -498, 498
+    df = _randomTargets(1000, minX, maxX, seed)
+    df.loc[df.index[:nPreselected], "selected"] = 1
+    greedy = TargetSelector(df, minX, maxX, 8, minSep, 4)
+    optimal = TargetSelector(df, minX, maxX, 8, minSep, 4)
+    greedyIdx, optimalIdx = greedy.performSelection(), optimal.performSelection("optimal")
+    assert optimal.objective(optimalIdx) >= greedy.objective(greedyIdx), "Optimal selection worse"
+
+    sel = greedy.targets.iloc[greedyIdx]
+    preselected = set(sel.orgIndex[sel.selected > 0])
+    sel = optimal.targets.iloc[optimalIdx]
+    assert preselected == set(sel.orgIndex[sel.selected > 0]), "Unexpected preselected targets"
+
+
+@pytest.mark.parametrize("mode", ("greedy", "optimal"))
+def test_extendSlits(mode):
+    """
+    Checks that extended slits keep minSep, fill the free space between neighbours and the alignment boxes
+    """
+    minX, maxX, minSep = -498, 498, 0.5
+    df = _randomTargets(300, minX, maxX, 5)
+    selector = TargetSelector(df, minX, maxX, 8, minSep, 4)
+    selIdx = selector.performSelection(mode)
+    before = (selector.length1 + selector.length2)[selIdx]
+    extended = TargetSelector(df, minX, maxX, 8, minSep, 4)
+    assert extended.performSelection(mode, extend=True) == selIdx, "Unexpected selection"
+
+    sel = extended.targets.iloc[selIdx]
+    assert np.all((extended.length1 + extended.length2)[selIdx] >= before - 1e-9), "Slit shortened"
+    slits = sel[sel.pcode > 0].sort_values("xarcs")
+    lefts = (slits.xarcs - slits.length2).to_numpy()
+    rights = (slits.xarcs + slits.length1).to_numpy()
+    cells = np.searchsorted(extended.cells.starts, slits.xarcs.to_numpy()) - 1
+    sameCell = cells[1:] == cells[:-1]
+    original = selector.targets.iloc[selIdx]
+    original = original[original.pcode > 0].sort_values("xarcs")
+    lefts0, rights0 = (original.xarcs - original.length2).to_numpy(), (original.xarcs + original.length1).to_numpy()
+    gaps0 = lefts0[1:] - rights0[:-1]
+    assert np.allclose((lefts[1:] - rights[:-1])[sameCell], np.minimum(gaps0, minSep)[sameCell]), "Free space left between neighbours"
+
+    """ Ends of a gap between alignment boxes """
+    cellStarts, cellEnds = np.array(extended.cells.starts)[cells], np.array(extended.cells.ends)[cells]
+    first, last = np.r_[True, ~sameCell], np.r_[~sameCell, True]
+    assert np.allclose(lefts[first], np.minimum(cellStarts + minSep, lefts0)[first]), "Unexpected first slit"
+    assert np.allclose(rights[last], np.maximum(cellEnds - minSep, rights0)[last]), "Unexpected last slit"
+
+
+@pytest.mark.parametrize("mode", ("greedy", "optimal"))
+@pytest.mark.parametrize("extend", (False, True))
+def test_updateTarget(mode, extend):
+    """
+    Checks that selecting again after a change gives the same result as selecting from scratch
+    """
+    minX, maxX = -498, 498
+    rng = np.random.default_rng(4)
+    df = _randomTargets(1000, minX, maxX, 4)
+    df["length2"] = rng.uniform(3, 5, len(df)).astype(np.float32)
+    selector = TargetSelector(df, minX, maxX, 8, 0.5, 4)
+    selector.performSelection(mode, extend)
+
+    """ Changes of priority, preselection, length, and alignment boxes added or removed """
+    for orgIdx, pcode, selected, length2 in ((10, 1000, 1, 3.5), (20, 0, 0, 4), (30, -2, 0, 2), (30, 5, 1, 4), (40, 7, 0, 4.5)):
+        row = np.flatnonzero(selector.targets.orgIndex.to_numpy() == orgIdx)[0]
+        selIdx = selector.updateTarget(row, pcode, selected, 4, length2)
+        df.loc[orgIdx, ["pcode", "selected", "length2"]] = pcode, selected, length2
+
+        full = TargetSelector(df, minX, maxX, 8, 0.5, 4)
+        fullIdx = full.performSelection(mode, extend)
+        assert set(selector.targets.orgIndex.iloc[selIdx]) == set(full.targets.orgIndex.iloc[fullIdx]), "Unexpected selection"
+        lengths = selector.targets.set_index("orgIndex").sort_index().length1
+        assert np.allclose(lengths, full.targets.set_index("orgIndex").sort_index().length1), "Unexpected slit lengths"
@@ -0,0 +1,325 @@
+#
+# Test running TargetList
+#
+# Created: 2026-10-18
+#
+import pytest
+import sys
+import io
+import json
+import logging
+import numpy as np
+import pandas as pd
+import astropy.units as u
+from astropy.coordinates import SkyCoord
+
+sys.path.extend(("..", "../smdtLibs"))
+from configFile import ConfigFile
+from targets import TargetList, TargetSchema
+from maskGeometry import getMaskGeometry
+
+logging.disable()
+
+
+def _readRaw(text, columnar):
+    tlist = TargetList(pd.DataFrame())
+    tlist.centerRADeg, tlist.centerDEC, tlist.positionAngle = 0, 0, 0
+    df = tlist.readRaw(io.StringIO(text), columnar=columnar)
+    return df, (tlist.centerRADeg, tlist.centerDEC, tlist.positionAngle)
+
+
+@pytest.mark.parametrize(
+    "fileName",
+    (
+        "../../DeimosExamples/MihoIshigaki/CetusIII.lst",
+        "../../DeimosExamples/EvanKirby/n2419c.list",
+        "../../DeimosExamples/EvanKirby/LeoIa.list",
+    ),
+)
+def test_readRawColumnar(fileName):
+    """
+    Checks that the columnar parser produces the same data frame as the line parser
+    """
+    with open(fileName) as fh:
+        text = fh.read()
+    df0, center0 = _readRaw(text, False)
+    df1, center1 = _readRaw(text, True)
+    pd.testing.assert_frame_equal(df0, df1, check_exact=True)
+    assert center0 == center1, "Unexpected center or PA"
+
+
+def test_readRawColumnarSpecialLines():
+    """
+    Checks PA line, glued equinox, defaults and bad values
+    """
+    text = """
+    Field1  10:00:00.0 -00:30:00 2000.0 PA=12.5 ##
+    # comment line
+    t1  10:00:01.0 +10:00:00 200019.5 I 3 1 0 30
+    t2  -0:0:0 -00:30:00 2000 abc V 3
+    t3  10:00:02.0 +10:00:00 2000
+    t4  10:00:03.0 +10:00:00 2000 1 v 3 1 1 45 5 6 1.0 9 9 9
+    """
+    df0, center0 = _readRaw(text, False)
+    df1, center1 = _readRaw(text, True)
+    pd.testing.assert_frame_equal(df0, df1, check_exact=True)
+    assert center1 == (150.0, -0.5, 12.5), "Unexpected center or PA"
+    assert df1.mag[0] == 19.5 and df1.eqx[0] == 2000, "Unexpected glued equinox"
+
+    """ pcode is not an integer, falls back to line parser """
+    text += "t5  10:00:04.0 +10:00:00 2000 1 I 3.5\n"
+    df0, center0 = _readRaw(text, False)
+    df1, center1 = _readRaw(text, True)
+    pd.testing.assert_frame_equal(df0, df1, check_exact=True)
+
+
+def test_catalogCache(tmp_path):
+    """
+    Checks that a target list loaded from the catalog cache is the same as the parsed one
+    """
+    config = ConfigFile("../smdt.cfg")
+    config.properties["catalogcacheenabled"] = True
+    config.properties["catalogcachedir"] = str(tmp_path)
+    fileName = "../../DeimosExamples/EvanKirby/n2419c.list"
+
+    tlist0 = TargetList(fileName, config=config)
+    assert len(list(tmp_path.iterdir())) == 1, "Expected one cache entry"
+    tlist1 = TargetList(fileName, config=config)
+    pd.testing.assert_frame_equal(tlist0.targets, tlist1.targets, check_exact=True)
+    assert tlist0.inputCenter == tlist1.inputCenter, "Unexpected center or PA"
+    assert tlist0.positionAngle == tlist1.positionAngle == 50, "Unexpected PA"
+
+    """ Cache too small, entry is evicted """
+    config.properties["catalogcachesizemb"] = 1e-6
+    config.properties["catalogcachedir"] = str(tmp_path / "small")
+    TargetList(fileName, config=config)
+    assert len(list((tmp_path / "small").iterdir())) == 0, "Expected empty cache"
+
+    """ Cache disabled """
+    config.properties["catalogcacheenabled"] = False
+    config.properties["catalogcachedir"] = str(tmp_path / "disabled")
+    TargetList(fileName, config=config)
+    assert not (tmp_path / "disabled").exists(), "Cache should not be created"
+
+
+def test_targetSchema():
+    """
+    Checks the types of the columns of the targets data frame
+    """
+    config = ConfigFile("../smdt.cfg")
+    config.properties["catalogcacheenabled"] = False
+    tlist = TargetList("../../DeimosExamples/MihoIshigaki/CetusIII.lst", config=config)
+    for colName, colType in TargetSchema.items():
+        assert tlist.targets[colName].dtype == colType, f"Unexpected type of {colName}"
+
+    tlist2 = TargetList(tlist.targets.astype({"pcode": "int64", "length1": "float64"}), config=config)
+    assert tlist2.targets.pcode.dtype == "int32" and tlist2.targets.length1.dtype == "float32", "Schema not applied"
+
+
+def test_projectionEngine():
+    """
+    Checks the cached projection against the separation and position angle of astropy and the invalidation of the cache
+    """
+    config = ConfigFile("../smdt.cfg")
+    config.properties["catalogcacheenabled"] = False
+    tlist = TargetList("../../DeimosExamples/EvanKirby/n2419c.list", config=config)
+    engine = tlist.getProjectionEngine()
+    assert tlist.getProjectionEngine() is engine, "Engine should be cached"
+
+    for dRA, dDEC, pa in ((0, 0, 0), (0.05, -0.1, 77), (-0.02, 0.2, -130)):
+        raDeg, decDeg = tlist.centerRADeg + dRA, tlist.centerDEC + dDEC
+        xarcs, yarcs = tlist.reCalcCoordinates(raDeg, decDeg, pa)
+        telRaRad, telDecRad = tlist._fld2telax(raDeg, decDeg, pa)
+        axis = SkyCoord(telRaRad * u.rad, telDecRad * u.rad)
+        coords = SkyCoord(tlist.targets.raHour.to_numpy() * u.hourangle, tlist.targets.decDeg.to_numpy() * u.deg)
+        rArcs = np.degrees(np.tan(axis.separation(coords).rad)) * 3600
+        posAngles = axis.position_angle(coords).rad
+        deltaPA = np.radians(pa) - posAngles
+        xs, ys = rArcs * np.cos(deltaPA), rArcs * np.sin(deltaPA)
+        """ dsimulator takes the sign of cos(p) from the declinations, skip the few targets where it differs """
+        same = (coords.dec.rad < telDecRad) == (np.cos(posAngles) < 0)
+        assert same.sum() > 0.95 * len(same)
+        assert np.allclose(xarcs[same], xs[same], rtol=0, atol=1e-4) and np.allclose(yarcs[same], ys[same], rtol=0, atol=1e-4), "Unexpected projection"
+
+    tlist.setColum("decDeg", tlist.targets.decDeg + 0.01)
+    assert tlist.getProjectionEngine() is not engine, "Engine should be invalidated"
+    xarcs1, yarcs1 = tlist.reCalcCoordinates(raDeg, decDeg, pa)
+    assert not np.allclose(yarcs, yarcs1), "Projection not updated"
+
+
+def test_projectPointings():
+    """
+    Checks that the batched projection gives the same results as one pointing at a time
+    """
+    config = ConfigFile("../smdt.cfg")
+    config.properties["catalogcacheenabled"] = False
+    tlist = TargetList("../../DeimosExamples/EvanKirby/n2419c.list", config=config)
+    raDegs = tlist.centerRADeg + np.array([0, 0.05, -0.02, 0.01])
+    decDegs = tlist.centerDEC + np.array([0, -0.1, 0.2, 0])
+    pas = np.array([0, 77, -130, 45])
+
+    """ Small maxBytes, one pointing per chunk """
+    xarcs, yarcs = tlist.projectPointings(raDegs, decDegs, pas, maxBytes=1)
+    assert xarcs.shape == (4, len(tlist.targets)), "Unexpected shape"
+    for i in range(len(pas)):
+        xs, ys = tlist.reCalcCoordinates(raDegs[i], decDegs[i], pas[i])
+        assert np.allclose(xarcs[i], xs, rtol=0, atol=1e-9) and np.allclose(yarcs[i], ys, rtol=0, atol=1e-9), "Unexpected projection"
+
+    """ One center, many PAs """
+    xarcs2, yarcs2 = tlist.projectPointings(raDegs[1], decDegs[1], np.arange(0, 180, 10))
+    assert np.allclose(xarcs2[0], tlist.projectPointings(raDegs[1], decDegs[1], 0)[0][0], rtol=0, atol=1e-9), "Unexpected projection"
+
+
+def test_distortionModel():
+    """
+    Checks the distortion model against the astropy polynomials, and the fused projection
+    """
+    config = ConfigFile("../smdt.cfg")
+    config.properties["catalogcacheenabled"] = False
+    tlist = TargetList("../../DeimosExamples/EvanKirby/n2419c.list", config=config)
+    model = tlist.getDistortionModel()
+    assert tlist.getDistortionModel() is model, "Model should be cached"
+
+    xPoly, yPoly = tlist.getDistortionFunctions()
+    rng = np.random.default_rng(1)
+    xs, ys = rng.uniform(-500, 500, 1000), rng.uniform(-200, 200, 1000)
+    dxs, dys = model.evaluate(xs, ys)
+    assert np.allclose(dxs, xPoly(xs, ys), rtol=1e-14, atol=1e-12), "Unexpected X distortion"
+    assert np.allclose(dys, yPoly(xs, ys), rtol=1e-14, atol=1e-12), "Unexpected Y distortion"
+
+    raDeg, decDeg, pa = tlist.centerRADeg, tlist.centerDEC, 30
+    dxs, dys = tlist.reCalcDistortedCoordinates(raDeg, decDeg, pa)
+    assert np.allclose(dxs, xPoly(tlist.targets.xarcs, tlist.targets.yarcs), rtol=1e-14, atol=1e-12), "Unexpected distorted X"
+    bxs, bys = tlist.projectPointings(raDeg, decDeg, pa, distort=True)
+    assert np.allclose(bxs[0], dxs, rtol=0, atol=1e-9) and np.allclose(bys[0], dys, rtol=0, atol=1e-9), "Unexpected batched distortion"
+
+
+def test_cullTargets():
+    """
+    Checks that targets far from the center are not projected
+    """
+    config = ConfigFile("../smdt.cfg")
+    config.properties["catalogcacheenabled"] = False
+    config.properties["cullradiusdeg"] = 0
+    tlist = TargetList("../../DeimosExamples/EvanKirby/n2419c.list", config=config)
+    xarcs, yarcs = tlist.reCalcCoordinates(tlist.centerRADeg, tlist.centerDEC, 20)
+
+    engine = tlist.getProjectionEngine()
+    raDeg, decDeg = tlist.centerRADeg + 0.05, tlist.centerDEC
+    telRaRad, telDecRad = tlist._fld2telax(raDeg, decDeg, 20)
+
+    """ Exact angular distances, cos of the distance is the dot product of the unit vectors """
+    ras, decs = np.radians(tlist.targets.raHour.to_numpy() * 15), np.radians(tlist.targets.decDeg.to_numpy())
+    vectors = np.column_stack((np.cos(decs) * np.cos(ras), np.cos(decs) * np.sin(ras), np.sin(decs)))
+    ra0, dec0 = np.radians(raDeg), np.radians(decDeg)
+    cosDists = vectors @ np.array((np.cos(dec0) * np.cos(ra0), np.cos(dec0) * np.sin(ra0), np.sin(dec0)))
+    for radius in (0.02, 0.05, 0.1):
+        inside = cosDists >= np.cos(np.radians(radius))
+        idx = engine.nearby(raDeg, decDeg, radius)
+        assert 0 < inside.sum() < len(inside), "Expected targets inside and outside"
+        assert set(np.flatnonzero(inside).tolist()) <= set(idx.tolist()), "Missing targets nearby"
+
+        xs, ys = engine.projectNear(telRaRad, telDecRad, 20, raDeg, decDeg, radius)
+        assert np.array_equal(np.isnan(xs), ~inside) and np.array_equal(np.isnan(ys), ~inside), "Unexpected culled targets"
+
+    config.properties["cullradiusdeg"] = 0.05
+    radius = tlist.getCullRadius()
+    xarcs1, yarcs1 = tlist.reCalcCoordinates(tlist.centerRADeg, tlist.centerDEC, 20)
+    projected = np.isfinite(xarcs1)
+    idx = engine.nearby(tlist.centerRADeg, tlist.centerDEC, radius)
+    assert 0 < len(idx) < len(xarcs1) and np.array_equal(np.flatnonzero(projected), idx), "Unexpected culled targets"
+    assert np.array_equal(xarcs1[projected], xarcs[projected]), "Unexpected projection"
+
+
+def test_selectAndUpdate():
+    """
+    Checks that selection and updates can write slit lengths into the float32 columns
+    """
+    config = ConfigFile("../smdt.cfg")
+    config.properties["catalogcacheenabled"] = False
+    tlist = TargetList("../../DeimosExamples/EvanKirby/n2419c.list", config=config)
+    """ Numeric columns only, rows are float64 and not object """
+    tlist = TargetList(tlist.targets.drop(columns=["objectId", "pBand"]), tlist.centerRADeg, tlist.centerDEC, 0, config=config)
+    idxList = np.flatnonzero((np.abs(tlist.targets.xarcs) < 490) & (np.abs(tlist.targets.yarcs - 330) < 140))
+    tlist.select(idxList, -498, 498, 8, 0.5, 4)
+    inMask = tlist.targets.inMask.to_numpy() == 1
+    assert 0 < inMask.sum() <= len(idxList), "Expected some selected targets"
+    assert np.all(tlist.targets.length1[inMask] + tlist.targets.length2[inMask] >= 4 - 1e-4), "Unexpected slit lengths"
+
+    tlist.updateTarget('{"idx": 3, "prior": 500, "selected": 1, "slitLPA": 12.7, "slitWidth": 0.7, "len1": 3.3, "len2": 4.1}')
+    tg = tlist.targets.iloc[3]
+    assert tg.pcode == 500 and tg.selected == 1, "Unexpected pcode or selected"
+    assert tg.slitLPA == np.float32(12.7) and tg.length1 == np.float32(3.3), "Unexpected slit values"
+    assert tlist.targets.length1.dtype == np.float32, "Schema not kept"
+
+
+def test_selectOptimal():
+    """
+    Checks the optimal selection against the greedy selection, and the selection info
+    """
+    config = ConfigFile("../smdt.cfg")
+    config.properties["catalogcacheenabled"] = False
+    tlist = TargetList("../../DeimosExamples/EvanKirby/n2419c.list", config=config)
+    tlist = TargetList(tlist.targets.drop(columns=["objectId", "pBand"]), tlist.centerRADeg, tlist.centerDEC, 0, config=config)
+    idxList = np.flatnonzero((np.abs(tlist.targets.xarcs) < 490) & (np.abs(tlist.targets.yarcs - 330) < 140))
+    for minSep in (0.5, 2):
+        tlist.select(idxList, -498, 498, 8, minSep, 4)
+        greedyObjective = tlist.selectionInfo["objective"]
+        tlist.select(idxList, -498, 498, 8, minSep, 4, mode="optimal")
+        info = tlist.selectionInfo
+        selected = tlist.targets[tlist.targets.inMask == 1]
+        assert info["nSelected"] == len(selected) and info["objective"] == selected.pcode[selected.pcode > 0].sum(), "Unexpected selection info"
+        assert info["objective"] >= greedyObjective, "Optimal selection worse than greedy"
+    assert json.loads(tlist.toJsonWithSelection())["selectionInfo"] == info, "Unexpected selection info"
+
+
+def test_selectIncremental():
+    """
+    Checks that the selection after updates is incremental, if the parameters are the same
+    """
+    config = ConfigFile("../smdt.cfg")
+    config.properties["catalogcacheenabled"] = False
+    tlist = TargetList("../../DeimosExamples/EvanKirby/n2419c.list", config=config)
+    tlist = TargetList(tlist.targets.drop(columns=["objectId", "pBand"]), tlist.centerRADeg, tlist.centerDEC, 0, config=config)
+    idxList = np.flatnonzero((np.abs(tlist.targets.xarcs) < 490) & (np.abs(tlist.targets.yarcs - 330) < 140))
+    tlist.select(idxList, -498, 498, 8, 0.5, 4, mode="optimal")
+    idx = idxList[5]
+    tlist.updateTarget(f'{{"idx": {idx}, "prior": 1000, "selected": 1, "slitPA": 0, "slitWidth": 0.7, "len1": 4, "len2": 4}}')
+    tlist.select(idxList, -498, 498, 8, 0.5, 4, mode="optimal", incremental=True)
+    assert tlist.selectionInfo["incremental"] and tlist.targets.inMask[idx] == 1, "Expected incremental selection"
+    tlist.select(idxList, -498, 498, 8, 0.5, 4, mode="greedy", incremental=True)
+    assert not tlist.selectionInfo.get("incremental"), "Expected full selection, mode changed"
+
+
+def test_fitSlits():
+    """
+    Checks that slits crossing the mask edges or the gaps between the panels are trimmed or removed
+    """
+    config = ConfigFile("../smdt.cfg")
+    config.properties["catalogcacheenabled"] = False
+    tlist = TargetList("../../DeimosExamples/EvanKirby/n2419c.list", config=config)
+    tlist.markInside("deimos")
+    geometry = getMaskGeometry("deimos")
+    tlist.select(np.flatnonzero(tlist.targets.inMask == 1), geometry.minX, geometry.maxX, 8, 0.5, 4)
+    tgs = tlist.targets
+    tgs.loc[(tgs.inMask == 1) & (tgs.pcode > 0), ["length1", "length2"]] = np.float32(12)
+    before = tgs[tgs.inMask == 1].copy()
+
+    nTrimmed, nRemoved = tlist.fitSlits(20, margin=0.5)
+    assert nTrimmed > 0 and nRemoved > 0 and tlist.selectionInfo["trimmed"] == nTrimmed, "Expected slits crossing the edges"
+
+    raster = getMaskGeometry("deimos", 0.5).raster()
+    after = tlist.targets[tlist.targets.inMask == 1]
+    xs, ys = tlist.slitCorners(after)
+    assert raster.checkPoints(xs, ys).all(), "Slit corners outside the mask"
+    slits = after[after.pcode > 0]
+    assert len(after) == len(before) - nRemoved and np.all(slits.length1 + slits.length2 >= 20), "Unexpected slits"
+    assert np.all(after.length1 <= before.length1[after.index]), "Slit made longer"
+
+    """ Samples along the slits, also across the gaps between the panels """
+    rel = np.radians(tlist.positionAngle - after.slitLPA.to_numpy())[:, None]
+    dists = np.linspace(-after.length2.to_numpy(), after.length1.to_numpy(), 50, axis=1)
+    axisX = after.xarcs.to_numpy()[:, None] + dists * np.cos(rel)
+    axisY = after.yarcs.to_numpy()[:, None] + dists * np.sin(rel)
+    assert raster.checkPoints(axisX, axisY).all(), "Slit crosses a gap"
+    assert tlist.fitSlits(20, margin=0.5) == (0, 0), "Unexpected second pass"
@@ -0,0 +1,39 @@
+#
+# Test running utils
+#
+# Created: 2026-10-18
+#
+import pytest
+import sys
+import numpy as np
+
+sys.path.append("../smdtLibs")
+import utils
+
+
+def test_sexg2Floats():
+    """
+    Checks the array version against sexg2Float, and the reporting of bad rows
+    """
+    strs = ["10:00:00", "-00:30:00", "xx", "07 38 14.3", "+38:56:45.34", "1:2", "4:-5:6", "-04:15:11.5"]
+    values, bad = utils.sexg2Floats(strs)
+    assert bad.tolist() == [2, 5, 6], f"Unexpected bad rows {bad}"
+    for i, s in enumerate(strs):
+        if i not in bad:
+            assert values[i] == utils.sexg2Float(s), f"Unexpected value for {s}"
+    assert values[1] == -0.5, "Unexpected sign of -00:30:00"
+    assert np.all(np.isnan(values[bad])), "Bad rows should be nan"
+
+
+def test_toSexagecimals():
+    """
+    Checks the array version against toSexagecimal, and back
+    """
+    degs = np.random.default_rng(1).uniform(-90, 90, 1000)
+    degs[:3] = -0.0001, 0, 59.99999999
+    strs = utils.toSexagecimals(degs)
+    assert strs.tolist() == [utils.toSexagecimal(d) for d in degs], "Unexpected strings"
+
+    values, bad = utils.sexg2Floats(strs)
+    assert len(bad) == 0, "Unexpected bad rows"
+    assert np.allclose(values, degs, atol=0.01 / 3600), "Unexpected round trip values"